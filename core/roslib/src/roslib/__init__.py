@@ -47,10 +47,40 @@ numerous ROS tools (e.g. rostopic).
 
 __version__ = '1.7.0'
 
-from roslib.launcher import load_manifest  # noqa: F401
-# this import is necessary due to a bug in purge_build.py in our
-# debian assets.
-import roslib.stacks  # noqa: F401, I100
+import importlib
+import sys
+
+# submodules that are imported on first access, see __getattr__()
+_submodules = set([
+    'crawler', 'depgraph', 'exceptions', 'gentools', 'importer', 'inotify', 'launcher',
+    'locks', 'manifest', 'manifestlib', 'message', 'msgs', 'names', 'network', 'packages',
+    'pkgindex', 'resources', 'rosenv', 'rospack', 'scriptutil', 'speccache', 'srvs', 'stack_manifest',
+    'stacks',
+])
+
+
+def __getattr__(name):
+    """
+    Import load_manifest() and the submodules of roslib on first access
+    (PEP 562), so that scripts which only need a few of them do not pay
+    for importing rospkg and catkin.
+    """
+    if name == 'load_manifest':
+        # a local load_manifest would redefine the Python < 3.7 import below
+        launcher = importlib.import_module('roslib.launcher')
+        globals()['load_manifest'] = launcher.load_manifest
+        return launcher.load_manifest
+    if name in _submodules:
+        return importlib.import_module('roslib.%s' % name)
+    raise AttributeError("module 'roslib' has no attribute '%s'" % name)
+
+
+if sys.version_info < (3, 7):
+    # module __getattr__() is not supported
+    from roslib.launcher import load_manifest  # noqa: F401
+    # this import is necessary due to a bug in purge_build.py in our
+    # debian assets.
+    import roslib.stacks  # noqa: F401, I100
 
 _is_interactive = False
 
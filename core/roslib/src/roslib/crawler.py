@@ -0,0 +1,426 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2008, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Directory crawler shared by the package and stack listing routines.
+
+The crawler follows symlinks, detects symlink loops by (st_dev,
+st_ino) and hands independent subtrees to a thread pool, which pays
+off on network filesystems where every directory listing is a round
+trip. Results are returned in the same order as a sequential
+depth-first walk so that callers can keep first-match-wins semantics.
+
+Subtrees can be excluded from every crawl. A directory that contains
+a C{CATKIN_IGNORE} file is not crawled, and a C{.rosignore} file lists
+glob patterns, one per line, of directories below its own directory
+that are not crawled. A pattern without a slash matches directory
+names at any depth, e.g. C{build} or C{*.bag.d}; a pattern with a
+slash matches the path relative to the C{.rosignore} directory, e.g.
+C{data/raw} or C{/build}. Lines starting with C{#} are comments.
+Ignored directories are never listed or stat'd.
+"""
+
+import fnmatch
+import os
+import re
+import sys
+import threading
+
+# scandir iterators can be closed with a with statement since Python 3.6
+if sys.version_info >= (3, 6):
+    from os import scandir
+else:
+    scandir = None
+
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # Python 2 without the futures backport
+    ThreadPoolExecutor = None
+
+# crawling is I/O bound, so use more threads than cores
+DEFAULT_MAX_WORKERS = 8
+
+# file with glob patterns of directories not to crawl
+IGNORE_FILE = '.rosignore'
+# directories containing this file are not crawled, as with catkin
+CATKIN_IGNORE = 'CATKIN_IGNORE'
+
+# {max_workers: (pid, executor)}, shared by all crawls
+_executors = {}
+_executors_lock = threading.Lock()
+# marks the threads of the executors
+_local = threading.local()
+
+# totals of all crawls, see get_stats()
+_stats = {'crawled': 0, 'ignored': 0}
+_stats_lock = threading.Lock()
+
+
+def get_stats():
+    """
+    @return: number of directories listed ('crawled') and of
+        directories pruned by ignore files ('ignored') by all crawls
+        since the last L{reset_stats()}
+    @rtype: {str: int}
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+
+
+def _compile_patterns(patterns):
+    if not patterns:
+        return None
+    return re.compile('|'.join(['(?:%s)' % fnmatch.translate(p) for p in patterns]))
+
+
+def _read_ignore_file(filename):
+    """
+    @return: regular expressions for directory names and for relative
+        paths, None if the file has no patterns
+    @rtype: (re, re)
+    """
+    try:
+        with open(filename) as f:
+            lines = f.read().splitlines()
+    except (IOError, OSError):
+        return None
+    names = []
+    paths = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        line = line.rstrip('/')
+        if line.startswith('/'):
+            paths.append(line.lstrip('/'))
+        elif '/' in line:
+            paths.append(line)
+        elif line:
+            names.append(line)
+    if not names and not paths:
+        return None
+    return _compile_patterns(names), _compile_patterns(paths)
+
+
+def _add_rules(rules, d, dir_mtimes=None):
+    """
+    @param rules: rules in effect above d
+    @type  rules: ((str, re, re),)
+    @param dir_mtimes: (optional) updated with the mtime of the ignore
+        file of d, None if there is none
+    @type  dir_mtimes: {str: float}
+    @return: rules in effect below d
+    @rtype: ((str, re, re),)
+    """
+    filename = os.path.join(d, IGNORE_FILE)
+    if dir_mtimes is not None:
+        try:
+            dir_mtimes[filename] = os.stat(filename).st_mtime
+        except OSError:
+            dir_mtimes[filename] = None
+    patterns = _read_ignore_file(filename)
+    if patterns is None:
+        return rules
+    return rules + ((d,) + patterns,)
+
+
+def _is_ignored(rules, d, name):
+    """
+    @return: True if subdirectory name of d matches one of rules
+    @rtype: bool
+    """
+    for base, name_re, path_re in rules:
+        if name_re is not None and name_re.match(name):
+            return True
+        if path_re is not None:
+            rel = os.path.join(d, name)[len(base) + 1:]
+            if os.sep != '/':
+                rel = rel.replace(os.sep, '/')
+            if path_re.match(rel):
+                return True
+    return False
+
+
+def get_ignore_rules(path, dir_mtimes=None):
+    """
+    @param path: directory
+    @type  path: str
+    @param dir_mtimes: (optional) updated with the mtimes of the
+        ignore files that were looked up, None for missing ones
+    @type  dir_mtimes: {str: float}
+    @return: ignore rules of the ancestors of path, which apply to
+        everything below path
+    @rtype: ((str, re, re),)
+    """
+    ancestors = []
+    d = os.path.dirname(os.path.abspath(path))
+    while True:
+        ancestors.append(d)
+        parent = os.path.dirname(d)
+        if parent == d:
+            break
+        d = parent
+    rules = ()
+    for d in reversed(ancestors):
+        rules = _add_rules(rules, d, dir_mtimes)
+    return rules
+
+
+def is_ignored(path):
+    """
+    @param path: directory
+    @type  path: str
+    @return: True if a C{.rosignore} file above path excludes it
+        from crawls
+    @rtype: bool
+    """
+    path = os.path.abspath(path)
+    d, name = os.path.split(path)
+    return _is_ignored(get_ignore_rules(path), d, name)
+
+
+def _list_dir(d):
+    """
+    @return: names of subdirectories (following symlinks) and names
+        of all other entries of d
+    @rtype: ([str], set(str))
+    """
+    subdirs = []
+    files = set()
+    if scandir is not None:
+        with scandir(d) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    subdirs.append(entry.name)
+                else:
+                    files.add(entry.name)
+    else:
+        for name in os.listdir(d):
+            if os.path.isdir(os.path.join(d, name)):
+                subdirs.append(name)
+            else:
+                files.add(name)
+    return subdirs, files
+
+
+class _Crawler(object):
+    """
+    State of a single crawl(). Each task walks its subtree depth-first
+    and gives away siblings to the thread pool while it has idle
+    workers.
+    """
+
+    def __init__(self, visit, skip_dir, executor, max_workers, want_mtimes, ignore):
+        self.visit = visit
+        self.skip_dir = skip_dir
+        self.executor = executor
+        self.max_workers = max_workers
+        self.want_mtimes = want_mtimes
+        self.ignore = ignore
+        self.results = []
+        self.dir_mtimes = {}
+        self.crawled = 0
+        self.ignored = 0
+        self._cond = threading.Condition()
+        self._pending = 0
+        # exceptions of the tasks, in the order they were raised
+        self._errors = []
+
+    def submit(self, todo):
+        with self._cond:
+            self._pending += 1
+        self.executor.submit(self._run, todo)
+
+    def wait(self):
+        with self._cond:
+            while self._pending:
+                self._cond.wait()
+        if self._errors:
+            raise self._errors[0]
+
+    def _run(self, todo):
+        _local.worker = True
+        try:
+            self.crawl(todo)
+        except Exception as e:
+            with self._cond:
+                self._errors.append(e)
+        finally:
+            with self._cond:
+                self._pending -= 1
+                if not self._pending:
+                    self._cond.notify_all()
+
+    def crawl(self, todo):
+        """
+        @param todo: list of (key, directory, ancestors, rules) to
+            walk, where key orders results, ancestors is the set of
+            (st_dev, st_ino) above directory and rules are the ignore
+            rules in effect
+        """
+        results = []
+        dir_mtimes = {}
+        crawled = ignored = 0
+        stack = list(reversed(todo))
+        while stack:
+            if self._errors:
+                return
+            key, d, ancestors, rules = stack.pop()
+            try:
+                s = os.stat(d)
+                subdirs, files = _list_dir(d)
+            except OSError:
+                continue
+            ident = (s.st_dev, s.st_ino)
+            if ident in ancestors:
+                continue  # symlink loop
+            crawled += 1
+            if self.want_mtimes:
+                dir_mtimes[d] = s.st_mtime
+            if self.ignore:
+                if CATKIN_IGNORE in files:
+                    ignored += 1
+                    continue
+                if IGNORE_FILE in files:
+                    rules = _add_rules(rules, d, dir_mtimes if self.want_mtimes else None)
+            value, descend = self.visit(d, files)
+            if value is not None:
+                results.append((key, value, d))
+            if not descend:
+                continue  # leaf
+            ancestors = ancestors | frozenset([ident])
+            children = []
+            for i, name in enumerate(subdirs):
+                if self.skip_dir(name):
+                    continue
+                if rules and _is_ignored(rules, d, name):
+                    ignored += 1
+                    continue
+                children.append((key + (i,), os.path.join(d, name), ancestors, rules))
+            if self.executor is not None and len(children) > 1 and self._pending < self.max_workers:
+                for child in children[1:]:
+                    self.submit([child])
+                children = children[:1]
+            stack.extend(reversed(children))
+        with self._cond:
+            self.results.extend(results)
+            self.dir_mtimes.update(dir_mtimes)
+            self.crawled += crawled
+            self.ignored += ignored
+
+
+def _get_executor(max_workers):
+    """
+    @return: thread pool shared by the crawls with max_workers,
+        created anew in forked processes
+    @rtype: ThreadPoolExecutor
+    """
+    pid = os.getpid()
+    with _executors_lock:
+        entry = _executors.get(max_workers)
+        if entry is None or entry[0] != pid:
+            entry = (pid, ThreadPoolExecutor(max_workers))
+            _executors[max_workers] = entry
+        return entry[1]
+
+
+def crawl(paths, visit, skip_dir=None, max_workers=DEFAULT_MAX_WORKERS, dir_mtimes=None, ignore=True, stats=None):
+    """
+    Crawl directory trees.
+
+    @param paths: directories to crawl, in order of precedence
+    @type  paths: [str]
+    @param visit: called with each directory path and the set of
+        names of its non-directory entries. Returns (value, descend),
+        where value is recorded if it is not None and descend says
+        whether to crawl the subdirectories.
+    @type  visit: fn(str, set(str)) -> (object, bool)
+    @param skip_dir: (optional) subdirectories whose name matches this
+        predicate are not crawled
+    @type  skip_dir: fn(str) -> bool
+    @param max_workers: number of threads to use, 1 to crawl in the
+        calling thread
+    @type  max_workers: int
+    @param dir_mtimes: (optional) updated with the mtime of every
+        directory that was visited and of the ignore files that were
+        consulted
+    @type  dir_mtimes: {str: float}
+    @param ignore: honor C{CATKIN_IGNORE} and C{.rosignore} files,
+        including the C{.rosignore} files above paths
+    @type  ignore: bool
+    @param stats: (optional) updated with the number of directories
+        listed ('crawled') and pruned by ignore files ('ignored')
+    @type  stats: {str: int}
+    @return: list of (value, directory) in depth-first order
+    @rtype: [(object, str)]
+    """
+    if skip_dir is None:
+        skip_dir = _no_skip
+    todo = []
+    for i, p in enumerate(paths):
+        p = os.path.abspath(p)
+        rules = get_ignore_rules(p, dir_mtimes) if ignore else ()
+        todo.append(((i,), p, frozenset(), rules))
+    # a crawl started by a visit function would wait for the very
+    # threads that it occupies
+    if ThreadPoolExecutor is None or max_workers <= 1 or getattr(_local, 'worker', False):
+        crawler = _Crawler(visit, skip_dir, None, 1, dir_mtimes is not None, ignore)
+        crawler.crawl(todo)
+    else:
+        crawler = _Crawler(visit, skip_dir, _get_executor(max_workers), max_workers, dir_mtimes is not None, ignore)
+        for t in todo:
+            crawler.submit([t])
+        crawler.wait()
+    if dir_mtimes is not None:
+        dir_mtimes.update(crawler.dir_mtimes)
+    with _stats_lock:
+        _stats['crawled'] += crawler.crawled
+        _stats['ignored'] += crawler.ignored
+    if stats is not None:
+        stats['crawled'] = stats.get('crawled', 0) + crawler.crawled
+        stats['ignored'] = stats.get('ignored', 0) + crawler.ignored
+    crawler.results.sort(key=lambda r: r[0])
+    return [(value, d) for _, value, d in crawler.results]
+
+
+def _no_skip(name):
+    return False
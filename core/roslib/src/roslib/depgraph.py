@@ -0,0 +1,640 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2008, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+In-process package and stack dependency graphs. These answer the same
+queries as the rospack/rosstack deps, deps1, depends-on, depends-on1
+and plugins commands without spawning a subprocess. Manifests are
+parsed once and transitive closures are memoized until the ROS path
+or one of the parsed manifests changes. L{DependencyMatrix} answers
+whole-workspace set queries with bitsets.
+"""
+
+import abc
+import os
+import threading
+import time
+from xml.etree.ElementTree import ElementTree
+
+import roslib.exceptions
+import roslib.locks
+import roslib.packages
+import roslib.pkgindex
+import roslib.stacks
+
+import rospkg
+
+# package.xml tags that rospack treats as dependencies
+PACKAGE_XML_DEPEND_TAGS = ['depend', 'build_depend', 'buildtool_depend',
+                           'build_export_depend', 'buildtool_export_depend',
+                           'exec_depend', 'run_depend', 'test_depend']
+
+
+def _parse(filename):
+    """
+    @return: root element of XML file
+    @raise roslib.exceptions.ROSLibException: if file cannot be parsed
+    """
+    try:
+        return ElementTree(None, filename).getroot()
+    except Exception as e:
+        raise roslib.exceptions.ROSLibException('error parsing manifest [%s]: %s' % (filename, e))
+
+
+def _parse_exports(root):
+    """
+    @return: (tag, attributes) of each export
+    @rtype: [(str, dict)]
+    """
+    exports = []
+    for e in root.findall('export'):
+        exports.extend([(c.tag, dict(c.attrib)) for c in e])
+    return exports
+
+
+# abc.ABC is not available on Python 2
+_ABC = abc.ABCMeta('_ABC', (object,), {})
+
+
+class DependencyGraph(_ABC):
+    """
+    Dependency graph of ROS packages or stacks. Subclasses provide the
+    resource locations and manifest format. Queries of one graph are
+    serialized, as they parse manifests and memoize results.
+    """
+
+    # 'package' or 'stack'
+    kind = None
+
+    def __init__(self, ros_root, ros_package_path):
+        """
+        @param ros_root: ROS_ROOT value
+        @type  ros_root: str
+        @param ros_package_path: ROS_PACKAGE_PATH value
+        @type  ros_package_path: str
+        """
+        self.ros_root = ros_root
+        self.ros_package_path = ros_package_path
+        # {name: dir}
+        self._locations = {}
+        # {manifest file: mtime} of every parsed manifest
+        self._manifest_mtimes = {}
+        self._checked = 0.0
+        self._lock = threading.RLock()
+        self.clear()
+
+    @roslib.locks.synchronized
+    def clear(self):
+        """
+        Drop all parsed manifests and memoized results.
+        """
+        # {name: [name]}, in manifest order
+        self._depends1 = {}
+        # {name: [(tag, attributes)]}
+        self._exports = {}
+        # memoized closures {name: [name]}
+        self._depends = {}
+        self._depends_on = {}
+        # reverse edges {name: [name]}, built on first reverse query
+        self._depends_on1 = None
+        self._matrix = None
+        self._manifest_mtimes = {}
+
+    def get_ros_paths(self):
+        """
+        @return: ordered list of paths to search
+        @rtype: [str]
+        """
+        env = {}
+        if self.ros_root:
+            env[roslib.pkgindex.ROS_ROOT] = self.ros_root
+        if self.ros_package_path:
+            env[roslib.pkgindex.ROS_PACKAGE_PATH] = self.ros_package_path
+        return [os.path.abspath(p) for p in rospkg.get_ros_paths(env)]
+
+    @abc.abstractmethod
+    def _update_locations(self, force):
+        """
+        Refresh the name to directory mapping.
+
+        @param force: check the filesystem regardless of the cache timeout
+        @type  force: bool
+        @return: True if the mapping changed
+        @rtype: bool
+        """
+
+    @abc.abstractmethod
+    def _parse_manifest(self, d):
+        """
+        @param d: resource directory
+        @type  d: str
+        @return: manifest file, dependency names, declared in manifest
+            order, and exports
+        @rtype: (str, [str], [(str, dict)])
+        """
+
+    @roslib.locks.synchronized
+    def update(self, force=False):
+        """
+        Revalidate the graph against the filesystem if the cache timeout
+        has expired or force is True.
+
+        @param force: check freshness regardless of the cache timeout
+        @type  force: bool
+        """
+        now = time.time()
+        expired = force or now - self._checked > roslib.pkgindex.get_cache_timeout()
+        if expired:
+            self._checked = now
+        if self._update_locations(force) or \
+                (expired and not roslib.pkgindex.check_mtimes(self._manifest_mtimes)):
+            self.clear()
+
+    def _load(self, name):
+        """
+        Parse the manifest of name unless it already has been.
+
+        @raise roslib.exceptions.ROSLibException: if name cannot be
+            located or its manifest is invalid
+        """
+        if name in self._depends1:
+            return
+        d = self._locations.get(name)
+        if d is None:
+            # the mapping may simply be out of date
+            self.update(force=True)
+            d = self._locations.get(name)
+            if d is None:
+                raise roslib.exceptions.ROSLibException("%s '%s' not found" % (self.kind, name))
+        filename, depends, exports = self._parse_manifest(d)
+        try:
+            self._manifest_mtimes[filename] = os.stat(filename).st_mtime
+        except OSError:
+            self._manifest_mtimes[filename] = None
+        self._depends1[name] = depends
+        self._exports[name] = exports
+
+    @roslib.locks.synchronized
+    def get_depends1(self, name):
+        """
+        @param name: package or stack name
+        @type  name: str
+        @return: names that name depends on directly
+        @rtype: [str]
+        @raise roslib.exceptions.ROSLibException: if name cannot be located
+        """
+        self.update()
+        self._load(name)
+        return list(self._depends1[name])
+
+    @roslib.locks.synchronized
+    def get_depends(self, name):
+        """
+        @param name: package or stack name
+        @type  name: str
+        @return: names that name depends on, directly or indirectly,
+            with every dependency listed after its own dependencies
+        @rtype: [str]
+        @raise roslib.exceptions.ROSLibException: if name cannot be
+            located or the dependencies are circular
+        """
+        self.update()
+        return list(self._get_depends(name, []))
+
+    def _get_depends(self, name, stack):
+        """
+        Post-order depth-first traversal. Each closure is assembled from
+        the memoized closures of the direct dependencies, which yields
+        the same order as a single traversal from name.
+
+        @param stack: names currently being traversed
+        @type  stack: [str]
+        """
+        depends = self._depends.get(name)
+        if depends is not None:
+            return depends
+        if name in stack:
+            raise roslib.exceptions.ROSLibException('circular dependency: %s' % ' -> '.join(stack[stack.index(name):] + [name]))
+        self._load(name)
+        stack.append(name)
+        depends = []
+        seen = set()
+        for d in self._depends1[name]:
+            for n in self._get_depends(d, stack) + [d]:
+                if n not in seen:
+                    seen.add(n)
+                    depends.append(n)
+        stack.pop()
+        self._depends[name] = depends
+        return depends
+
+    def _get_depends_on1(self):
+        """
+        @return: reverse edges for every resource with a valid manifest
+        @rtype: {str: [str]}
+        """
+        if self._depends_on1 is None:
+            depends_on1 = {}
+            for name in sorted(self._locations.keys()):
+                try:
+                    self._load(name)
+                except roslib.exceptions.ROSLibException:
+                    # robust to bad manifests
+                    continue
+                for d in self._depends1[name]:
+                    depends_on1.setdefault(d, []).append(name)
+            self._depends_on1 = depends_on1
+        return self._depends_on1
+
+    @roslib.locks.synchronized
+    def get_matrix(self):
+        """
+        @return: closure matrix of every resource with a valid
+            manifest, rebuilt whenever the graph changes
+        @rtype: L{DependencyMatrix}
+        """
+        self.update()
+        if self._matrix is None:
+            # loads every manifest and skips invalid ones
+            self._get_depends_on1()
+            self._matrix = DependencyMatrix(self._depends1)
+        return self._matrix
+
+    @roslib.locks.synchronized
+    def get_depends_on1(self, name):
+        """
+        @param name: package or stack name
+        @type  name: str
+        @return: names that depend directly on name, sorted
+        @rtype: [str]
+        """
+        self.update()
+        return list(self._get_depends_on1().get(name, []))
+
+    @roslib.locks.synchronized
+    def get_depends_on(self, name):
+        """
+        @param name: package or stack name
+        @type  name: str
+        @return: names that depend on name, directly or indirectly, sorted
+        @rtype: [str]
+        """
+        self.update()
+        depends_on = self._depends_on.get(name)
+        if depends_on is None:
+            depends_on1 = self._get_depends_on1()
+            seen = set()
+            todo = [name]
+            while todo:
+                for n in depends_on1.get(todo.pop(), []):
+                    if n not in seen:
+                        seen.add(n)
+                        todo.append(n)
+            seen.discard(name)
+            depends_on = self._depends_on[name] = sorted(seen)
+        return list(depends_on)
+
+    @roslib.locks.synchronized
+    def get_plugins(self, name, attrib):
+        """
+        Collect the exports that packages depending directly on name,
+        and name itself, declare for name. ${prefix} in the values is
+        replaced with the exporting package's directory.
+
+        @param name: package name
+        @type  name: str
+        @param attrib: export attribute, e.g. 'plugin'
+        @type  attrib: str
+        @return: (package, value) pairs
+        @rtype: [(str, str)]
+        @raise roslib.exceptions.ROSLibException: if name cannot be located
+        """
+        self.update()
+        self._load(name)
+        plugins = []
+        for p in self._get_depends_on1().get(name, []) + [name]:
+            for tag, attrs in self._exports[p]:
+                if tag == name and attrib in attrs:
+                    plugins.append((p, attrs[attrib].replace('${prefix}', self._locations[p])))
+        return plugins
+
+
+def _bits(mask):
+    """
+    @return: indices of the bits set in mask, in increasing order
+    @rtype: iter(int)
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class DependencyMatrix(object):
+    """
+    Transitive closure of a dependency graph. Every resource is
+    assigned a bit and each row of the forward and reverse closure is
+    an integer bitset, so set queries over many resources reduce to a
+    few bitwise operations. Names that are not in the matrix have no
+    dependencies and no dependents.
+    """
+
+    def __init__(self, depends1):
+        """
+        @param depends1: direct dependencies of each resource
+        @type  depends1: {str: [str]}
+        """
+        names = set(depends1.keys())
+        for depends in depends1.values():
+            names.update(depends)
+        self.names = sorted(names)
+        self.index = dict((n, i) for i, n in enumerate(self.names))
+        edges = [[self.index[d] for d in depends1.get(n, [])] for n in self.names]
+        self.forward = self._close(edges)
+        reverse = [0] * len(self.names)
+        for i, row in enumerate(self.forward):
+            bit = 1 << i
+            for j in _bits(row):
+                reverse[j] |= bit
+        self.reverse = reverse
+
+    def _close(self, edges):
+        """
+        @param edges: direct dependencies by index
+        @type  edges: [[int]]
+        @return: forward closure rows
+        @rtype: [int]
+        """
+        # visit in post-order so that a single pass closes a DAG
+        order = []
+        visited = [False] * len(edges)
+        for root in range(len(edges)):
+            if visited[root]:
+                continue
+            visited[root] = True
+            todo = [(root, iter(edges[root]))]
+            while todo:
+                i, children = todo[-1]
+                for j in children:
+                    if not visited[j]:
+                        visited[j] = True
+                        todo.append((j, iter(edges[j])))
+                        break
+                else:
+                    todo.pop()
+                    order.append(i)
+        rows = [0] * len(edges)
+        changed = True
+        # cycles need further passes until the rows stop growing
+        while changed:
+            changed = False
+            for i in order:
+                row = rows[i]
+                for j in edges[i]:
+                    row |= rows[j] | (1 << j)
+                if row != rows[i]:
+                    rows[i] = row
+                    changed = True
+        return rows
+
+    def mask(self, names):
+        """
+        @param names: resource names, unknown names are ignored
+        @type  names: [str]
+        @return: bitset of names
+        @rtype: int
+        """
+        mask = 0
+        for n in names:
+            i = self.index.get(n)
+            if i is not None:
+                mask |= 1 << i
+        return mask
+
+    def to_names(self, mask):
+        """
+        @param mask: bitset
+        @type  mask: int
+        @return: names of the bits set in mask, sorted
+        @rtype: [str]
+        """
+        names = self.names
+        return [names[i] for i in _bits(mask)]
+
+    def _union(self, rows, names):
+        mask = 0
+        for n in names:
+            i = self.index.get(n)
+            if i is not None:
+                mask |= rows[i]
+        return mask
+
+    def is_depend(self, name, depend):
+        """
+        @return: True if name depends on depend, directly or indirectly
+        @rtype: bool
+        """
+        i = self.index.get(name)
+        j = self.index.get(depend)
+        return i is not None and j is not None and bool(self.forward[i] >> j & 1)
+
+    def get_depends(self, name):
+        """
+        @return: names that name depends on, sorted
+        @rtype: [str]
+        """
+        return self.to_names(self._union(self.forward, [name]))
+
+    def get_depends_on(self, name):
+        """
+        @return: names that depend on name, sorted
+        @rtype: [str]
+        """
+        return self.to_names(self._union(self.reverse, [name]))
+
+    def get_depends_any(self, names):
+        """
+        @return: names that any of names depends on, sorted
+        @rtype: [str]
+        """
+        return self.to_names(self._union(self.forward, names))
+
+    def get_depends_on_any(self, names):
+        """
+        @return: names that depend on any of names, sorted
+        @rtype: [str]
+        """
+        return self.to_names(self._union(self.reverse, names))
+
+    def get_common_depends(self, names):
+        """
+        @return: names that all of names depend on, sorted
+        @rtype: [str]
+        """
+        mask = None
+        for n in names:
+            i = self.index.get(n)
+            row = self.forward[i] if i is not None else 0
+            mask = row if mask is None else mask & row
+        return self.to_names(mask or 0)
+
+
+class PackageGraph(DependencyGraph):
+    """
+    Package dependency graph backed by L{roslib.pkgindex.PackageIndex}.
+    """
+
+    kind = 'package'
+
+    def __init__(self, ros_root, ros_package_path):
+        super(PackageGraph, self).__init__(ros_root, ros_package_path)
+        # the index may be evicted and recreated, so remember which one
+        # the generation belongs to
+        self._index = None
+        self._generation = None
+
+    def _update_locations(self, force):
+        index = roslib.pkgindex.get_index(self.ros_root, self.ros_package_path)
+        index.update(force=force)
+        if index is self._index and index.generation == self._generation:
+            return False
+        self._index = index
+        self._generation = index.generation
+        self._locations = index.packages
+        return True
+
+    def _parse_manifest(self, d):
+        filename = os.path.join(d, rospkg.MANIFEST_FILE)
+        if os.path.isfile(filename):
+            root = _parse(filename)
+            depends = []
+            for e in root.findall('depend'):
+                if 'thirdparty' in e.attrib:
+                    continue
+                name = e.get('package')
+                if not name:
+                    raise roslib.exceptions.ROSLibException("invalid manifest [%s]: depend is missing 'package' attribute" % filename)
+                depends.append(name)
+            for name in depends:
+                if name not in self._locations:
+                    raise roslib.exceptions.ROSLibException("package '%s' depends on non-existent package '%s'" % (os.path.basename(d), name))
+        else:
+            filename = os.path.join(d, roslib.packages.PACKAGE_FILE)
+            root = _parse(filename)
+            depends = []
+            for e in root:
+                # dependencies that are not packages are system dependencies
+                if e.tag in PACKAGE_XML_DEPEND_TAGS and e.text and e.text.strip() in self._locations:
+                    depends.append(e.text.strip())
+        return filename, roslib.packages._unique(depends), _parse_exports(root)
+
+
+class StackGraph(DependencyGraph):
+    """
+    Stack dependency graph.
+    """
+
+    kind = 'stack'
+
+    def __init__(self, ros_root, ros_package_path):
+        super(StackGraph, self).__init__(ros_root, ros_package_path)
+        # {dir: mtime} of the crawl, None until the first crawl
+        self._dir_mtimes = None
+        self._crawled = 0.0
+
+    def _update_locations(self, force):
+        now = time.time()
+        if self._dir_mtimes is not None:
+            if not force and now - self._crawled <= roslib.pkgindex.get_cache_timeout():
+                return False
+            self._crawled = now
+            if roslib.pkgindex.check_mtimes(self._dir_mtimes):
+                return False
+        self._crawled = now
+        locations = {}
+        dir_mtimes = {}
+        paths = self.get_ros_paths()
+        for path in paths:
+            if not os.path.isdir(path):
+                dir_mtimes[path] = None
+        for stack, d in roslib.stacks._crawl_stacks(paths, dir_mtimes=dir_mtimes):
+            if stack not in locations:
+                locations[stack] = d
+        self._locations = locations
+        self._dir_mtimes = dir_mtimes
+        return True
+
+    def _parse_manifest(self, d):
+        filename = os.path.join(d, roslib.stacks.STACK_FILE)
+        root = _parse(filename)
+        depends = []
+        for e in root.findall('depend'):
+            name = e.get('stack')
+            if not name:
+                raise roslib.exceptions.ROSLibException("invalid manifest [%s]: depend is missing 'stack' attribute" % filename)
+            if name not in self._locations:
+                raise roslib.exceptions.ROSLibException("stack '%s' depends on non-existent stack '%s'" % (os.path.basename(d), name))
+            depends.append(name)
+        return filename, roslib.packages._unique(depends), _parse_exports(root)
+
+
+# {(kind, ros_root, ros_package_path): DependencyGraph}
+_graphs = roslib.pkgindex.EnvCache(limit=2 * roslib.pkgindex.MAX_ENVIRONMENTS)
+
+
+def _get_graph(cls, ros_root, ros_package_path):
+    ros_root, ros_package_path = roslib.packages._resolve_ros_env(ros_root, ros_package_path)
+    return _graphs.get((cls.kind, ros_root, ros_package_path), lambda: cls(ros_root, ros_package_path))
+
+
+def get_package_graph(ros_root=None, ros_package_path=None):
+    """
+    @param ros_root: (optional) override ROS_ROOT
+    @type  ros_root: str
+    @param ros_package_path: (optional) override ROS_PACKAGE_PATH
+    @type  ros_package_path: str
+    @return: package dependency graph for the environment
+    @rtype: L{PackageGraph}
+    """
+    return _get_graph(PackageGraph, ros_root, ros_package_path)
+
+
+def get_stack_graph(ros_root=None, ros_package_path=None):
+    """
+    @param ros_root: (optional) override ROS_ROOT
+    @type  ros_root: str
+    @param ros_package_path: (optional) override ROS_PACKAGE_PATH
+    @type  ros_package_path: str
+    @return: stack dependency graph for the environment
+    @rtype: L{StackGraph}
+    """
+    return _get_graph(StackGraph, ros_root, ros_package_path)
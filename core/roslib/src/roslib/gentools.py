@@ -50,8 +50,11 @@ try:
 except ImportError:
     from io import StringIO  # Python 3.x
 
+import roslib.depgraph
+import roslib.exceptions
 import roslib.msgs
 import roslib.names
+import roslib.packages
 import roslib.srvs
 from roslib.msgs import MsgSpecException
 
@@ -61,59 +64,216 @@ import rospkg
 _header_type_name = 'std_msgs/Header'
 
 
-def _add_msgs_depends(rospack, spec, deps, package_context):
+def _get_valid_packages(package_context, rospack):
     """
-    Add the list of message types that spec depends on to depends.
-    @param spec: message to compute dependencies for
-    @type  spec: roslib.msgs.MsgSpec/roslib.srvs.SrvSpec
-    @param deps [str]: list of dependencies. This list will be updated
-    with the dependencies of spec when the method completes
-    @type  deps: [str]
-    @raise KeyError for invalid dependent types due to missing package dependencies.
+    @param rospack: package manager, or None to use the shared
+    L{roslib.depgraph.DependencyMatrix} of the environment
+    @type  rospack: L{rospkg.RosPack}
+    @return: packages whose messages may be loaded in package_context
+    @rtype: [str]
     """
-    def _get_valid_packages(package_context, rospack):
-        valid_packages = ['', package_context]
+    valid_packages = ['', package_context]
+    if rospack is None:
         try:
-            valid_packages = valid_packages + rospack.get_depends(package_context, implicit=True)
-        except rospkg.ResourceNotFound:
-            # this happens in dynamic generation situations where the
-            # package is not present.  we soft fail here because we assume
-            # missing messages will be caught later during lookup.
-            pass
-        return valid_packages
-
-    valid_packages = None
-
-    for t in spec.types:
-        t = roslib.msgs.base_msg_type(t)
-        if not roslib.msgs.is_builtin(t):
-            t_package, t_base = roslib.names.package_resource_name(t)
+            # only parses the manifests in the closure of package_context
+            return valid_packages + roslib.depgraph.get_package_graph().get_depends(package_context)
+        except roslib.exceptions.ROSLibException:
+            # soft fail the same way as below
+            return valid_packages
+    try:
+        valid_packages = valid_packages + rospack.get_depends(package_context, implicit=True)
+    except rospkg.ResourceNotFound:
+        # this happens in dynamic generation situations where the
+        # package is not present.  we soft fail here because we assume
+        # missing messages will be caught later during lookup.
+        pass
+    return valid_packages
+
+
+class _TypeNode(object):
+    """
+    Dependencies contributed by a field of a message type.
+    """
+    __slots__ = ['deps', 'uniquedeps']
+
+    def __init__(self, deps, uniquedeps):
+        # type names in depth-first order, with duplicates
+        self.deps = deps
+        # deps with duplicates removed
+        self.uniquedeps = uniquedeps
+
 
-            # special mapping for header
-            if t == roslib.msgs.HEADER:
-                # have to re-names Header
-                deps.append(_header_type_name)
+def _merge(lists, seen=None):
+    """
+    @return: concatenation of lists without duplicates, keeping the
+        first occurrence of each element
+    @rtype: list
+    """
+    if seen is None:
+        seen = set()
+    merged = []
+    for lst in lists:
+        for x in lst:
+            if x not in seen:
+                seen.add(x)
+                merged.append(x)
+    return merged
+
+
+class TypeGraph(object):
+    """
+    Dependency DAG of message types, which is built once per state of
+    the roslib.msgs registry, see L{get_type_graph()}. Nodes are the
+    types of message fields in the package context of the message
+    that dependencies are computed for, as that context resolves
+    relative type names. Each node caches its dependency list and its
+    unique dependencies. Types that are
+    not registered yet are loaded and registered while the graph is
+    built; this does not invalidate the graph.
+    """
 
-            if roslib.msgs.is_registered(t):
-                depspec = roslib.msgs.get_registered(t)
+    def __init__(self):
+        self.generation = roslib.msgs._registry_generation
+        # {(package_context, type): _TypeNode}
+        self._nodes = {}
+        # {(package_context, rospack key): (rospack, frozenset)}
+        self._valid_packages = {}
+        # {(registry key, package): (md5, files checked, registry
+        # generation)} of the types embedded in other types, see
+        # _compute_sub_md5()
+        self.md5s = {}
+
+    def is_current(self):
+        """
+        @return: True if the registry has not been changed by others
+            since the graph was created
+        @rtype: bool
+        """
+        return self.generation == roslib.msgs._registry_generation
+
+    def _register(self, key, spec):
+        current = self.is_current()
+        previous = roslib.msgs.REGISTERED_TYPES.get(key)
+        roslib.msgs.register(key, spec)
+        # new types leave the graph valid, but a replaced type may
+        # change the nodes and md5s of every type that embeds it
+        if current and previous is None:
+            self.generation = roslib.msgs._registry_generation
+
+    def _is_valid_package(self, package, package_context, rospack):
+        if rospack is None:
+            cache_key = (package_context, roslib.packages._resolve_ros_env())
+        else:
+            cache_key = (package_context, id(rospack))
+        entry = self._valid_packages.get(cache_key)
+        if entry is None:
+            # the rospack is kept so that its id is not reused
+            entry = (rospack, frozenset(_get_valid_packages(package_context, rospack)))
+            self._valid_packages[cache_key] = entry
+        return package in entry[1]
+
+    def _get_node(self, t, package_context, rospack, building):
+        """
+        @param t: base type of a field, not a builtin
+        @type  t: str
+        @param building: keys of the nodes being built by this call, to
+            detect cycles. The graph is shared by threads, so this must
+            not be shared.
+        @type  building: set
+        @raise KeyError: for types that may not be loaded due to
+            missing package dependencies
+        @raise MsgSpecException: if types depend on each other
+        """
+        node_key = (package_context, t)
+        node = self._nodes.get(node_key)
+        if node is not None:
+            return node
+        if node_key in building:
+            raise MsgSpecException('Circular dependency of message type [%s]' % t)
+
+        deps = []
+        # special mapping for header
+        if t == roslib.msgs.HEADER:
+            # have to re-names Header
+            deps.append(_header_type_name)
+        if roslib.msgs.is_registered(t):
+            depspec = roslib.msgs.get_registered(t)
+            if t != roslib.msgs.HEADER:
+                if '/' in t:
+                    deps.append(t)
+                else:
+                    deps.append(package_context+'/'+t)
+        else:
+            t_package, t_base = roslib.names.package_resource_name(t)
+            if self._is_valid_package(t_package, package_context, rospack):
+                # if we are allowed to load the message, load it.
+                key, depspec = roslib.msgs.load_by_type(t, package_context)
                 if t != roslib.msgs.HEADER:
-                    if '/' in t:
-                        deps.append(t)
-                    else:
-                        deps.append(package_context+'/'+t)
+                    deps.append(key)
+                self._register(key, depspec)
             else:
-                if valid_packages is None:
-                    valid_packages = _get_valid_packages(package_context, rospack)
-                if t_package in valid_packages:
-                    # if we are allowed to load the message, load it.
-                    key, depspec = roslib.msgs.load_by_type(t, package_context)
-                    if t != roslib.msgs.HEADER:
-                        deps.append(key)
-                    roslib.msgs.register(key, depspec)
-                else:
-                    # not allowed to load the message, so error.
-                    raise KeyError(t)
-            _add_msgs_depends(rospack, depspec, deps, package_context)
+                # not allowed to load the message, so error.
+                raise KeyError(t)
+
+        building.add(node_key)
+        try:
+            sub = self.expand([depspec], package_context, rospack, building)
+        finally:
+            building.discard(node_key)
+        node = _TypeNode(deps + sub.deps, _merge([deps, sub.uniquedeps]))
+        self._nodes[node_key] = node
+        return node
+
+    def expand(self, specs, package_context, rospack=None, building=None):
+        """
+        Compute the dependencies of message specs.
+
+        @param specs: message specs, e.g. the request and response of a
+            service
+        @type  specs: [L{roslib.msgs.MsgSpec}]
+        @param package_context: package that relative type names are
+            resolved in
+        @type  package_context: str
+        @param rospack: package manager to check package dependencies
+            with, see L{get_dependencies()}
+        @type  rospack: L{rospkg.RosPack}
+        @param building: (internal) nodes being built by the caller
+        @type  building: set
+        @return: dependencies, see L{_TypeNode}
+        @rtype: L{_TypeNode}
+        @raise KeyError: for types that may not be loaded due to
+            missing package dependencies
+        """
+        if building is None:
+            building = set()
+        nodes = []
+        for spec in specs:
+            for t in spec.types:
+                t = roslib.msgs.base_msg_type(t)
+                if not roslib.msgs.is_builtin(t):
+                    nodes.append(self._get_node(t, package_context, rospack, building))
+        if len(nodes) == 1:
+            return nodes[0]
+        deps = []
+        for n in nodes:
+            deps.extend(n.deps)
+        return _TypeNode(deps, _merge([n.uniquedeps for n in nodes]))
+
+
+_type_graph = None
+
+
+def get_type_graph():
+    """
+    @return: dependency graph of the current state of the roslib.msgs
+        registry
+    @rtype: L{TypeGraph}
+    """
+    global _type_graph
+    graph = _type_graph
+    if graph is None or not graph.is_current():
+        graph = _type_graph = TypeGraph()
+    return graph
 
 
 def compute_md5_text(get_deps_dict, spec, rospack=None):
@@ -150,16 +310,48 @@ def compute_md5_text(get_deps_dict, spec, rospack=None):
             if base_msg_type == roslib.msgs.HEADER:
                 base_msg_type = _header_type_name
 
-            sub_pkg, _ = roslib.names.package_resource_name(base_msg_type)
-            sub_pkg = sub_pkg or package
-            sub_spec = roslib.msgs.get_registered(base_msg_type, package)
-            sub_deps = get_dependencies(sub_spec, sub_pkg, compute_files=compute_files, rospack=rospack)
-            sub_md5 = compute_md5(sub_deps, rospack)
+            sub_md5 = _compute_sub_md5(base_msg_type, package, compute_files, rospack)
             buff.write('%s %s\n' % (sub_md5, name))
 
     return buff.getvalue().strip()  # remove trailing new line
 
 
+def _compute_sub_md5(base_msg_type, package, compute_files, rospack):
+    """
+    Compute the md5 of a type that is embedded in a message. Results
+    are memoized per registered type until the registry changes, so
+    each distinct type of a message tree is hashed once.
+
+    @param base_msg_type: embedded type
+    @type  base_msg_type: str
+    @param package: package of the embedding message
+    @type  package: str
+    @return: md5 hash
+    @rtype: str
+    """
+    sub_pkg, _ = roslib.names.package_resource_name(base_msg_type)
+    sub_pkg = sub_pkg or package
+    # registry key that get_registered() resolves base_msg_type to
+    if roslib.msgs.is_registered(base_msg_type) or not package:
+        key = base_msg_type
+    else:
+        key = roslib.names.resource_name(package, base_msg_type)
+    memo = get_type_graph().md5s
+    memo_key = (key, sub_pkg)
+    entry = memo.get(memo_key)
+    if entry is not None and entry[2] == roslib.msgs._registry_generation and \
+            (entry[1] or not compute_files):
+        return entry[0]
+
+    generation = roslib.msgs._registry_generation
+    sub_spec = roslib.msgs.get_registered(base_msg_type, package)
+    sub_deps = get_dependencies(sub_spec, sub_pkg, compute_files=compute_files, rospack=rospack)
+    sub_md5 = compute_md5(sub_deps, rospack)
+    if generation == roslib.msgs._registry_generation:
+        memo[memo_key] = (sub_md5, compute_files, generation)
+    return sub_md5
+
+
 def _compute_hash(get_deps_dict, hash, rospack=None):
     """
     subroutine of compute_md5()
@@ -279,7 +471,7 @@ def get_file_dependencies(f, stdout=sys.stdout, stderr=sys.stderr, rospack=None)
     instance.
     @rtype: dict
     """
-    package = rospkg.get_package_name(f)
+    _, package = roslib.packages.get_path_pkg(f)
     spec = None
     if f.endswith(roslib.msgs.EXT):
         _, spec = roslib.msgs.load_from_file(f)
@@ -319,37 +511,35 @@ def get_dependencies(spec, package, compute_files=True, stdout=sys.stdout, stder
     # we're going to manipulate internal apis of msgs, so have to manually init
     roslib.msgs._init()
 
-    deps = []
     try:
-        if not rospack:
-            rospack = rospkg.RosPack()
         if isinstance(spec, roslib.msgs.MsgSpec):
-            _add_msgs_depends(rospack, spec, deps, package)
+            specs = [spec]
         elif isinstance(spec, roslib.srvs.SrvSpec):
-            _add_msgs_depends(rospack, spec.request, deps, package)
-            _add_msgs_depends(rospack, spec.response, deps, package)
+            specs = [spec.request, spec.response]
         else:
             raise MsgSpecException('spec does not appear to be a message or service')
+        node = get_type_graph().expand(specs, package, rospack)
     except KeyError as e:
         raise MsgSpecException('Cannot load type %s.  Perhaps the package is missing a dependency.' % (str(e)))
+    deps = list(node.deps)
+    uniquedeps = list(node.uniquedeps)
 
     # convert from type names to file names
 
     if compute_files:
-        files = {}
+        # resolve all files with one package index lookup
+        resources = {}
         for d in set(deps):
             d_pkg, t = roslib.names.package_resource_name(d)
             d_pkg = d_pkg or package  # convert '' -> local package
-            files[d] = roslib.msgs.msg_file(d_pkg, t)
+            resources[d] = (d_pkg, 'msg', t + roslib.msgs.EXT)
+        paths, errors = roslib.packages.resource_files(resources.values())
+        if errors:
+            raise list(errors.values())[0]
+        files = dict((d, paths[r]) for d, r in resources.items())
     else:
         files = None
 
-    # create unique dependency list
-    uniquedeps = []
-    for d in deps:
-        if d not in uniquedeps:
-            uniquedeps.append(d)
-
     if compute_files:
         return {'files': files, 'deps': deps, 'spec': spec, 'package': package, 'uniquedeps': uniquedeps}
     else:
@@ -0,0 +1,226 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2008, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Meta path finder for the Python modules of ROS packages.
+
+L{roslib.launcher.load_manifest} traditionally prepends the C{src} and
+C{lib} directories of a package and all of its dependencies to
+sys.path, so every later import of the process probes all of them.
+Once L{install}ed, a L{PackageFinder} takes those directories instead
+and maps the top-level modules that they contain straight to their
+directory (PEP 451). Imports of other modules cost a single dictionary
+lookup.
+
+The finder is fed with the directories of the bootstrap plans of
+load_manifest() rather than with every package of the package index:
+only the plans know the python paths that packages export in their
+manifests, and only packages that were loaded with load_manifest() may
+be importable, as before.
+
+The finder is opt-in: call L{install} or set ROS_IMPORT_FINDER=1
+before the first load_manifest() call. Code that reads sys.path
+directly (e.g. to build the PYTHONPATH of a child process) does not see
+the package directories while it is installed.
+"""
+
+import os
+import sys
+import threading
+
+try:
+    import importlib.machinery as machinery
+except ImportError:  # Python 2
+    machinery = None
+
+# set to 1 to install the finder on the first load_manifest() call
+ROS_IMPORT_FINDER = 'ROS_IMPORT_FINDER'
+
+_finder = None
+_finder_lock = threading.Lock()
+
+
+def is_supported():
+    """
+    @return: True if the interpreter supports PEP 451 finders
+    @rtype: bool
+    """
+    return machinery is not None and hasattr(machinery.PathFinder, 'find_spec')
+
+
+def is_enabled(env=None):
+    """
+    @param env: override os.environ dictionary
+    @type  env: dict
+    @return: True if the finder is requested by the environment
+    @rtype: bool
+    """
+    if env is None:
+        env = os.environ
+    return env.get(ROS_IMPORT_FINDER, '0') == '1'
+
+
+def _list_modules(d):
+    """
+    @param d: directory on the Python path
+    @type  d: str
+    @return: names of the top-level modules and packages in d
+    @rtype: set
+    """
+    try:
+        entries = os.listdir(d)
+    except OSError:
+        return set()
+    # longest first, e.g. '.cpython-38-x86_64-linux-gnu.so' before '.so'
+    suffixes = sorted(machinery.all_suffixes(), key=len, reverse=True)
+    modules = set()
+    for e in entries:
+        for s in suffixes:
+            if e.endswith(s) and len(e) > len(s):
+                modules.add(e[:-len(s)])
+                break
+        else:
+            if os.path.isfile(os.path.join(d, e, '__init__.py')):
+                modules.add(e)
+    return modules
+
+
+class PackageFinder(object):
+    """
+    Finds top-level modules in the directories of bootstrapped ROS
+    packages. Directories added last take precedence, just like
+    directories prepended to sys.path.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # directories in precedence order
+        self._paths = []
+        # {directory: set of module names}
+        self._listings = {}
+        # {module name: directory}, replaced as a whole on updates
+        self._modules = {}
+
+    def get_paths(self):
+        """
+        @return: directories of the finder in precedence order
+        @rtype: [str]
+        """
+        return list(self._paths)
+
+    def add_paths(self, paths):
+        """
+        Add directories in front of the ones already known.
+
+        @param paths: directories in precedence order
+        @type  paths: [str]
+        """
+        with self._lock:
+            self._paths = paths + [p for p in self._paths if p not in paths]
+            self._index()
+
+    def _index(self):
+        modules = {}
+        for d in reversed(self._paths):
+            if d not in self._listings:
+                self._listings[d] = _list_modules(d)
+            for name in self._listings[d]:
+                modules[name] = d
+        self._modules = modules
+
+    def invalidate_caches(self):
+        """
+        Relist the directories, called by C{importlib.invalidate_caches()}.
+        """
+        with self._lock:
+            self._listings = {}
+            self._index()
+
+    def find_spec(self, fullname, path=None, target=None):
+        """
+        PEP 451 finder method. Only top-level modules are found here,
+        submodules are found through the C{__path__} of their package.
+        """
+        if path is not None:
+            return None
+        d = self._modules.get(fullname)
+        if d is None:
+            return None
+        return machinery.PathFinder.find_spec(fullname, [d], target)
+
+
+def get_finder():
+    """
+    @return: the installed finder, None if it is not installed
+    @rtype: L{PackageFinder}
+    """
+    return _finder
+
+
+def install():
+    """
+    Install a L{PackageFinder} right before the sys.path based finder
+    in sys.meta_path, so that it shadows the same modules as
+    directories prepended to sys.path would, but never builtin or
+    frozen modules. Packages that are bootstrapped from now on are
+    added to it instead of sys.path.
+
+    @return: installed finder, None if the interpreter does not
+        support PEP 451
+    @rtype: L{PackageFinder}
+    """
+    global _finder
+    if not is_supported():
+        return None
+    with _finder_lock:
+        if _finder is None:
+            _finder = PackageFinder()
+            if machinery.PathFinder in sys.meta_path:
+                sys.meta_path.insert(sys.meta_path.index(machinery.PathFinder), _finder)
+            else:
+                sys.meta_path.append(_finder)
+        return _finder
+
+
+def uninstall():
+    """
+    Remove the finder. Its directories are prepended to sys.path so
+    that modules that are already bootstrapped remain importable.
+    """
+    global _finder
+    with _finder_lock:
+        if _finder is None:
+            return
+        if _finder in sys.meta_path:
+            sys.meta_path.remove(_finder)
+        sys.path[:0] = _finder.get_paths()
+        _finder = None
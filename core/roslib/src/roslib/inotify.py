@@ -0,0 +1,482 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2008, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Optional Linux inotify watcher that keeps roslib's package, stack and
+manifest caches current for long-running processes.
+
+The watcher binds inotify with ctypes, so it has no extra
+dependencies. It watches every directory that the package index
+crawled, and patches only the affected entries when directories
+appear, move or disappear or when manifests are edited. Usage::
+
+  import roslib.inotify
+  watcher = roslib.inotify.watch()  # None if inotify is unavailable
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+
+import roslib.crawler
+import roslib.packages
+import roslib.pkgindex
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | \
+    IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+# files whose presence decides how the crawler treats a directory
+MARKER_FILES = [roslib.packages.MANIFEST_FILE, roslib.packages.PACKAGE_FILE, 'stack.xml', 'rospack_nosubdirs']
+# files whose presence or content decides which subdirectories are crawled
+IGNORE_FILES = [roslib.crawler.IGNORE_FILE, roslib.crawler.CATKIN_IGNORE]
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = False
+        if sys.platform.startswith('linux'):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+                libc.inotify_init1.argtypes = [ctypes.c_int]
+                libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+                libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+                _libc = libc
+            except (OSError, AttributeError):
+                pass
+    return _libc
+
+
+def is_available():
+    """
+    @return: True if inotify can be used on this platform
+    @rtype: bool
+    """
+    return bool(_get_libc())
+
+
+class Inotify(object):
+    """
+    Minimal ctypes wrapper around an inotify file descriptor.
+    """
+
+    def __init__(self):
+        self._libc = _get_libc()
+        if not self._libc:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self.fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        """
+        @return: watch descriptor
+        @rtype: int
+        @raise OSError: if the watch cannot be added, e.g. ENOSPC
+            when fs.inotify.max_user_watches is exhausted
+        """
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self):
+        """
+        Read all pending events. Blocks until at least one is available.
+
+        @return: list of (wd, mask, cookie, name)
+        @rtype: [(int, int, int, str)]
+        """
+        buff = os.read(self.fd, 65536)
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buff):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(buff, offset)
+            offset += _EVENT_HEADER.size
+            name = buff[offset:offset + length].rstrip(b'\0')
+            offset += length
+            events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PackageWatcher(object):
+    """
+    Keeps a L{roslib.pkgindex.PackageIndex} and the rospkg caches of
+    roslib.stacks and roslib.launcher current from a background
+    thread.
+    """
+
+    def __init__(self, index):
+        """
+        @param index: index to keep current
+        @type  index: L{roslib.pkgindex.PackageIndex}
+        """
+        self.index = index
+        self._inotify = Inotify()
+        self._lock = threading.Lock()
+        # {wd: dir} and {dir: wd}
+        self._wd_dirs = {}
+        self._dir_wds = {}
+        self._complete = True
+        self._thread = None
+        self._stop_r, self._stop_w = os.pipe()
+
+    def start(self):
+        """
+        Start watching in a daemon thread.
+        """
+        self.index.update()
+        self.index.listeners.append(self._sync)
+        self._sync(self.index)
+        self._thread = threading.Thread(target=self._run, name='roslib.inotify')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop watching. Caches fall back to mtime-based revalidation.
+        """
+        self._detach()
+        if self._thread is not None:
+            if self._thread.is_alive():
+                os.write(self._stop_w, b'x')
+            self._thread.join()
+            self._thread = None
+        if self._stop_r is not None:
+            self._inotify.close()
+            os.close(self._stop_r)
+            os.close(self._stop_w)
+            self._stop_r = self._stop_w = None
+
+    def _detach(self):
+        """
+        Stop keeping the index current and let the next L{watch()}
+        start a new watcher.
+        """
+        self.index.watched = False
+        if self._sync in self.index.listeners:
+            self.index.listeners.remove(self._sync)
+        with _watchers_lock:
+            for key, watcher in list(_watchers.items()):
+                if watcher is self:
+                    _watchers.pop(key, None)
+
+    def _add_watch(self, d):
+        if d in self._dir_wds:
+            return
+        try:
+            wd = self._inotify.add_watch(d)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                # out of watches, we can't vouch for the index anymore
+                self._complete = False
+            return
+        self._wd_dirs[wd] = d
+        self._dir_wds[d] = wd
+
+    def _remove_watches(self, path):
+        prefix = path + os.sep
+        for d in [d for d in self._dir_wds if d == path or d.startswith(prefix)]:
+            wd = self._dir_wds.pop(d)
+            self._wd_dirs.pop(wd, None)
+            self._inotify.rm_watch(wd)
+
+    def _sync(self, index):
+        """
+        Watch exactly the directories the index crawled.
+        """
+        with self._lock:
+            dirs = set(d for d, mtime in list(index.dir_mtimes.items()) if mtime is not None and _is_dir_entry(d))
+            for d in [d for d in self._dir_wds if d not in dirs]:
+                wd = self._dir_wds.pop(d)
+                self._wd_dirs.pop(wd, None)
+                self._inotify.rm_watch(wd)
+            self._complete = True
+            for d in dirs:
+                self._add_watch(d)
+            index.watched = self._complete
+
+    def _run(self):
+        while True:
+            try:
+                r, _, _ = select.select([self._inotify.fd, self._stop_r], [], [])
+                if self._stop_r in r:
+                    return
+                events = self._inotify.read()
+            except (OSError, select.error) as e:
+                if e.args and e.args[0] in (errno.EINTR, errno.EAGAIN):
+                    continue
+                # the descriptor is gone, e.g. EBADF, retrying would
+                # spin. Give up and fall back to revalidation.
+                self._detach()
+                self.index.invalidate()
+                _reset_managers(self.index)
+                return
+            try:
+                # same lock order as a rebuild that calls _sync()
+                with self.index._lock, self._lock:
+                    saved = _saved_state(self.index)
+                    for wd, mask, _, name in events:
+                        self._handle(wd, mask, name)
+                    self.index.watched = self._complete
+                    # most events are edits of ordinary files
+                    changed = _saved_state(self.index) != saved
+                if changed:
+                    self.index.save()
+            except Exception:
+                # never serve stale data because of a bug in here
+                self.index.invalidate()
+                _reset_managers(self.index)
+
+    def _handle(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            self.index.invalidate()
+            _reset_managers(self.index)
+            return
+        d = self._wd_dirs.get(wd)
+        if d is None:
+            return
+        if mask & IN_IGNORED:
+            del self._wd_dirs[wd]
+            self._dir_wds.pop(d, None)
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            # parent directories report this for everything but the roots
+            self._forget(d)
+            return
+        path = os.path.join(d, name)
+        if name in IGNORE_FILES:
+            # the rules may cover anything below d
+            self._forget(d)
+            if os.path.isdir(d):
+                self._learn(d)
+        elif name in MARKER_FILES:
+            if mask & IN_CLOSE_WRITE:
+                _drop_manifests(self.index, d)
+                self.index.update_stack(d)
+            else:
+                # the directory changed between package, stack and plain
+                self._forget(d)
+                if os.path.isdir(d):
+                    self._learn(d)
+        elif name == roslib.pkgindex.STACK_CMAKE_FILE:
+            # may declare the stack version
+            self.index.update_stack(d)
+        elif mask & IN_ISDIR and not _is_leaf(d):
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                if not roslib.packages._is_vcs_dir(name):
+                    self._learn(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._forget(path)
+
+    def _learn(self, path):
+        added, dirs = self.index.add_tree(path)
+        for d in dirs:
+            self._add_watch(d)
+        _add_to_managers(self.index, path, added)
+        # entries created between crawling a directory and watching it
+        # produce no event, catch them by comparing mtimes
+        for d in dirs:
+            try:
+                changed = os.stat(d).st_mtime != self.index.dir_mtimes.get(d)
+            except OSError:
+                changed = False
+            if changed:
+                self._forget(d)
+                self._learn(d)
+
+    def _forget(self, path):
+        self._remove_watches(path)
+        self.index.remove_tree(path)
+        _remove_from_managers(self.index, path)
+
+
+def _saved_state(index):
+    """
+    @return: the parts of index that L{roslib.pkgindex.PackageIndex.save()}
+        writes. The index replaces rather than modifies them, so the
+        result can be compared with a later one.
+    @rtype: tuple
+    """
+    return (index.packages, index.stacks, index.package_stacks, index.dir_mtimes)
+
+
+def _is_dir_entry(d):
+    """
+    @return: False for the files that the index records alongside
+        directories
+    @rtype: bool
+    """
+    return not roslib.pkgindex._is_recorded_file(d)
+
+
+def _is_leaf(d):
+    for f in MARKER_FILES:
+        if f != 'stack.xml' and os.path.exists(os.path.join(d, f)):
+            return True
+    return False
+
+
+def _get_managers(index):
+    """
+    @return: the rospkg RosPack/RosStack caches of roslib that are
+        configured for the same ROS path as index
+    @rtype: [rospkg.ManifestManager]
+    """
+    import roslib.launcher
+    import roslib.stacks
+    ros_paths = index.get_ros_paths()
+    managers = [m for m in [roslib.launcher._rospack] if m is not None]
+    for cache in [roslib.stacks._rosstacks, roslib.stacks._rospacks]:
+        managers.extend([entry[0] for entry in cache.values() if entry[0] is not None])
+    return [m for m in managers if m.get_ros_paths() == ros_paths]
+
+
+def _forget_names(manager, names):
+    import roslib.launcher
+    for name in names:
+        if manager._location_cache is not None:
+            manager._location_cache.pop(name, None)
+        manager._manifests.pop(name, None)
+        with roslib.launcher._bootstrap_lock:
+            if name in roslib.launcher._bootstrapped:
+                roslib.launcher._bootstrapped.remove(name)
+    if names:
+        # dependencies are transitive, so any of them may be affected
+        manager._depends_cache.clear()
+        manager._rosdeps_cache.clear()
+
+
+def _names_under(manager, path):
+    if manager._location_cache is None:
+        return []
+    prefix = path + os.sep
+    return [n for n, d in list(manager._location_cache.items()) if d == path or d.startswith(prefix)]
+
+
+def _drop_manifests(index, d):
+    for manager in _get_managers(index):
+        names = [n for n, md in list((manager._location_cache or {}).items()) if md == d]
+        for name in names:
+            manager._manifests.pop(name, None)
+        if names:
+            manager._depends_cache.clear()
+            manager._rosdeps_cache.clear()
+
+
+def _remove_from_managers(index, path):
+    for manager in _get_managers(index):
+        _forget_names(manager, _names_under(manager, path))
+
+
+def _add_to_managers(index, path, added_packages):
+    import roslib.launcher
+    import roslib.stacks
+    for manager in _get_managers(index):
+        if manager._location_cache is None:
+            continue
+        if manager is roslib.launcher._rospack:
+            found = [(p, index.packages[p]) for p in added_packages if p in index.packages]
+        else:
+            found = [(s, d) for s, d in roslib.stacks._crawl_stacks([path]) if s not in manager._location_cache]
+        _forget_names(manager, [name for name, _ in found])
+        for name, d in found:
+            manager._location_cache[name] = d
+
+
+def _reset_managers(index):
+    for manager in _get_managers(index):
+        _forget_names(manager, list((manager._location_cache or {}).keys()))
+        manager._location_cache = None
+
+
+# {(ros_root, ros_package_path): PackageWatcher}
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def watch(ros_root=None, ros_package_path=None):
+    """
+    Start keeping the caches for the specified environment current.
+    Calling watch() again for the same environment returns the running
+    watcher.
+
+    @param ros_root: if specified, override ROS_ROOT
+    @type  ros_root: str
+    @param ros_package_path: if specified, override ROS_PACKAGE_PATH
+    @type  ros_package_path: str
+    @return: running watcher, or None if inotify is not available
+    @rtype: L{PackageWatcher}
+    """
+    if not is_available():
+        return None
+    key = roslib.packages._resolve_ros_env(ros_root, ros_package_path)
+    with _watchers_lock:
+        watcher = _watchers.get(key)
+        if watcher is None:
+            watcher = PackageWatcher(roslib.pkgindex.get_index(*key))
+            watcher.start()
+            _watchers[key] = watcher
+        return watcher
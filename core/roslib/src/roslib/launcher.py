@@ -36,16 +36,46 @@ Python path loader for python scripts and applications. Paths are
 derived from dependency structure declared in ROS manifest files.
 """
 
+import hashlib
+import json
 import os
 import sys
+import threading
 
 import rospkg
 
+import roslib.importer
+
+# version of the on-disk bootstrap plan format, bump when it changes
+PLAN_VERSION = 1
+# set to 0 to disable persisted bootstrap plans
+ROS_BOOTSTRAP_CACHE = 'ROS_BOOTSTRAP_CACHE'
+# rosbuild and catkin manifests, a plan is stale when either changes
+_MANIFEST_FILES = [rospkg.MANIFEST_FILE, 'package.xml']
+
 # bootstrapped keeps track of which packages we've loaded so we don't
 # update the path multiple times
-_bootstrapped = []
-# _rospack is our cache of ROS package data
-_rospack = rospkg.RosPack()
+_bootstrapped = set()
+# _rospack is our cache of ROS package data, see _get_rospack()
+_rospack = None
+# serializes bootstrapping, which modifies sys.path as well as the two
+# caches above. Packages that are already bootstrapped are checked
+# without it.
+_bootstrap_lock = threading.RLock()
+# {(ros_path, ...): {package: plan}} loaded from and saved to get_plan_file()
+_plans = {}
+
+
+def _get_rospack():
+    """
+    :returns: package cache of load_manifest(), created on first use, ``rospkg.RosPack``
+    """
+    global _rospack
+    if _rospack is None:
+        with _bootstrap_lock:
+            if _rospack is None:
+                _rospack = rospkg.RosPack()
+    return _rospack
 
 
 def get_depends(package, rospack):
@@ -55,13 +85,143 @@ def get_depends(package, rospack):
 
 def load_manifest(package_name, bootstrap_version='0.7'):
     """
-    Update the Python sys.path with package's dependencies
+    Update the Python sys.path with package's dependencies, or the
+    finder of :mod:`roslib.importer` if it is installed
 
     :param package_name: name of the package that load_manifest() is being called from, ``str``
     """
     if package_name in _bootstrapped:
         return
-    sys.path = _generate_python_path(package_name, _rospack) + sys.path
+    with _bootstrap_lock:
+        if package_name in _bootstrapped:
+            return
+        plan = _get_plan(package_name, _get_rospack())
+        # only mark packages once their paths are visible
+        finder = roslib.importer.get_finder()
+        if finder is None and roslib.importer.is_enabled():
+            finder = roslib.importer.install()
+        if finder is not None:
+            finder.add_paths(plan['paths'])
+        else:
+            # later duplicates never take effect, so drop them instead of
+            # growing sys.path with every package
+            paths = set(plan['paths'])
+            sys.path = plan['paths'] + [p for p in sys.path if p not in paths]
+        _bootstrapped.update(plan['packages'])
+
+
+def is_plan_cache_enabled(env=None):
+    """
+    :param env: override os.environ dictionary, ``dict``
+    :returns: ``True`` if bootstrap plans are persisted in ROS_HOME, ``bool``
+    """
+    if env is None:
+        env = os.environ
+    return env.get(ROS_BOOTSTRAP_CACHE, '1') != '0'
+
+
+def get_plan_file(rospack, env=None):
+    """
+    :param rospack: package cache that plans are generated with, ``rospkg.RosPack``
+    :param env: override os.environ dictionary, ``dict``
+    :returns: path of the bootstrap plans for the ROS path of rospack, ``str``
+    """
+    import roslib.pkgindex
+    key = '\n'.join(rospack.get_ros_paths())
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(rospkg.get_ros_home(env), roslib.pkgindex.INDEX_DIR, 'bootstrap-%s.json' % digest)
+
+
+def _get_plan_mtimes(pkg_dir):
+    """
+    :returns: mtimes that a plan depends on for a package: its
+      manifests and its directory, which changes when ``src`` or
+      ``lib`` is created, ``{str: float}``
+    """
+    paths = [pkg_dir] + [os.path.join(pkg_dir, f) for f in _MANIFEST_FILES]
+    mtimes = {}
+    for p in paths:
+        try:
+            mtimes[p] = os.stat(p).st_mtime
+        except OSError:
+            mtimes[p] = None
+    return mtimes
+
+
+def _is_plan_valid(plan):
+    """
+    :param plan: bootstrap plan, ``dict``
+    :returns: ``True`` if none of the files the plan depends on has changed, ``bool``
+    """
+    for d, mtimes in plan['mtimes'].items():
+        if _get_plan_mtimes(d) != mtimes:
+            return False
+    return True
+
+
+def _load_plans(rospack):
+    """
+    :returns: persisted bootstrap plans, empty if there are none or
+      they cannot be read, ``{str: dict}``
+    """
+    if not is_plan_cache_enabled():
+        return {}
+    try:
+        with open(get_plan_file(rospack)) as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != PLAN_VERSION or \
+            data.get('ros_paths') != rospack.get_ros_paths():
+        return {}
+    return data.get('plans') or {}
+
+
+def _save_plans(rospack, plans):
+    if not is_plan_cache_enabled():
+        return
+    import roslib.pkgindex
+    roslib.pkgindex._write_json(get_plan_file(rospack), {
+        'version': PLAN_VERSION,
+        'ros_paths': rospack.get_ros_paths(),
+        'plans': plans,
+    })
+
+
+def _get_plan(pkg, rospack):
+    """
+    Get the bootstrap plan of a package, which is the ordered,
+    de-duplicated list of paths to prepend to sys.path along with the
+    packages that it covers. Plans are persisted in ROS_HOME and reused
+    as long as the manifests and directories of the covered packages
+    are unchanged.
+
+    :param pkg: package name, ``str``
+    :param rospack: package cache to generate the plan with, ``rospkg.RosPack``
+    :returns: ``{'paths': [str], 'packages': [str], 'mtimes': {str: {str: float}}}``
+    :raises: :exc:`rospkg.ResourceNotFound` If an error occurs while attempting to load package or dependencies
+    """
+    key = tuple(rospack.get_ros_paths())
+    plans = _plans.get(key)
+    if plans is None:
+        plans = _plans[key] = _load_plans(rospack)
+    plan = plans.get(pkg)
+    if plan is not None and _is_plan_valid(plan):
+        return plan
+
+    packages = []
+    paths = _generate_python_path(pkg, rospack, packages, set())
+    seen = set()
+    plan = {
+        'paths': [p for p in paths if not (p in seen or seen.add(p))],
+        'packages': packages,
+        'mtimes': dict((d, _get_plan_mtimes(d)) for d in set(rospack.get_path(p) for p in packages)),
+    }
+    plans = dict(plans)
+    plans[pkg] = plan
+    _plans[key] = plans
+    _save_plans(rospack, plans)
+    return plan
 
 
 def _append_package_paths(manifest_, paths, pkg_dir):
@@ -85,18 +245,27 @@ def _append_package_paths(manifest_, paths, pkg_dir):
         paths.extend([d for d in dirs if os.path.isdir(d)])
 
 
-def _generate_python_path(pkg, rospack):
+def _generate_python_path(pkg, rospack, bootstrapped=None, skip=None):
     """
     Recursive subroutine for building dependency list and python path
+    :param bootstrapped: list to record the bootstrapped packages in, defaults to ``_bootstrapped``
+    :param skip: packages to return no paths for, defaults to ``_bootstrapped``
     :raises: :exc:`rospkg.ResourceNotFound` If an error occurs while attempting to load package or dependencies
     """
-    if pkg in _bootstrapped:
+    if skip is None:
+        skip = _bootstrapped
+    if pkg in skip:
         return []
+    if bootstrapped is None:
+        bootstrapped = []
+        paths = _generate_python_path(pkg, rospack, bootstrapped, skip)
+        _bootstrapped.update(bootstrapped)
+        return paths
 
     # short-circuit if this is a catkin-ized package
     m = rospack.get_manifest(pkg)
     if m.is_catkin:
-        _bootstrapped.append(pkg)
+        bootstrapped.append(pkg)
         return []
 
     packages = get_depends(pkg, rospack)
@@ -108,9 +277,9 @@ def _generate_python_path(pkg, rospack):
             m = rospack.get_manifest(p)
             d = rospack.get_path(p)
             _append_package_paths(m, paths, d)
-            _bootstrapped.append(p)
+            bootstrapped.append(p)
     except Exception:
-        if pkg in _bootstrapped:
-            _bootstrapped.remove(pkg)
+        if pkg in bootstrapped:
+            bootstrapped.remove(pkg)
         raise
     return paths
@@ -0,0 +1,163 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2008, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Locking helpers for the module-level caches of roslib.
+
+Cache hits never take a lock: single dictionary and list operations are
+atomic in CPython, so readers only need the writers to publish complete
+objects. Misses are serialized per key with a L{StripedLock}, which
+lets lookups of different keys proceed in parallel while a key is only
+loaded once. L{SingleFlight} does the same for asyncio callers, which
+share one lookup per key on the executor of the event loop.
+"""
+
+import functools
+import threading
+
+# number of locks in a L{StripedLock}, a power of two
+DEFAULT_STRIPES = 16
+
+
+class StripedLock(object):
+    """
+    Fixed set of reentrant locks selected by the hash of a key.
+    """
+
+    def __init__(self, stripes=DEFAULT_STRIPES):
+        """
+        @param stripes: number of locks
+        @type  stripes: int
+        """
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def get(self, key):
+        """
+        @param key: hashable key
+        @return: lock guarding key
+        @rtype: threading.RLock
+        """
+        return self._locks[hash(key) % len(self._locks)]
+
+
+def synchronized(fn):
+    """
+    Method decorator that holds the C{_lock} attribute of the instance
+    while fn runs.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return fn(self, *args, **kwargs)
+    return wrapper
+
+
+class SingleFlight(object):
+    """
+    Coalesce concurrent asyncio requests for the same key into one call
+    of a blocking function, which runs on the default executor of the
+    event loop. Every caller gets its own future, so cancelling one
+    request does not cancel the shared call.
+    """
+
+    def __init__(self, copy=None):
+        """
+        @param copy: (optional) applied to the shared result for every
+            caller, e.g. C{list} for mutable results
+        @type  copy: fn(object) -> object
+        """
+        self.copy = copy
+        # {(loop, key): future} of the calls in flight
+        self._calls = {}
+
+    def _get_loop(self):
+        """
+        @return: event loop running in the calling thread
+        @raise RuntimeError: if no event loop is running
+        """
+        # imported on first use, it is expensive to import
+        try:
+            import asyncio
+        except ImportError:  # Python 2
+            raise RuntimeError('asyncio is not available')
+        try:
+            return asyncio.get_running_loop()
+        except AttributeError:  # Python < 3.7
+            loop = asyncio._get_running_loop()
+            if loop is None:
+                raise RuntimeError('no running event loop')
+            return loop
+
+    def done(self, value):
+        """
+        @return: future that already holds value, for callers that can
+            answer from a cache without blocking
+        @rtype: asyncio.Future
+        """
+        f = self._get_loop().create_future()
+        f.set_result(value)
+        return f
+
+    def run(self, key, fn, *args):
+        """
+        @param key: hashable key that identifies the request
+        @param fn: blocking function
+        @type  fn: fn(*args) -> object
+        @return: future for the result of fn(*args) or its exception
+        @rtype: asyncio.Future
+        """
+        loop = self._get_loop()
+        call_key = (loop, key)
+        call = self._calls.get(call_key)
+        if call is None:
+            call = loop.run_in_executor(None, fn, *args)
+            self._calls[call_key] = call
+
+            def finished(f):
+                if self._calls.get(call_key) is f:
+                    del self._calls[call_key]
+            call.add_done_callback(finished)
+
+        outer = loop.create_future()
+
+        def relay(f):
+            if outer.cancelled():
+                return
+            if f.cancelled():
+                outer.cancel()
+            elif f.exception() is not None:
+                outer.set_exception(f.exception())
+            else:
+                result = f.result()
+                outer.set_result(self.copy(result) if self.copy is not None else result)
+        call.add_done_callback(relay)
+        return outer
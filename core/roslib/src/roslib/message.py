@@ -55,6 +55,7 @@ from genpy.message import get_printable_message_args  # noqa: F401
 from genpy.message import strify_message  # noqa: F401
 
 import roslib
+import roslib.locks
 
 import rospkg
 
@@ -104,28 +105,58 @@ _message_class_cache = {}
 # cache for get_service_class
 _service_class_cache = {}
 
+# serialize loading of the same type, hits are not locked
+_class_locks = roslib.locks.StripedLock()
+
 
 def get_message_class(message_type, reload_on_error=False):
-    if message_type in _message_class_cache:
-        return _message_class_cache[message_type]
-    # try w/o bootstrapping
-    cls = genpy.message.get_message_class(message_type, reload_on_error=reload_on_error)
-    if cls is None:
-        # try old loader w/ bootstrapping
-        cls = _get_message_or_service_class('msg', message_type, reload_on_error=reload_on_error)
-    if cls:
-        _message_class_cache[message_type] = cls
-    return cls
+    cls = _message_class_cache.get(message_type)
+    if cls is not None:
+        return cls
+    with _class_locks.get(message_type):
+        if message_type in _message_class_cache:
+            return _message_class_cache[message_type]
+        # try w/o bootstrapping
+        cls = genpy.message.get_message_class(message_type, reload_on_error=reload_on_error)
+        if cls is None:
+            # try old loader w/ bootstrapping
+            cls = _get_message_or_service_class('msg', message_type, reload_on_error=reload_on_error)
+        if cls:
+            _message_class_cache[message_type] = cls
+        return cls
+
+
+_class_flights = roslib.locks.SingleFlight()
+
+
+def aget_message_class(message_type, reload_on_error=False):
+    """
+    asyncio version of L{get_message_class()}. Cached classes are
+    returned right away, others are loaded on the executor of the
+    running event loop and concurrent requests for the same type share
+    a single load.
+
+    @return: future for the message class or None
+    @rtype: asyncio.Future
+    """
+    cls = _message_class_cache.get(message_type)
+    if cls is not None:
+        return _class_flights.done(cls)
+    return _class_flights.run((message_type, reload_on_error), get_message_class, message_type, reload_on_error)
 
 
 def get_service_class(service_type, reload_on_error=False):
-    if service_type in _service_class_cache:
-        return _service_class_cache[service_type]
-    cls = genpy.message.get_service_class(service_type, reload_on_error=reload_on_error)
-    # try w/o bootstrapping
-    if cls is None:
-        # try old loader w/ bootstrapping
-        cls = _get_message_or_service_class('srv', service_type, reload_on_error=reload_on_error)
-    if cls:
-        _service_class_cache[service_type] = cls
-    return cls
+    cls = _service_class_cache.get(service_type)
+    if cls is not None:
+        return cls
+    with _class_locks.get(service_type):
+        if service_type in _service_class_cache:
+            return _service_class_cache[service_type]
+        cls = genpy.message.get_service_class(service_type, reload_on_error=reload_on_error)
+        # try w/o bootstrapping
+        if cls is None:
+            # try old loader w/ bootstrapping
+            cls = _get_message_or_service_class('srv', service_type, reload_on_error=reload_on_error)
+        if cls:
+            _service_class_cache[service_type] = cls
+        return cls
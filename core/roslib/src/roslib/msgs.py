@@ -46,16 +46,45 @@ try:
 except ImportError:
     from io import StringIO  # Python 3.x
 
+import ast
+import math
 import os
+import re
 import sys
+import threading
+import warnings
+import weakref
 
+try:
+    import builtins  # Python 3.x
+except ImportError:
+    import __builtin__ as builtins  # Python 2.x
+
+import roslib.locks
 import roslib.manifest
 import roslib.names
 import roslib.packages
 import roslib.resources
+import roslib.speccache
 
 import rospkg
 
+try:
+    _sys_intern = sys.intern  # Python 3.x
+except AttributeError:
+    _sys_intern = intern  # noqa: F821, Python 2.x
+
+
+def _intern(s):
+    """
+    Intern type and field names, which are repeated across specs.
+    """
+    try:
+        return _sys_intern(s)
+    except TypeError:  # unicode on Python 2.x
+        return s
+
+
 VERBOSE = False
 
 
@@ -222,8 +251,8 @@ class Constant(object):
         """
         if type is None or name is None or val is None or val_text is None:
             raise ValueError('Constant must have non-None parameters')
-        self.type = type_
-        self.name = name.strip()  # names are always stripped of whitespace
+        self.type = _intern(type_)
+        self.name = _intern(name.strip())  # names are always stripped of whitespace
         self.val = val
         self.val_text = val_text
 
@@ -275,24 +304,51 @@ class Field(object):
     is_builtin
     is_header
     """
+    __slots__ = ['name', 'type', 'base_type', 'is_array', 'array_len', 'is_builtin', 'is_header']
 
     def __init__(self, name, type):
-        self.name = name
-        self.type = type
-        (self.base_type, self.is_array, self.array_len) = parse_type(type)
-        self.is_header = is_header_type(self.base_type)
-        self.is_builtin = is_builtin(self.base_type)
+        self.name = _intern(name)
+        self.type = _intern(type)
+        (self.base_type, self.is_array, self.array_len, self.is_header, self.is_builtin) = _parse_field_type(self.type)
 
     def __repr__(self):
         return '[%s, %s, %s, %s, %s]' % (self.name, self.type, self.base_type, self.is_array, self.array_len)
 
 
+def _parse_field_type(type_):
+    """
+    @return: L{parse_type()} of type_, whether its base type is a
+        header and whether it is a builtin. Results are cached as the
+        same types occur in many specs.
+    @rtype: (str, bool, int, bool, bool)
+    @raise MsgSpecException: if type_ cannot be parsed
+    """
+    parsed = _field_types.get(type_)
+    if parsed is None:
+        base_type, is_array, array_len = parse_type(type_)
+        base_type = _intern(base_type)
+        parsed = (base_type, is_array, array_len, is_header_type(base_type), is_builtin(base_type))
+        if len(_field_types) >= _FIELD_TYPES_LIMIT:
+            # e.g. fixed array lengths or generated types
+            _field_types.clear()
+        _field_types[type_] = parsed
+    return parsed
+
+
+# maximum number of types that _parse_field_type() keeps cached
+_FIELD_TYPES_LIMIT = 4096
+# {type: result of _parse_field_type()}
+_field_types = {}
+
+
 class MsgSpec(object):
     """
     Container class for storing loaded msg description files. Field
     types and names are stored in separate lists with 1-to-1
     correspondence. MsgSpec can also return an md5 of the source text.
     """
+    __slots__ = ['types', 'names', 'constants', 'text', 'full_name', 'short_name', 'package',
+                 'header_present', '_parsed_fields', '__weakref__']
 
     def __init__(self, types, names, constants, text, full_name='', short_name='', package=''):
         """
@@ -374,18 +430,27 @@ def reinit():
     (e.g. genpy) that need to re-initialize the registration table.
     """
     global _initialized, _loaded_packages
-    # unset the initialized state and unregister everything
-    _initialized = False
-    del _loaded_packages[:]
-    REGISTERED_TYPES.clear()
-    _init()
+    with _init_lock:
+        # unset the initialized state and unregister everything
+        _initialized = False
+        del _loaded_packages[:]
+        REGISTERED_TYPES.clear()
+        _init()
 
 
 _initialized = False
+_init_lock = threading.RLock()
 
 
 def _init():
     # lazy-init
+    if _initialized:
+        return
+    with _init_lock:
+        return _init_locked()
+
+
+def _init_locked():
     global _initialized
     if _initialized:
         return
@@ -495,8 +560,6 @@ def load_package_dependencies(package, load_recursive=False):
     else:
         depends = rospkg.RosPack().get_depends(package, implicit=True)
 
-    msgs = []
-    failures = []
     for d in depends:
         if VERBOSE:
             print('Load dependency', d)
@@ -504,12 +567,13 @@ def load_package_dependencies(package, load_recursive=False):
         # - we are dependent on manifest.getAll returning first-order dependencies first
         if d in _loaded_packages or d == package:
             continue
-        _loaded_packages.append(d)
-        specs, failed = get_pkg_msg_specs(d)
-        msgs.extend(specs)
-        failures.extend(failed)
-    for key, spec in msgs:
-        register(key, spec)
+        with _package_locks.get(d):
+            if d in _loaded_packages:
+                continue
+            specs, failed = get_pkg_msg_specs(d)
+            for key, spec in specs:
+                register(key, spec)
+            _loaded_packages.append(d)
 
 
 def load_package(package):
@@ -534,14 +598,84 @@ def load_package(package):
             print('Package %s is already loaded' % package)
         return
 
-    _loaded_packages.append(package)
-    specs, failed = get_pkg_msg_specs(package)
-    if VERBOSE:
-        print('Package contains the following messages: %s' % specs)
-    for key, spec in specs:
-        # register spec under both local and fully-qualified key
-        register(key, spec)
-        register(package + roslib.names.PRN_SEPARATOR + key, spec)
+    with _package_locks.get(package):
+        if package in _loaded_packages:
+            return
+        specs, failed = get_pkg_msg_specs(package)
+        if VERBOSE:
+            print('Package contains the following messages: %s' % specs)
+        for key, spec in specs:
+            # register spec under both local and fully-qualified key
+            register(key, spec)
+            register(package + roslib.names.PRN_SEPARATOR + key, spec)
+        # only mark the package once its types are visible
+        _loaded_packages.append(package)
+
+
+def _get_int_bounds():
+    """
+    @return: lower and upper bound of each integer type
+    @rtype: {str: (int, int)}
+    """
+    bounds = {}
+    for type_, b in [('int8', 8), ('uint8', 8), ('int16', 16), ('uint16', 16),
+                     ('int32', 32), ('uint32', 32), ('int64', 64), ('uint64', 64),
+                     ('byte', 8), ('char', 8)]:
+        # computed with float arithmetic like the original per-call
+        # table, so 64-bit bounds keep the same (rounded) values
+        if type_[0] == 'u' or type_ == 'char':
+            lower = 0
+            upper = int(math.pow(2, b)-1)
+        else:
+            upper = int(math.pow(2, b-1)-1)
+            lower = -upper - 1  # two's complement min
+        bounds[type_] = (lower, upper)
+    return bounds
+
+
+_INT_BOUNDS = _get_int_bounds()
+_FLOAT_TYPES = frozenset(['float32', 'float64'])
+_BOOL_LITERALS = {'True': True, 'False': False, '1': True, '0': False}
+
+
+def _lookup_name(name):
+    """
+    @return: whether name is defined for eval() in this module, and
+        its value
+    @rtype: (bool, object)
+    """
+    g = globals()
+    if name in g:
+        return True, g[name]
+    if hasattr(builtins, name):
+        return True, getattr(builtins, name)
+    return False, None
+
+
+def _convert_bool(val):
+    """
+    Convert a bool constant. The truth value of a Python literal or of
+    a single name is determined without evaluating code, with the same
+    result and errors as eval(). Other expressions are still evaluated
+    with eval() but deprecated.
+    """
+    b = _BOOL_LITERALS.get(val)
+    if b is not None:
+        return b
+    tree = ast.parse(val, '<string>', 'eval')
+    names = sorted([n for n in ast.walk(tree) if isinstance(n, ast.Name)], key=lambda n: (n.lineno, n.col_offset))
+    for n in names:
+        if not _lookup_name(n.id)[0]:
+            raise NameError("name '%s' is not defined" % n.id)
+    if isinstance(tree.body, ast.Name):
+        return True if _lookup_name(tree.body.id)[1] else False
+    try:
+        return True if ast.literal_eval(tree) else False
+    except ValueError:
+        pass
+    warnings.warn('bool constant [%s] is an expression, which is deprecated: use True or False' % val,
+                  DeprecationWarning, stacklevel=2)
+    return True if eval(val) else False
 
 
 def _convert_val(type_, val):
@@ -556,30 +690,20 @@ def _convert_val(type_, val):
     @raise ValueError: if unable to convert to python representation
     @raise MsgSpecException: if value exceeds specified integer width
     """
-    if type_ in ['float32', 'float64']:
+    if type_ in _FLOAT_TYPES:
         return float(val)
-    elif type_ in ['string']:
+    elif type_ == 'string':
         return val.strip()  # string constants are always stripped
-    elif type_ in ['int8', 'uint8', 'int16', 'uint16', 'int32', 'uint32', 'int64', 'uint64', 'char', 'byte']:
-        # bounds checking
-        bits = [('int8', 8), ('uint8', 8), ('int16', 16), ('uint16', 16),
-                ('int32', 32), ('uint32', 32), ('int64', 64), ('uint64', 64),
-                ('byte', 8), ('char', 8)]
-        b = [b for t, b in bits if t == type_][0]
-        import math
-        if type_[0] == 'u' or type_ == 'char':
-            lower = 0
-            upper = int(math.pow(2, b)-1)
-        else:
-            upper = int(math.pow(2, b-1)-1)
-            lower = -upper - 1  # two's complement min
+    bounds = _INT_BOUNDS.get(type_)
+    if bounds is not None:
+        lower, upper = bounds
         val = int(val)  # python will autocast to long if necessary
         if val > upper or val < lower:
             raise MsgSpecException('cannot coerce [%s] to %s (out of bounds)' % (val, type_))
         return val
     elif type_ == 'bool':
         # TODO: need to nail down constant spec for bool
-        return True if eval(val) else False
+        return _convert_bool(val)
     raise MsgSpecException('invalid constant type: [%s]' % type_)
 
 
@@ -602,6 +726,64 @@ def load_by_type(msgtype, package_context=''):
     return load_from_file(m_f, pkg)
 
 
+# declaration of a field or of a constant other than a string in a line
+# that is stripped of its comment and of surrounding whitespace. Lines
+# that it accepts are valid, except for constant values and types; all
+# other lines are checked by _load_line().
+_DECLARATION_P = re.compile(
+    r'^(?P<type>(?P<base>[A-Za-z](?:[A-Za-z0-9_]|/(?!/))*)(?:\[[0-9]*\])*) +'
+    r'(?:(?P<name>[A-Za-z][A-Za-z0-9_]*)|(?P<constant>[^\s=]+) *= *(?P<val>[^\s=]+))$')
+_STRING_CONSTANT_PREFIX = 'string '
+
+
+def _load_line(orig_line, line, package_context, types, names, constants):
+    """
+    Parse a declaration that L{_DECLARATION_P} does not accept and
+    report errors.
+
+    @param orig_line: line of the .msg text
+    @type  orig_line: str
+    @param line: orig_line stripped of its comment and surrounding whitespace
+    @type  line: str
+    @raise MsgSpecException: if the declaration is invalid
+    """
+    splits = [s for s in [x.strip() for x in line.split(' ')] if s]  # split type/name, filter out empties
+    type_ = splits[0]
+    if not is_valid_msg_type(type_):
+        raise MsgSpecException('%s is not a legal message type' % type_)
+    if CONSTCHAR in line:
+        if not is_valid_constant_type(type_):
+            raise MsgSpecException('%s is not a legal constant type' % type_)
+        if type_ == 'string':
+            # strings contain anything to the right of the equals sign, there are no comments allowed
+            idx = orig_line.find(CONSTCHAR)
+            name = orig_line[orig_line.find(' ')+1:idx]
+            val = orig_line[idx+1:]
+        else:
+            splits = [x.strip() for x in ' '.join(splits[1:]).split(CONSTCHAR)]  # resplit on '='
+            if len(splits) != 2:
+                raise MsgSpecException('Invalid declaration: %s' % line)
+            name = splits[0]
+            val = splits[1]
+        try:
+            val_converted = _convert_val(type_, val)
+        except Exception as e:
+            raise MsgSpecException('Invalid declaration: %s' % e)
+        constants.append(Constant(type_, name, val_converted, val.strip()))
+    else:
+        if len(splits) != 2:
+            raise MsgSpecException('Invalid declaration: %s' % line)
+        name = splits[1]
+        if not is_valid_msg_field_name(name):
+            raise MsgSpecException('%s is not a legal message field name' % name)
+        if package_context and SEP not in type_:
+            if not base_msg_type(type_) in RESERVED_TYPES:
+                # print "rewrite", type_, "to", "%s/%s"%(package_context, type_)
+                type_ = '%s/%s' % (package_context, type_)
+        types.append(_intern(type_))
+        names.append(_intern(name))
+
+
 def load_from_string(text, package_context='', full_name='', short_name=''):
     """
     Load message specification from a string.
@@ -617,45 +799,36 @@ def load_from_string(text, package_context='', full_name='', short_name=''):
     types = []
     names = []
     constants = []
+    match = _DECLARATION_P.match
     for orig_line in text.split('\n'):
-        l = orig_line.split(COMMENTCHAR)[0].strip()  # strip comments
-        if not l:
+        line = orig_line.split(COMMENTCHAR, 1)[0].strip()  # strip comments
+        if not line:
             continue  # ignore empty lines
-        splits = [s for s in [x.strip() for x in l.split(' ')] if s]  # split type/name, filter out empties
-        type_ = splits[0]
-        if not is_valid_msg_type(type_):
-            raise MsgSpecException('%s is not a legal message type' % type_)
-        if CONSTCHAR in l:
-            if not is_valid_constant_type(type_):
-                raise MsgSpecException('%s is not a legal constant type' % type_)
-            if type_ == 'string':
-                # strings contain anything to the right of the equals sign, there are no comments allowed
-                idx = orig_line.find(CONSTCHAR)
-                name = orig_line[orig_line.find(' ')+1:idx]
-                val = orig_line[idx+1:]
-            else:
-                splits = [x.strip() for x in ' '.join(splits[1:]).split(CONSTCHAR)]  # resplit on '='
-                if len(splits) != 2:
-                    raise MsgSpecException('Invalid declaration: %s' % l)
-                name = splits[0]
-                val = splits[1]
+        if line.startswith(_STRING_CONSTANT_PREFIX) and CONSTCHAR in line:
+            # strings contain anything to the right of the equals sign, there are no comments allowed
+            idx = orig_line.find(CONSTCHAR)
+            val = orig_line[idx+1:].strip()
+            constants.append(Constant('string', orig_line[orig_line.find(' ')+1:idx], val, val))
+            continue
+        m = match(line)
+        if m is None:
+            _load_line(orig_line, line, package_context, types, names, constants)
+            continue
+        type_, name = m.group('type', 'name')
+        if name is not None:
+            if package_context and SEP not in type_ and m.group('base') not in _RESERVED_TYPES:
+                type_ = '%s/%s' % (package_context, type_)
+            types.append(_intern(type_))
+            names.append(_intern(name))
+        elif type_ in _CONSTANT_TYPES:
+            val = m.group('val')
             try:
                 val_converted = _convert_val(type_, val)
             except Exception as e:
                 raise MsgSpecException('Invalid declaration: %s' % e)
-            constants.append(Constant(type_, name, val_converted, val.strip()))
+            constants.append(Constant(type_, m.group('constant'), val_converted, val))
         else:
-            if len(splits) != 2:
-                raise MsgSpecException('Invalid declaration: %s' % l)
-            name = splits[1]
-            if not is_valid_msg_field_name(name):
-                raise MsgSpecException('%s is not a legal message field name' % name)
-            if package_context and SEP not in type_:
-                if not base_msg_type(type_) in RESERVED_TYPES:
-                    # print "rewrite", type_, "to", "%s/%s"%(package_context, type_)
-                    type_ = '%s/%s' % (package_context, type_)
-            types.append(type_)
-            names.append(name)
+            _load_line(orig_line, line, package_context, types, names, constants)
     return MsgSpec(types, names, constants, text, full_name, short_name, package_context)
 
 
@@ -689,15 +862,44 @@ def load_from_file(file_path, package_context=''):
     if not roslib.names.is_legal_resource_name(type_):
         raise MsgSpecException('%s: [%s] is not a legal type name' % (file_path, type_))
 
+    try:
+        identity = roslib.speccache.stat(file_path)
+    except OSError:
+        identity = None  # open() raises below
+    data = roslib.speccache.get('msg', file_path, package_context, identity) if identity else None
+    if data is not None:
+        return (type_, _spec_from_data(data, package_context, type_, base_type_))
+
     f = open(file_path, 'r')
     try:
         try:
             text = f.read()
-            return (type_, load_from_string(text, package_context, type_, base_type_))
+            spec = load_from_string(text, package_context, type_, base_type_)
         except MsgSpecException as e:
             raise MsgSpecException('%s: %s' % (file_name, e))
     finally:
         f.close()
+    if identity:
+        roslib.speccache.put('msg', file_path, package_context, identity, _spec_to_data(spec))
+    return (type_, spec)
+
+
+def _spec_to_data(spec):
+    """
+    @return: contents of spec for L{roslib.speccache}
+    @rtype: ([str], [str], [(str, str, object, str)], str)
+    """
+    return (spec.types, spec.names, [(c.type, c.name, c.val, c.val_text) for c in spec.constants], spec.text)
+
+
+def _spec_from_data(data, package_context, full_name, short_name):
+    """
+    @return: spec rebuilt from the result of L{_spec_to_data()}
+    @rtype: L{MsgSpec}
+    """
+    types, names, constants, text = data
+    return MsgSpec([_intern(t) for t in types], [_intern(n) for n in names], [Constant(*c) for c in constants], text,
+                   full_name, short_name, package_context)
 
 
 # data structures and builtins specification ###########################
@@ -748,13 +950,67 @@ def is_builtin(msg_type_name):
     return msg_type_name in BUILTIN_TYPES
 
 
+RESERVED_TYPES = BUILTIN_TYPES + [HEADER]
+# lookup tables of load_from_string()
+_RESERVED_TYPES = frozenset(RESERVED_TYPES)
+_CONSTANT_TYPES = frozenset(PRIMITIVE_TYPES)
+
 # extended builtins are builtin types that can be represented as MsgSpec instances
 EXTENDED_BUILTINS = {TIME: load_from_string(TIME_MSG), DURATION: load_from_string(DURATION_MSG)}
 
-RESERVED_TYPES = BUILTIN_TYPES + [HEADER]
 
-REGISTERED_TYPES = {}
+class _Registry(dict):
+    """
+    Type dictionary that increments L{_registry_generation} on every
+    change, including direct writes by message generators.
+    """
+
+    def __setitem__(self, key, value):
+        global _registry_generation
+        dict.__setitem__(self, key, value)
+        _registry_generation += 1
+
+    def __delitem__(self, key):
+        global _registry_generation
+        dict.__delitem__(self, key)
+        _registry_generation += 1
+
+    def clear(self):
+        global _registry_generation
+        dict.clear(self)
+        _registry_generation += 1
+
+    def pop(self, *args):
+        global _registry_generation
+        _registry_generation += 1
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        global _registry_generation
+        _registry_generation += 1
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwds):
+        global _registry_generation
+        dict.update(self, *args, **kwds)
+        _registry_generation += 1
+
+
+# Registered types are looked up without locking. Packages are loaded
+# under a lock per package and only listed in _loaded_packages once
+# their types are registered.
+REGISTERED_TYPES = _Registry()
+# incremented whenever REGISTERED_TYPES changes, which invalidates
+# values derived from the registry (e.g. the md5 memo of
+# roslib.gentools)
+_registry_generation = 0
 _loaded_packages = []  # keep track of packages so that we only load once (note: bug #59)
+_package_locks = roslib.locks.StripedLock()
 
 
 def is_registered(msg_type_name):
@@ -796,4 +1052,28 @@ def register(msg_type_name, msg_spec):
     """
     if VERBOSE:
         print('Register msg %s' % msg_type_name)
-    REGISTERED_TYPES[msg_type_name] = msg_spec
+    spec = _share_spec(msg_spec)
+    if REGISTERED_TYPES.get(msg_type_name) is not spec:
+        REGISTERED_TYPES[msg_type_name] = spec
+
+
+def _share_spec(spec):
+    """
+    Hash-cons registered specs: structurally identical specs, e.g. the
+    same file loaded twice, share one object.
+
+    @return: spec or a registered spec that is identical to it
+    @rtype: L{MsgSpec}
+    """
+    key = (tuple(spec.types), tuple(spec.names), tuple([(c.type, c.name, c.val_text) for c in spec.constants]),
+           spec.text, spec.full_name, spec.short_name, spec.package)
+    with _shared_specs_lock:
+        shared = _shared_specs.get(key)
+        if shared is None:
+            _shared_specs[key] = shared = spec
+    return shared
+
+
+# {structure of spec: spec} of the registered specs
+_shared_specs = weakref.WeakValueDictionary()
+_shared_specs_lock = threading.Lock()
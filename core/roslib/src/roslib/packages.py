@@ -39,15 +39,21 @@ here have been superceded by other libraries (e.g. rospkg).  These
 routines will likely be *deleted* in future releases.
 """
 
+import collections
+import itertools
 import os
 import stat
 import sys
-from subprocess import PIPE
-from subprocess import Popen
+import threading
+import time
+from xml.etree.ElementTree import ElementTree
 
 from catkin.find_in_workspaces import find_in_workspaces as catkin_find
 
+import roslib.crawler
+import roslib.locks
 import roslib.manifest  # noqa: F401
+import roslib.pkgindex
 
 import rospkg
 
@@ -89,40 +95,164 @@ PACKAGE_FILE = 'package.xml'
 # Map package/directory structure
 #
 
+def _is_pkg_dir(d):
+    return os.path.exists(os.path.join(d, MANIFEST_FILE)) or os.path.exists(os.path.join(d, PACKAGE_FILE))
+
+
+def _walk_pkg_dir(d, cache=None):
+    """
+    Find the nearest parent directory with a manifest by walking up
+    the filesystem.
+
+    @param cache: (optional) results of previous walks, updated in place
+    @type  cache: {str: str}
+    @return: package directory, or None if not in a package
+    @rtype: str
+    """
+    # TODO: the realpath is going to create issues with symlinks, most likely
+
+    walked = []
+    parent = os.path.dirname(os.path.realpath(d))
+    # walk up until we hit ros root or ros/pkg
+    while True:
+        if cache is not None and d in cache:
+            pkg_dir = cache[d]
+            break
+        walked.append(d)
+        if _is_pkg_dir(d):
+            pkg_dir = d
+            break
+        if parent == d:
+            pkg_dir = None
+            break
+        d = parent
+        parent = os.path.dirname(d)
+    if cache is not None:
+        for w in walked:
+            cache[w] = pkg_dir
+    return pkg_dir
+
+
 def get_dir_pkg(d):
     """
     Get the package that the directory is contained within. This is
     determined by finding the nearest parent manifest.xml file. This
     isn't 100% reliable, but symlinks can fool any heuristic that
     relies on ROS_ROOT.
+
+    If the package index is already loaded, paths inside packages on
+    the ROS path only walk up to the package that the index knows.
     @param d: directory path
     @type  d: str
     @return: (package_directory, package) of the specified directory, or None,None if not in a package
     @rtype: (str, str)
     """
-    # TODO: the realpath is going to create issues with symlinks, most likely
+    index = roslib.pkgindex.get_index(*_resolve_ros_env())
+    pkg_dir = None
+    # never crawl the ROS path just to find one package
+    if index.is_loaded() and index.is_indexed_path(d):
+        pkg_dir, _ = index.get_trie().find(d)
+    if pkg_dir is None:
+        pkg_dir = _walk_pkg_dir(d)
+    else:
+        # the index does not know packages nested in other packages
+        pkg_dir = _walk_pkg_dir(d, {pkg_dir: pkg_dir})
+    if pkg_dir is None:
+        return None, None
+    pkg = os.path.basename(os.path.abspath(pkg_dir))
+    return pkg_dir, pkg
+
+
+def get_path_pkgs(paths, ros_root=None, ros_package_path=None):
+    """
+    Map many paths to the packages that contain them. Paths inside
+    packages on the ROS path only walk up to the package that the
+    package index knows, all paths share a single walk of the
+    filesystem.
 
-    parent = os.path.dirname(os.path.realpath(d))
-    # walk up until we hit ros root or ros/pkg
-    while not os.path.exists(os.path.join(d, MANIFEST_FILE)) and not os.path.exists(os.path.join(d, PACKAGE_FILE)) and parent != d:
-        d = parent
-        parent = os.path.dirname(d)
-    if os.path.exists(os.path.join(d, MANIFEST_FILE)) or os.path.exists(os.path.join(d, PACKAGE_FILE)):
-        pkg = os.path.basename(os.path.abspath(d))
-        return d, pkg
-    return None, None
+    @param paths: file or directory paths
+    @type  paths: [str]
+    @param ros_root: if specified, override ROS_ROOT
+    @type  ros_root: str
+    @param ros_package_path: if specified, override ROS_PACKAGE_PATH
+    @type  ros_package_path: str
+    @return: (package_directory, package) of each path, or None,None
+        if the path is not in a package. The package name of catkin
+        packages is the name declared in package.xml.
+    @rtype: {str: (str, str)}
+    """
+    trie = roslib.pkgindex.get_index(*_resolve_ros_env(ros_root, ros_package_path)).get_trie()
+    cache = {}
+    names = {}
+    results = {}
+    for path in paths:
+        pkg_dir, pkg = trie.find(path)
+        if pkg_dir is not None:
+            names[pkg_dir] = pkg
+            # the index does not know packages nested in other packages
+            cache[pkg_dir] = pkg_dir
+        pkg_dir = _walk_pkg_dir(path, cache)
+        if pkg_dir is None:
+            pkg = None
+        else:
+            pkg = names.get(pkg_dir)
+            if pkg is None:
+                if os.path.exists(os.path.join(pkg_dir, MANIFEST_FILE)):
+                    pkg = os.path.basename(os.path.abspath(pkg_dir))
+                else:
+                    pkg = _get_package_xml_name(pkg_dir)
+                names[pkg_dir] = pkg
+        results[path] = (pkg_dir, pkg)
+    return results
+
+
+def get_path_pkg(path, ros_root=None, ros_package_path=None):
+    """
+    @param path: file or directory path
+    @type  path: str
+    @param ros_root: if specified, override ROS_ROOT
+    @type  ros_root: str
+    @param ros_package_path: if specified, override ROS_PACKAGE_PATH
+    @type  ros_package_path: str
+    @return: (package_directory, package) of the package that contains
+        path, or None,None. See L{get_path_pkgs()}.
+    @rtype: (str, str)
+    """
+    return get_path_pkgs([path], ros_root, ros_package_path)[path]
 
 
-_pkg_dir_cache = {}
+def _resolve_ros_env(ros_root=None, ros_package_path=None, env=None):
+    """
+    @param ros_root: if specified, override ROS_ROOT
+    @type  ros_root: str
+    @param ros_package_path: if specified, override ROS_PACKAGE_PATH
+    @type  ros_package_path: str
+    @param env: override os.environ dictionary
+    @type  env: dict
+    @return: ROS_ROOT and ROS_PACKAGE_PATH values that key the package
+        index, resolved the same way whether they are passed in or
+        taken from the environment
+    @rtype: (str, str)
+    """
+    if env is None:
+        env = os.environ
+    if not ros_root:
+        ros_root = env.get(ROS_ROOT, None)
+    if ros_root:
+        ros_root = rospkg.environment._resolve_path(ros_root)
+    if ros_package_path is None:
+        ros_package_path = env.get(ROS_PACKAGE_PATH, None)
+    if ros_package_path is not None:
+        ros_package_path = rospkg.environment._resolve_paths(ros_package_path)
+    return ros_root, ros_package_path
 
 
 def get_pkg_dir(package, required=True, ros_root=None, ros_package_path=None):
     """
     Locate directory package is stored in. This routine uses an
-    internal cache.
-
-    NOTE: cache does *not* rebuild if packages are relocated after
-    this process is initiated.
+    in-process package index (L{roslib.pkgindex}) that is persisted
+    under ROS_HOME and is recrawled when the directories on the ROS
+    path change.
 
     @param package: package name
     @type  package: str
@@ -137,69 +267,63 @@ def get_pkg_dir(package, required=True, ros_root=None, ros_package_path=None):
     @rtype: str
     @raise InvalidROSPkgException: if required is True and package cannot be located
     """
-
-    # UNIXONLY
-    # TODO: replace with non-rospack-based solution (e.g. os.walk())
     try:
-        penv = os.environ.copy()
-        if ros_root:
-            ros_root = rospkg.environment._resolve_path(ros_root)
-            penv[ROS_ROOT] = ros_root
-        elif ROS_ROOT in os.environ:
-            # record setting for _pkg_dir_cache
-            ros_root = os.environ[ROS_ROOT]
-
-        # determine rospack exe name
-        rospack = 'rospack'
-
-        if ros_package_path is not None:
-            ros_package_path = rospkg.environment._resolve_paths(ros_package_path)
-            penv[ROS_PACKAGE_PATH] = ros_package_path
-        elif ROS_PACKAGE_PATH in os.environ:
-            # record setting for _pkg_dir_cache
-            ros_package_path = os.environ[ROS_PACKAGE_PATH]
-
-        # update cache if we haven't. NOTE: we only get one cache
-        if not _pkg_dir_cache:
-            _read_rospack_cache(_pkg_dir_cache, ros_root, ros_package_path)
-
-        # now that we've resolved the args, check the cache
-        if package in _pkg_dir_cache:
-            dir_, rr, rpp = _pkg_dir_cache[package]
-            if rr == ros_root and rpp == ros_package_path:
-                if os.path.isfile(os.path.join(dir_, MANIFEST_FILE)):
-                    return dir_
-                else:
-                    # invalidate cache
-                    _invalidate_cache(_pkg_dir_cache)
-
-        rpout, rperr = Popen([rospack, 'find', package],
-                             stdout=PIPE, stderr=PIPE, env=penv).communicate()
-
-        pkg_dir = (rpout or '').strip()
-        # python3.1 popen returns as bytes
-        if (isinstance(pkg_dir, bytes)):
-            pkg_dir = pkg_dir.decode()
-        if not pkg_dir:
-            raise InvalidROSPkgException('Cannot locate installation of package %s: %s. ROS_ROOT[%s] ROS_PACKAGE_PATH[%s]' % (package, rperr.strip(), ros_root, ros_package_path))
-
-        pkg_dir = os.path.normpath(pkg_dir)
-        if not os.path.exists(pkg_dir):
-            raise InvalidROSPkgException('Cannot locate installation of package %s: [%s] is not a valid path. ROS_ROOT[%s] ROS_PACKAGE_PATH[%s]' % (package, pkg_dir, ros_root, ros_package_path))
-        elif not os.path.isdir(pkg_dir):
-            raise InvalidROSPkgException('Package %s is invalid: file [%s] is in the way' % (package, pkg_dir))
-        # don't update cache: this should only be updated from
-        # rospack_cache as it will corrupt package list otherwise.
-        # _pkg_dir_cache[package] = (pkg_dir, ros_root, ros_package_path)
-        return pkg_dir
-    except OSError as e:
-        if required:
-            raise InvalidROSPkgException('Environment configuration is invalid: cannot locate rospack (%s)' % e)
-        return None
+        ros_root, ros_package_path = _resolve_ros_env(ros_root, ros_package_path)
+        pkg_dir = roslib.pkgindex.get_index(ros_root, ros_package_path).get_path(package)
     except Exception:
         if required:
             raise
         return None
+    if not pkg_dir:
+        if required:
+            raise InvalidROSPkgException('Cannot locate installation of package %s. ROS_ROOT[%s] ROS_PACKAGE_PATH[%s]' % (package, ros_root, ros_package_path))
+        return None
+    return pkg_dir
+
+
+_pkg_dir_flights = roslib.locks.SingleFlight()
+
+
+def aget_pkg_dir(package, required=True, ros_root=None, ros_package_path=None):
+    """
+    asyncio version of L{get_pkg_dir()}. The lookup runs on the
+    executor of the running event loop and concurrent requests for the
+    same package share a single lookup.
+
+    @return: future for the directory containing package or None if
+        package cannot be found and required is False.
+    @rtype: asyncio.Future
+    @raise InvalidROSPkgException: from the future, if required is
+        True and package cannot be located
+    """
+    key = (package, required, ros_root, ros_package_path,
+           os.environ.get(ROS_ROOT), os.environ.get(ROS_PACKAGE_PATH))
+    return _pkg_dir_flights.run(key, get_pkg_dir, package, required, ros_root, ros_package_path)
+
+
+def get_pkg_dirs(packages, ros_root=None, ros_package_path=None):
+    """
+    Locate the directories of many packages in one pass over the
+    package index. This is equivalent to calling get_pkg_dir() for
+    each package, but misses only cost one freshness check in total.
+
+    @param packages: package names
+    @type  packages: [str]
+    @param ros_root: if specified, override ROS_ROOT
+    @type  ros_root: str
+    @param ros_package_path: if specified, override ROS_PACKAGE_PATH
+    @type  ros_package_path: str
+    @return: ({package: directory}, {package: error}). Every package
+        is reported in exactly one of the two dictionaries.
+    @rtype: ({str: str}, {str: L{InvalidROSPkgException}})
+    """
+    ros_root, ros_package_path = _resolve_ros_env(ros_root, ros_package_path)
+    dirs = roslib.pkgindex.get_index(ros_root, ros_package_path).get_paths(packages)
+    errors = {}
+    for package in packages:
+        if package not in dirs:
+            errors[package] = InvalidROSPkgException('Cannot locate installation of package %s. ROS_ROOT[%s] ROS_PACKAGE_PATH[%s]' % (package, ros_root, ros_package_path))
+    return dirs, errors
 
 
 def _get_pkg_subdir_by_dir(package_dir, subdir, required=True, env=None):
@@ -284,69 +408,76 @@ def resource_file(package, subdir, resource_name):
     return os.path.join(d, resource_name)
 
 
-def _update_rospack_cache(env=None):
+def resource_files(resources, ros_root=None, ros_package_path=None):
     """
-    Internal routine to update global package directory cache
+    Batch version of resource_file(): resolve many (package, subdir,
+    resource_name) triples in one pass over the package index.
 
-    @return: True if cache is valid
-    @rtype: bool
+    @param resources: (package, subdir, resource_name) triples
+    @type  resources: [(str, str, str)]
+    @param ros_root: if specified, override ROS_ROOT
+    @type  ros_root: str
+    @param ros_package_path: if specified, override ROS_PACKAGE_PATH
+    @type  ros_package_path: str
+    @return: ({triple: path}, {triple: error}). Every triple is
+        reported in exactly one of the two dictionaries.
+    @rtype: ({(str, str, str): str}, {(str, str, str): L{InvalidROSPkgException}})
     """
-    if env is None:
-        env = os.environ
-    cache = _pkg_dir_cache
-    if cache:
-        return True
-    ros_root = env[ROS_ROOT]
-    ros_package_path = env.get(ROS_PACKAGE_PATH, '')
-    return _read_rospack_cache(cache, ros_root, ros_package_path)
+    resources = list(resources)
+    dirs, _ = get_pkg_dirs(list(set(r[0] for r in resources)), ros_root=ros_root, ros_package_path=ros_package_path)
+    paths = {}
+    errors = {}
+    for r in resources:
+        package, subdir, resource_name = r
+        if package in dirs:
+            paths[r] = os.path.join(dirs[package], subdir, resource_name)
+        else:
+            # same error as resource_file()
+            errors[r] = InvalidROSPkgException(package)
+    return paths, errors
+
+
+def _get_package_xml_name(package_dir):
+    """
+    @return: name declared in the package.xml of package_dir, falling
+        back to the directory name if package.xml cannot be parsed
+    @rtype: str
+    """
+    try:
+        name = ElementTree(None, os.path.join(package_dir, PACKAGE_FILE)).findtext('name')
+    except Exception:
+        name = None
+    if name:
+        name = name.strip()
+    return name or os.path.basename(package_dir)
 
 
-def _invalidate_cache(cache):
-    # I've only made this a separate routine because roslib.packages should really be using
-    # the roslib.stacks cache implementation instead with the separate cache marker
-    cache.clear()
+def _is_vcs_dir(name):
+    # both are pruned, older versions kept .git if .svn was present
+    return name in ('.svn', '.git')
 
 
-def _read_rospack_cache(cache, ros_root, ros_package_path):
+def _crawl_pkgs(paths, include_catkin=False, dir_mtimes=None):
     """
-    Read in rospack_cache data into cache. On-disk cache specifies a
-    ROS_ROOT and ROS_PACKAGE_PATH, which must match the requested
-    environment.
+    Crawl paths for packages. Subroutine of list_pkgs_by_path() and
+    the package index.
 
-    @param cache: empty dictionary to store package list in.
-        If no cache argument provided, will use internal _pkg_dir_cache
-        and will return cached answers if available.
-        The format of the cache is {package_name: dir_path, ros_root, ros_package_path}.
-    @type  cache: {str: str, str, str}
-    @param ros_package_path: ROS_ROOT value
-    @type  ros_root: str
-    @param ros_package_path: ROS_PACKAGE_PATH value or '' if not specified
-    @type  ros_package_path: str
-    @return: True if on-disk cache matches and was loaded, false otherwise
-    @rtype: bool
+    @return: (package, directory) pairs in order of precedence. A
+        package may be listed more than once.
+    @rtype: [(str, str)]
     """
-    try:
-        with open(os.path.join(rospkg.get_ros_home(), 'rospack_cache')) as f:
-            for l in f.readlines():
-                l = l[:-1]
-                if not len(l):
-                    continue
-                if l[0] == '#':
-                    # check that the cache matches our env
-                    if l.startswith('#ROS_ROOT='):
-                        if not l[len('#ROS_ROOT='):] == ros_root:
-                            return False
-                    elif l.startswith('#ROS_PACKAGE_PATH='):
-                        if not l[len('#ROS_PACKAGE_PATH='):] == ros_package_path:
-                            return False
-                else:
-                    cache[os.path.basename(l)] = l, ros_root, ros_package_path
-        return True
-    except Exception:
-        pass
+    def visit(d, files):
+        if MANIFEST_FILE in files:
+            return os.path.basename(d), False
+        elif include_catkin and PACKAGE_FILE in files:
+            return _get_package_xml_name(d), False
+        elif 'rospack_nosubdirs' in files:
+            return None, False
+        return None, True
+    return roslib.crawler.crawl(paths, visit, skip_dir=_is_vcs_dir, dir_mtimes=dir_mtimes)
 
 
-def list_pkgs_by_path(path, packages=None, cache=None, env=None):
+def list_pkgs_by_path(path, packages=None, cache=None, env=None, include_catkin=False, dir_mtimes=None):
     """
     List ROS packages within the specified path.
 
@@ -354,6 +485,8 @@ def list_pkgs_by_path(path, packages=None, cache=None, env=None):
     updated with the package->path mappings. list_pkgs_by_path() does
     NOT returned cached results -- it only updates the cache.
 
+    Symlinks are followed; symlink loops are detected and skipped.
+
     @param path: path to list packages in
     @type  path: str
     @param packages: list of packages to append to. If package is
@@ -361,6 +494,12 @@ def list_pkgs_by_path(path, packages=None, cache=None, env=None):
     @type  packages: [str]
     @param cache: (optional) package path cache to update. Maps package name to directory path.
     @type  cache: {str: str}
+    @param include_catkin: (optional) if True, also list packages that
+      only have a package.xml, using the name declared in it.
+    @type  include_catkin: bool
+    @param dir_mtimes: (optional) updated with the mtime of every
+      directory that was visited.
+    @type  dir_mtimes: {str: float}
     @return: complete list of package names in ROS environment. Same as packages parameter.
     @rtype: [str]
     """
@@ -372,32 +511,11 @@ def list_pkgs_by_path(path, packages=None, cache=None, env=None):
     ros_root = env[ROS_ROOT]
     ros_package_path = env.get(ROS_PACKAGE_PATH, '')
 
-    path = os.path.abspath(path)
-    for d, dirs, files in os.walk(path, topdown=True):
-        if MANIFEST_FILE in files:
-            package = os.path.basename(d)
-            if package not in packages:
-                packages.append(package)
-                if cache is not None:
-                    cache[package] = d, ros_root, ros_package_path
-            del dirs[:]
-            continue  # leaf
-        elif 'rospack_nosubdirs' in files:
-            del dirs[:]
-            continue  # leaf
-        # small optimization
-        elif '.svn' in dirs:
-            dirs.remove('.svn')
-        elif '.git' in dirs:
-            dirs.remove('.git')
-
-        for sub_d in dirs:
-            # followlinks=True only available in Python 2.6, so we
-            # have to implement manually
-            sub_p = os.path.join(d, sub_d)
-            if os.path.islink(sub_p):
-                packages.extend(list_pkgs_by_path(sub_p, cache=cache))
-
+    for package, d in _crawl_pkgs([path], include_catkin, dir_mtimes):
+        if package not in packages:
+            packages.append(package)
+            if cache is not None:
+                cache[package] = d, ros_root, ros_package_path
     return packages
 
 
@@ -418,7 +536,10 @@ def find_node(pkg, node_type, rospack=None):
 
 
 def _executable_filter(test_path):
-    s = os.stat(test_path)
+    return _is_executable(test_path, os.stat(test_path).st_mode)
+
+
+def _is_executable(test_path, mode):
     flags = stat.S_IRUSR | stat.S_IXUSR
 
     # Python scripts in ROS tend to omit .py extension since they could become executable
@@ -426,80 +547,280 @@ def _executable_filter(test_path):
     # special handle this case in Windows environment
     if os.name == 'nt' and os.path.splitext(test_path)[1].lower() in ['.py', '']:
         flags = stat.S_IRUSR
-    return (s.st_mode & flags) == flags
+    return (mode & flags) == flags
+
+
+def _is_hidden_dir(name):
+    # remove .svn/.git/etc
+    return name.startswith('.')
+
+
+# minimum number of seconds between the freshness checks that misses
+# in a _ResourceIndex trigger
+_MISS_CHECK_INTERVAL = 1.0
+
+
+class _ResourceIndex(object):
+    """
+    File name index of a directory tree searched by find_resource().
+    The tree is crawled once and recrawled when the mtime of one of
+    its directories changes, which is checked for the directories of
+    all hits. File modes are looked up lazily and cached, so repeated
+    find_node() calls only stat the directories of hits.
+    """
+
+    def __init__(self, d):
+        self.d = d
+        # {name: [directory]}, directories in crawl order. On Windows
+        # names are lower case.
+        self.files = {}
+        # {directory: position in crawl order}
+        self.dir_order = {}
+        self.dir_mtimes = {}
+        # {path: st_mode}
+        self.modes = {}
+        self._checked = None
+        self._miss_checked = 0.0
+        # held while the tree is crawled
+        self._lock = threading.Lock()
+        # held while the lookup state is replaced or read
+        self._state_lock = threading.Lock()
+
+    def _get_state(self):
+        """
+        @return: files, dir_order and modes of the same crawl
+        @rtype: (dict, dict, dict)
+        """
+        with self._state_lock:
+            return self.files, self.dir_order, self.modes
+
+    def build(self):
+        files = {}
+        dir_order = {}
+        dir_mtimes = {}
+        case_insensitive = sys.platform in ['win32', 'cygwin']
+        for names, p in roslib.crawler.crawl([self.d], _visit_all, skip_dir=_is_hidden_dir, dir_mtimes=dir_mtimes):
+            dir_order[p] = len(dir_order)
+            for name in names:
+                if case_insensitive:
+                    name = name.lower()
+                files.setdefault(name, []).append(p)
+        # notice if a missing directory gets created
+        dir_mtimes.setdefault(self.d, None)
+        with self._state_lock:
+            self.files = files
+            self.dir_order = dir_order
+            self.dir_mtimes = dir_mtimes
+            self.modes = {}
+
+    def update(self, force=False):
+        """
+        @return: True if the tree was recrawled
+        @rtype: bool
+        """
+        with self._lock:
+            now = time.time()
+            if self._checked is None:
+                self.build()
+                self._checked = now
+                return True
+            if force or now - self._checked > roslib.pkgindex.get_cache_timeout():
+                self._checked = now
+                if not roslib.pkgindex.check_mtimes(self.dir_mtimes):
+                    self.build()
+                    return True
+            return False
+
+    def _candidates(self, resource_name, state):
+        files, dir_order, _ = state
+        if sys.platform in ['win32', 'cygwin']:
+            # Windows logic requires more file patterns to resolve and is
+            # not case-sensitive.
+
+            # in the near-term, just hack in support for .exe/.bat/.py. In the long
+            # term this needs to:
+            #
+            #  * parse PATHEXT to generate matches
+            #  * perform case-insensitive compares against potential
+            #    matches, in path-ext order
+
+            # - We still have to look for bare node_type as user may have
+            #   specified extension manually
+            resource_name = resource_name.lower()
+            patterns = [resource_name, resource_name+'.exe', resource_name+'.bat', resource_name+'.py']
+            found = [(dir_order[p], i, os.path.join(p, name))
+                     for i, name in enumerate(patterns) for p in files.get(name, [])]
+            # matches are ordered by directory, then by pattern
+            return [test_path for _, _, test_path in sorted(found)]
+        return [os.path.join(p, resource_name) for p in files.get(resource_name, [])]
+
+    def _is_current(self, path):
+        """
+        @return: True if the directory of path has not changed since it
+            was crawled
+        @rtype: bool
+        """
+        d = os.path.dirname(path)
+        try:
+            return os.stat(d).st_mtime == self.dir_mtimes.get(d)
+        except OSError:
+            return False
+
+    def _matches(self, resource_name, filter_fn):
+        state = self._get_state()
+        modes = state[2]
+        for test_path in self._candidates(resource_name, state):
+            if filter_fn is None:
+                yield test_path
+            elif filter_fn is _executable_filter:
+                mode = modes.get(test_path)
+                if mode is None:
+                    try:
+                        mode = modes[test_path] = os.stat(test_path).st_mode
+                    except OSError:
+                        continue
+                if _is_executable(test_path, mode):
+                    yield test_path
+            elif filter_fn(test_path):
+                yield test_path
+
+    def iter_find(self, resource_name, filter_fn=None):
+        """
+        Generate paths of matching files in crawl order. The filter is
+        only applied to as many candidates as the caller consumes.
+        """
+        self.update()
+        found = []
+        for test_path in self._matches(resource_name, filter_fn):
+            if not self._is_current(test_path):
+                # the file may have been deleted or renamed since the
+                # crawl, recrawl and continue with the new state
+                self.update(force=True)
+                for test_path in self._matches(resource_name, filter_fn):
+                    if test_path not in found:
+                        yield test_path
+                return
+            found.append(test_path)
+            yield test_path
+        now = time.time()
+        if not found and now - self._miss_checked > _MISS_CHECK_INTERVAL:
+            # the tree or file modes may have changed since we looked,
+            # checked at most once per interval for repeated misses
+            self._miss_checked = now
+            if not self.update(force=True):
+                state = self._get_state()
+                for test_path in self._candidates(resource_name, state):
+                    state[2].pop(test_path, None)
+            for test_path in self._matches(resource_name, filter_fn):
+                yield test_path
+
+    def find(self, resource_name, filter_fn=None):
+        """
+        @return: paths of matching files in crawl order
+        @rtype: [str]
+        """
+        return list(self.iter_find(resource_name, filter_fn))
+
+
+def _visit_all(d, files):
+    return files, True
+
+
+def _unique(items):
+    """
+    @return: items with duplicates removed, keeping the first occurrence
+    @rtype: list
+    """
+    seen = set()
+    return [x for x in items if not (x in seen or seen.add(x))]
+
+
+# maximum number of directory trees that _find_resource() keeps indexed
+_RESOURCE_INDEX_LIMIT = 256
+# {directory: _ResourceIndex}, in least recently used order
+_resource_indexes = collections.OrderedDict()
+# find_resource() indexes several trees concurrently
+_resource_indexes_lock = threading.Lock()
+
+
+def _get_resource_index(d):
+    """
+    @return: index of the directory tree rooted at d
+    @rtype: L{_ResourceIndex}
+    """
+    d = os.path.abspath(d)
+    with _resource_indexes_lock:
+        index = _resource_indexes.pop(d, None)
+        if index is None:
+            index = _ResourceIndex(d)
+        _resource_indexes[d] = index
+        while len(_resource_indexes) > _RESOURCE_INDEX_LIMIT:
+            _resource_indexes.popitem(last=False)
+    return index
 
 
 def _find_resource(d, resource_name, filter_fn=None):
     """
     subroutine of find_resource
     """
-    matches = []
-    # TODO: figure out how to generalize find_resource to take multiple resource name options
-    if sys.platform in ['win32', 'cygwin']:
-        # Windows logic requires more file patterns to resolve and is
-        # not case-sensitive, so leave it separate
-
-        # in the near-term, just hack in support for .exe/.bat/.py. In the long
-        # term this needs to:
-        #
-        #  * parse PATHEXT to generate matches
-        #  * perform case-insensitive compares against potential
-        #    matches, in path-ext order
-
-        # - We still have to look for bare node_type as user may have
-        #   specified extension manually
-        resource_name = resource_name.lower()
-        patterns = [resource_name, resource_name+'.exe', resource_name+'.bat', resource_name+'.py']
-        for p, dirs, files in os.walk(d):
-            # case insensitive
-            files = [f.lower() for f in files]
-            for name in patterns:
-                if name in files:
-                    test_path = os.path.join(p, name)
-                    if filter_fn is not None:
-                        if filter_fn(test_path):
-                            matches.append(test_path)
-                    else:
-                        matches.append(test_path)
-            # remove .svn/.git/etc
-            to_prune = [x for x in dirs if x.startswith('.')]
-            for x in to_prune:
-                dirs.remove(x)
-    else:  # UNIX
-        for p, dirs, files in os.walk(d, followlinks=True):
-            if resource_name in files:
-                test_path = os.path.join(p, resource_name)
-                if filter_fn is not None:
-                    if filter_fn(test_path):
-                        matches.append(test_path)
-                else:
-                    matches.append(test_path)
-            # remove .svn/.git/etc
-            to_prune = [x for x in dirs if x.startswith('.')]
-            for x in to_prune:
-                dirs.remove(x)
-    return [os.path.abspath(m) for m in matches]
+    return _get_resource_index(d).find(resource_name, filter_fn)
+
+
+# number of trees that _prefetch_resource_indexes() crawls at once
+_PREFETCH_WORKERS = 4
+# (pid, executor) shared by all prefetches, see _get_prefetch_executor()
+_prefetch_executor = None
+_prefetch_executor_lock = threading.Lock()
+
+
+def _get_prefetch_executor():
+    """
+    @return: thread pool for L{_prefetch_resource_indexes()}, created
+        anew in forked processes. Its tasks only wait for the pool of
+        roslib.crawler, never for their own.
+    @rtype: ThreadPoolExecutor
+    """
+    global _prefetch_executor
+    pid = os.getpid()
+    with _prefetch_executor_lock:
+        if _prefetch_executor is None or _prefetch_executor[0] != pid:
+            _prefetch_executor = (pid, roslib.crawler.ThreadPoolExecutor(_PREFETCH_WORKERS))
+        return _prefetch_executor[1]
+
+
+def _prefetch_resource_indexes(indexes):
+    """
+    Crawl the trees that have not been indexed yet in parallel.
+
+    @return: pending crawls
+    @rtype: {L{_ResourceIndex}: Future}
+    """
+    cold = [index for index in indexes if index._checked is None]
+    if len(cold) < 2 or roslib.crawler.ThreadPoolExecutor is None:
+        return {}
+    executor = _get_prefetch_executor()
+    return dict((index, executor.submit(index.update)) for index in cold)
 
 
 # TODO: this routine really belongs in rospkg, but the catkin-isms really, really don't
 # belong in rospkg.  With more thought, they can probably be abstracted out so as
 # to no longer be catkin-specific.
-def find_resource(pkg, resource_name, filter_fn=None, rospack=None):
+def iter_resource(pkg, resource_name, filter_fn=None, rospack=None):
     """
     Warning: unstable API due to catkin.
 
-    Locate the file named resource_name in package, optionally
-    matching specified filter.  find_resource() will return a list of
-    matches, but only for a given scope.  If the resource is found in
-    the binary build directory, it will only return matches in that
-    directory; it will not return matches from the ROS_PACKAGE_PATH as
-    well in this case.
+    Generator version of L{find_resource()}. Matches are generated in
+    order of precedence: catkin libexec and share directories first,
+    then the package directory. All scopes are indexed concurrently,
+    but the filter is only applied until the caller stops consuming,
+    so callers that need the first match do not pay for the rest.
 
     :param filter: function that takes in a path argument and
         returns True if the it matches the desired resource, ``fn(str)``
     :param rospack: `rospkg.RosPack` instance to use
-    :returns: lists of matching paths for resource within a given scope, ``[str]``
-    :raises: :exc:`rospkg.ResourceNotFound` If package does not exist
+    :returns: generator of matching paths for resource, ``iter(str)``
+    :raises: :exc:`rospkg.ResourceNotFound` If package does not exist,
+        when the generator is first advanced
     """
 
     # New resource-location policy in Fuerte, induced by the new catkin
@@ -518,27 +839,79 @@ def find_resource(pkg, resource_name, filter_fn=None, rospack=None):
     # lookup package as it *must* exist
     pkg_path = rospack.get_path(pkg)
 
-    source_path_to_packages = rospack.get_custom_cache('source_path_to_packages', {})
+    source_path_to_packages = rospack.get_custom_cache('source_path_to_packages')
+    if source_path_to_packages is None:
+        # reuse the source spaces crawled by earlier processes
+        source_path_to_packages = roslib.pkgindex.load_source_packages()
+    known = len(source_path_to_packages)
 
     # if found in binary dir, start with that.  in any case, use matches
     # from ros_package_path
-    matches = []
     search_paths = catkin_find(
         search_dirs=['libexec', 'share'], project=pkg, first_matching_workspace_only=True,
         source_path_to_packages=source_path_to_packages)
 
-    # persist mapping of packages in rospack instance
-    if source_path_to_packages:
-        rospack.set_custom_cache('source_path_to_packages', source_path_to_packages)
-
-    for search_path in search_paths:
-        matches.extend(_find_resource(search_path, resource_name, filter_fn=filter_fn))
+    # persist mapping of packages in rospack instance and on disk
+    rospack.set_custom_cache('source_path_to_packages', source_path_to_packages)
+    if len(source_path_to_packages) != known:
+        roslib.pkgindex.save_source_packages(source_path_to_packages)
 
-    matches.extend(_find_resource(pkg_path, resource_name, filter_fn=filter_fn))
+    dirs = _unique([os.path.abspath(d) for d in search_paths + [pkg_path]])
+    indexes = [_get_resource_index(d) for d in dirs]
+    pending = _prefetch_resource_indexes(indexes)
 
     # Uniquify the results, in case we found the same file twice, while keeping order
-    unique_matches = []
-    for match in matches:
-        if match not in unique_matches:
-            unique_matches.append(match)
-    return unique_matches
+    seen = set()
+    for index in indexes:
+        if index in pending:
+            pending[index].result()
+        for test_path in index.iter_find(resource_name, filter_fn):
+            if test_path not in seen:
+                seen.add(test_path)
+                yield test_path
+
+
+def find_resource(pkg, resource_name, filter_fn=None, rospack=None, max_matches=None):
+    """
+    Warning: unstable API due to catkin.
+
+    Locate the file named resource_name in package, optionally
+    matching specified filter.  find_resource() will return a list of
+    matches, but only for a given scope.  If the resource is found in
+    the binary build directory, it will only return matches in that
+    directory; it will not return matches from the ROS_PACKAGE_PATH as
+    well in this case.
+
+    :param filter: function that takes in a path argument and
+        returns True if the it matches the desired resource, ``fn(str)``
+    :param rospack: `rospkg.RosPack` instance to use
+    :param max_matches: (optional) stop searching after this many
+        matches, ``int``
+    :returns: lists of matching paths for resource within a given scope, ``[str]``
+    :raises: :exc:`rospkg.ResourceNotFound` If package does not exist
+    """
+    matches = iter_resource(pkg, resource_name, filter_fn=filter_fn, rospack=rospack)
+    if max_matches is not None:
+        matches = itertools.islice(matches, max_matches)
+    return list(matches)
+
+
+# every caller gets its own list
+_resource_flights = roslib.locks.SingleFlight(copy=list)
+
+
+def afind_resource(pkg, resource_name, filter_fn=None, rospack=None, max_matches=None):
+    """
+    Warning: unstable API due to catkin.
+
+    asyncio version of L{find_resource()}. The search runs on the
+    executor of the running event loop and concurrent requests with
+    the same arguments share a single search.
+
+    :returns: future for the list of matching paths, ``asyncio.Future``
+    :raises: :exc:`rospkg.ResourceNotFound` from the future, if
+        package does not exist
+    """
+    key = (pkg, resource_name, filter_fn, rospack, max_matches,
+           os.environ.get(ROS_ROOT), os.environ.get(ROS_PACKAGE_PATH))
+    return _resource_flights.run(key, find_resource, pkg, resource_name, filter_fn, rospack, max_matches)
@@ -0,0 +1,915 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2008, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Persistent index of the ROS packages on a ROS_ROOT/ROS_PACKAGE_PATH
+pair.
+
+The index is crawled with the same rules as
+L{roslib.packages.list_pkgs_by_path}, stored under ROS_HOME and
+revalidated against the mtimes of the directories that were crawled.
+This lets roslib answer package lookups in process instead of forking
+C{rospack find}.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import roslib.crawler
+import roslib.packages
+
+import rospkg
+
+ROS_ROOT = rospkg.environment.ROS_ROOT
+ROS_PACKAGE_PATH = rospkg.environment.ROS_PACKAGE_PATH
+
+# version of the on-disk format, bump when the format changes
+INDEX_VERSION = 2
+
+# directory within ROS_HOME that index files are stored in
+INDEX_DIR = 'roslib_index'
+
+# catkin source space to package mapping, shared by all environments
+SOURCE_PACKAGES_FILE = 'source_packages.json'
+SOURCE_PACKAGES_VERSION = 1
+# marker file that catkin writes into each workspace
+CATKIN_MARKER_FILE = '.catkin'
+
+STACK_FILE = 'stack.xml'
+# may declare the stack version instead of stack.xml, see REP 109
+STACK_CMAKE_FILE = 'CMakeLists.txt'
+
+# maximum number of environments (ROS_ROOT/ROS_PACKAGE_PATH pairs)
+# whose caches are kept in memory
+MAX_ENVIRONMENTS = 8
+
+# maximum number of missing packages remembered per index
+MISSING_CACHE_SIZE = 1024
+
+# same setting rospack uses for its own rospack_cache
+ROS_CACHE_TIMEOUT = 'ROS_CACHE_TIMEOUT'
+DEFAULT_CACHE_TIMEOUT = 60.0
+
+# os.rename() cannot replace an existing file on Windows
+_replace = getattr(os, 'replace', os.rename)
+
+
+def get_cache_timeout(env=None):
+    """
+    @param env: override os.environ dictionary
+    @type  env: dict
+    @return: number of seconds an index is trusted before its
+        directory mtimes are checked again
+    @rtype: float
+    """
+    if env is None:
+        env = os.environ
+    try:
+        return float(env.get(ROS_CACHE_TIMEOUT, DEFAULT_CACHE_TIMEOUT))
+    except ValueError:
+        return DEFAULT_CACHE_TIMEOUT
+
+
+def get_index_file(ros_root, ros_package_path, env=None):
+    """
+    @param ros_root: ROS_ROOT value
+    @type  ros_root: str
+    @param ros_package_path: ROS_PACKAGE_PATH value
+    @type  ros_package_path: str
+    @param env: override os.environ dictionary
+    @type  env: dict
+    @return: path of the on-disk index for the specified environment
+    @rtype: str
+    """
+    key = '%s\n%s' % (ros_root or '', ros_package_path or '')
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(rospkg.get_ros_home(env), INDEX_DIR, 'packages-%s.json' % digest)
+
+
+def check_mtimes(dir_mtimes):
+    """
+    @param dir_mtimes: mtimes recorded during a crawl, None for
+        directories that did not exist
+    @type  dir_mtimes: {str: float}
+    @return: True if none of the directories has changed since
+    @rtype: bool
+    """
+    for d, mtime in list(dir_mtimes.items()):
+        try:
+            if os.stat(d).st_mtime != mtime:
+                return False
+        except OSError:
+            if mtime is not None:
+                return False
+    return True
+
+
+def get_mtimes(paths):
+    """
+    @param paths: files or directories
+    @type  paths: [str]
+    @return: current mtime of each path, None if it does not exist
+    @rtype: {str: float}
+    """
+    mtimes = {}
+    for p in paths:
+        try:
+            mtimes[p] = os.stat(p).st_mtime
+        except OSError:
+            mtimes[p] = None
+    return mtimes
+
+
+class _SourcePackage(object):
+    """
+    Package of a catkin source space restored from disk. catkin_find
+    only looks at the package name.
+    """
+
+    __slots__ = ['name']
+
+    def __init__(self, name):
+        self.name = name
+
+
+def _get_marker_mtimes():
+    # only the source space cache depends on catkin
+    from catkin.workspace import get_workspaces
+    return get_mtimes([os.path.join(w, CATKIN_MARKER_FILE) for w in get_workspaces()])
+
+
+def get_source_packages_file(env=None):
+    """
+    @param env: override os.environ dictionary
+    @type  env: dict
+    @return: path of the on-disk source space cache
+    @rtype: str
+    """
+    return os.path.join(rospkg.get_ros_home(env), INDEX_DIR, SOURCE_PACKAGES_FILE)
+
+
+def load_source_packages(filename=None):
+    """
+    Load the catkin source_path_to_packages mapping persisted by
+    L{save_source_packages()}. The mapping is dropped if the marker
+    file of any workspace has changed, and single source spaces are
+    dropped if their directory has changed.
+
+    @param filename: (optional) override location of the cache
+    @type  filename: str
+    @return: source_path_to_packages argument for catkin_find
+    @rtype: {str: {str: object}}
+    """
+    if filename is None:
+        filename = get_source_packages_file()
+    try:
+        with open(filename) as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != SOURCE_PACKAGES_VERSION or \
+            data.get('markers') != _get_marker_mtimes():
+        return {}
+    source_path_to_packages = {}
+    for source_path, entry in data['source_paths'].items():
+        if check_mtimes({source_path: entry['mtime']}):
+            source_path_to_packages[source_path] = dict(
+                (path, _SourcePackage(name)) for path, name in entry['packages'].items())
+    return source_path_to_packages
+
+
+def save_source_packages(source_path_to_packages, filename=None):
+    """
+    Persist a catkin source_path_to_packages mapping.
+
+    @param source_path_to_packages: mapping filled in by catkin_find
+    @type  source_path_to_packages: {str: {str: object}}
+    @param filename: (optional) override location of the cache
+    @type  filename: str
+    """
+    if filename is None:
+        filename = get_source_packages_file()
+    mtimes = get_mtimes(source_path_to_packages.keys())
+    _write_json(filename, {
+        'version': SOURCE_PACKAGES_VERSION,
+        'markers': _get_marker_mtimes(),
+        'source_paths': dict(
+            (source_path, {'mtime': mtimes[source_path],
+                           'packages': dict((path, p.name) for path, p in packages.items())})
+            for source_path, packages in source_path_to_packages.items()),
+    })
+
+
+def _write_json(filename, data):
+    """
+    Atomically replace filename with the JSON encoding of data. Errors
+    are ignored as the index is only an optimization (e.g. ROS_HOME
+    may be read-only).
+    """
+    try:
+        d = os.path.dirname(filename)
+        if not os.path.isdir(d):
+            os.makedirs(d)
+        fd, tmp = tempfile.mkstemp(prefix='.tmp', dir=d)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            _replace(tmp, filename)
+        except Exception:
+            os.remove(tmp)
+            raise
+    except (IOError, OSError):
+        pass
+
+
+def _crawl(paths, dir_mtimes):
+    """
+    Crawl paths for packages and stacks in one pass. Packages are found
+    with the same rules as L{roslib.packages.list_pkgs_by_path()} with
+    include_catkin.
+
+    @return: ((package or None, is stack), directory) in order of
+        precedence. A package may be listed more than once.
+    @rtype: [((str, bool), str)]
+    """
+    def visit(d, files):
+        is_stack = STACK_FILE in files
+        if roslib.packages.MANIFEST_FILE in files:
+            return (os.path.basename(d), is_stack), False
+        elif roslib.packages.PACKAGE_FILE in files:
+            return (roslib.packages._get_package_xml_name(d), is_stack), False
+        value = (None, True) if is_stack else None
+        return value, 'rospack_nosubdirs' not in files
+    return roslib.crawler.crawl(paths, visit, skip_dir=roslib.packages._is_vcs_dir, dir_mtimes=dir_mtimes)
+
+
+def _read_stack(d, dir_mtimes):
+    """
+    @param dir_mtimes: updated with the mtimes of the files the
+        metadata is read from
+    @type  dir_mtimes: {str: float}
+    @return: metadata of the stack in d, see
+        L{roslib.stacks._read_stack_metadata()}
+    @rtype: dict
+    """
+    import roslib.stacks
+    dir_mtimes.update(get_mtimes([os.path.join(d, STACK_FILE), os.path.join(d, STACK_CMAKE_FILE)]))
+    return roslib.stacks._read_stack_metadata(d)
+
+
+def _find_stack(d, stacks):
+    """
+    @param stacks: {stack dir: metadata}
+    @type  stacks: {str: dict}
+    @return: name of the innermost stack that contains d, or None
+    @rtype: str
+    """
+    while d and os.path.dirname(d) != d:
+        stack = stacks.get(d)
+        if stack is not None:
+            return stack['name']
+        d = os.path.dirname(d)
+    return None
+
+
+def _is_recorded_file(path):
+    """
+    @return: True for the files whose mtimes the index records
+        alongside the crawled directories
+    @rtype: bool
+    """
+    return os.path.basename(path) in (roslib.crawler.IGNORE_FILE, STACK_FILE, STACK_CMAKE_FILE)
+
+
+def _split(path):
+    """
+    @return: components of an absolute, normalized path
+    @rtype: [str]
+    """
+    drive, path = os.path.splitdrive(path)
+    return [drive] + [c for c in path.split(os.sep) if c]
+
+
+class PackageTrie(object):
+    """
+    Path component trie of package directories. Maps any path to the
+    package that contains it with one dictionary lookup per path
+    component and without touching the filesystem.
+    """
+
+    def __init__(self, packages):
+        """
+        @param packages: package directories
+        @type  packages: {str: str}
+        """
+        # each node is a dict of child nodes, None holds the package
+        self.root = {}
+        for package, d in packages.items():
+            node = self.root
+            for c in _split(os.path.abspath(d)):
+                node = node.setdefault(c, {})
+            node[None] = (d, package)
+
+    def find(self, path):
+        """
+        @param path: file or directory path
+        @type  path: str
+        @return: (package_directory, package) of the innermost package
+            that contains path, or None, None
+        @rtype: (str, str)
+        """
+        node = self.root
+        found = node.get(None, (None, None))
+        for c in _split(os.path.abspath(path)):
+            node = node.get(c)
+            if node is None:
+                break
+            found = node.get(None, found)
+        return found
+
+
+class PackageIndex(object):
+    """
+    Package name to directory mapping for a single
+    ROS_ROOT/ROS_PACKAGE_PATH pair. The mapping follows the same
+    precedence rules as rospack: the first path on the ROS path wins.
+
+    Lookups are safe from several threads. The mappings are never
+    modified in place but replaced, so readers do not lock, while
+    rebuilds and patches are serialized.
+    """
+
+    def __init__(self, ros_root, ros_package_path, filename=None):
+        """
+        @param ros_root: ROS_ROOT value
+        @type  ros_root: str
+        @param ros_package_path: ROS_PACKAGE_PATH value
+        @type  ros_package_path: str
+        @param filename: (optional) override location of on-disk index
+        @type  filename: str
+        """
+        self.ros_root = ros_root
+        self.ros_package_path = ros_package_path
+        if filename is None:
+            filename = get_index_file(ros_root, ros_package_path)
+        self.filename = filename
+        # {package: dir}
+        self.packages = {}
+        # {stack dir: metadata}, every stack around or above an
+        # indexed package, see L{get_stack_metadata()}
+        self.stacks = {}
+        # {package: name of the innermost stack around it}
+        self.package_stacks = {}
+        # {dir: mtime}, None if the directory did not exist
+        self.dir_mtimes = {}
+        # set while a L{roslib.inotify.PackageWatcher} keeps the index
+        # current, which makes periodic freshness checks unnecessary
+        self.watched = False
+        # called with the index after every rebuild
+        self.listeners = []
+        # bumped whenever the package mapping changes
+        self.generation = 0
+        # (trie, generation)
+        self._trie = None
+        # {package: expiry time} of packages that could not be located,
+        # valid for self._missing_generation only
+        self._missing = collections.OrderedDict()
+        self._missing_generation = None
+        self._loaded = False
+        # set once a loaded mapping has been published, readers that
+        # see it skip the lock
+        self._ready = False
+        self._checked = 0.0
+        self._lock = threading.RLock()
+
+    def get_ros_paths(self):
+        """
+        @return: ordered list of paths to search for packages
+        @rtype: [str]
+        """
+        env = {}
+        if self.ros_root:
+            env[ROS_ROOT] = self.ros_root
+        if self.ros_package_path:
+            env[ROS_PACKAGE_PATH] = self.ros_package_path
+        return rospkg.get_ros_paths(env)
+
+    def build(self):
+        """
+        Crawl the ROS path and replace the in-memory index.
+        """
+        packages = {}
+        stack_dirs = []
+        dir_mtimes = {}
+        paths = [os.path.abspath(p) for p in self.get_ros_paths()]
+        for path in paths:
+            if not os.path.isdir(path):
+                # record the miss so that creating the path invalidates us
+                dir_mtimes[path] = None
+            # stacks may start above the ROS path
+            d = os.path.dirname(path)
+            while os.path.dirname(d) != d:
+                stack_file = os.path.join(d, STACK_FILE)
+                dir_mtimes.update(get_mtimes([stack_file]))
+                if dir_mtimes[stack_file] is not None:
+                    stack_dirs.append(d)
+                d = os.path.dirname(d)
+        # all paths are crawled in one pass, first match wins
+        for (package, is_stack), d in _crawl(paths, dir_mtimes):
+            if is_stack:
+                stack_dirs.append(d)
+            if package is not None and package not in packages:
+                packages[package] = d
+        stacks = dict((d, _read_stack(d, dir_mtimes)) for d in stack_dirs)
+        package_stacks = {}
+        self._map_stacks(packages, stacks, package_stacks, packages.keys())
+        self.stacks = stacks
+        self.package_stacks = package_stacks
+        self.packages = packages
+        self.dir_mtimes = dir_mtimes
+        self.generation += 1
+
+    def _map_stacks(self, packages, stacks, package_stacks, names):
+        """
+        Update package_stacks for the packages in names.
+        """
+        for name in names:
+            stack = _find_stack(packages[name], stacks)
+            if stack is None:
+                package_stacks.pop(name, None)
+            else:
+                package_stacks[name] = stack
+
+    def is_fresh(self):
+        """
+        @return: True if none of the crawled directories has changed
+            since the index was built
+        @rtype: bool
+        """
+        return check_mtimes(self.dir_mtimes)
+
+    def load(self):
+        """
+        Load the on-disk index if it matches our environment.
+
+        @return: True if the on-disk index was loaded
+        @rtype: bool
+        """
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False
+        if not isinstance(data, dict) or data.get('version') != INDEX_VERSION or \
+                data.get('ros_root') != self.ros_root or \
+                data.get('ros_package_path') != self.ros_package_path:
+            return False
+        self.stacks = data['stacks']
+        self.package_stacks = data['package_stacks']
+        self.packages = data['packages']
+        self.dir_mtimes = data['dir_mtimes']
+        self.generation += 1
+        return True
+
+    def save(self):
+        """
+        Write the index to disk.
+        """
+        _write_json(self.filename, {
+            'version': INDEX_VERSION,
+            'ros_root': self.ros_root,
+            'ros_package_path': self.ros_package_path,
+            'packages': self.packages,
+            'stacks': self.stacks,
+            'package_stacks': self.package_stacks,
+            'dir_mtimes': self.dir_mtimes,
+        })
+
+    def rebuild(self):
+        """
+        Crawl the ROS path and write the result to disk.
+        """
+        self.build()
+        self.save()
+        for listener in self.listeners:
+            listener(self)
+
+    def invalidate(self):
+        """
+        Revalidate the index against the filesystem on next use.
+        """
+        self._ready = False
+        self._loaded = False
+
+    def is_loaded(self):
+        """
+        @return: True if the index is in memory, i.e. lookups do not
+            have to load or crawl it first
+        @rtype: bool
+        """
+        return self._ready
+
+    def is_indexed_path(self, path):
+        """
+        @param path: file or directory path
+        @type  path: str
+        @return: True if path is inside one of the crawled ROS paths
+        @rtype: bool
+        """
+        path = os.path.abspath(path)
+        for p in self.get_ros_paths():
+            p = os.path.abspath(p)
+            if path == p or path.startswith(p + os.sep):
+                return True
+        return False
+
+    def _precedence(self, d):
+        """
+        @return: index of the ROS path entry that d is in
+        @rtype: int
+        """
+        paths = [os.path.abspath(p) for p in self.get_ros_paths()]
+        for i, path in enumerate(paths):
+            if d == path or d.startswith(path + os.sep):
+                return i
+        return len(paths)
+
+    def add_tree(self, path):
+        """
+        Patch the index with the packages in a directory tree that
+        appeared on the ROS path.
+
+        @param path: root of the new directory tree
+        @type  path: str
+        @return: names of the packages that were added or relocated,
+            and the directories that were crawled
+        @rtype: ([str], [str])
+        """
+        with self._lock:
+            crawled = {}
+            packages = dict(self.packages)
+            stacks = dict(self.stacks)
+            added = []
+            if roslib.crawler.is_ignored(path):
+                found = []
+            else:
+                found = _crawl([path], crawled)
+            for (package, is_stack), d in found:
+                if is_stack:
+                    stacks[d] = _read_stack(d, crawled)
+                if package is None:
+                    continue
+                current = packages.get(package)
+                if current is None or self._precedence(d) < self._precedence(current):
+                    packages[package] = d
+                    added.append(package)
+            dir_mtimes = dict(self.dir_mtimes)
+            dir_mtimes.update(crawled)
+            # the listing of the parent changed as well
+            parent = os.path.dirname(path)
+            if parent in dir_mtimes:
+                try:
+                    dir_mtimes[parent] = os.stat(parent).st_mtime
+                except OSError:
+                    pass
+            package_stacks = dict(self.package_stacks)
+            self._map_stacks(packages, stacks, package_stacks, added)
+            self.stacks = stacks
+            self.package_stacks = package_stacks
+            self.packages = packages
+            self.dir_mtimes = dir_mtimes
+            if added:
+                self.generation += 1
+            return added, [d for d in crawled.keys() if not _is_recorded_file(d)]
+
+    def remove_tree(self, path):
+        """
+        Patch the index for a directory tree that disappeared from the
+        ROS path. The mtime of the parent directory is deliberately
+        left alone: a package that was shadowed by a removed one is
+        found by the recrawl that the next miss for it triggers.
+
+        @param path: root of the removed directory tree
+        @type  path: str
+        @return: names of the packages that were removed
+        @rtype: [str]
+        """
+        prefix = path + os.sep
+
+        def under(d):
+            return d == path or d.startswith(prefix)
+        with self._lock:
+            removed = [p for p, d in self.packages.items() if under(d)]
+            if removed:
+                gone = set(removed)
+                self.package_stacks = dict((p, s) for p, s in self.package_stacks.items() if p not in gone)
+                self.packages = dict((p, d) for p, d in self.packages.items() if not under(d))
+                self.generation += 1
+            self.stacks = dict((d, m) for d, m in self.stacks.items() if not under(d))
+            self.dir_mtimes = dict((d, m) for d, m in self.dir_mtimes.items() if not under(d))
+            return removed
+
+    def update_stack(self, d):
+        """
+        Reread the metadata of the stack in d, e.g. after its stack.xml
+        was edited.
+
+        @param d: stack directory
+        @type  d: str
+        """
+        with self._lock:
+            if d not in self.stacks:
+                return
+            dir_mtimes = dict(self.dir_mtimes)
+            stacks = dict(self.stacks)
+            stacks[d] = _read_stack(d, dir_mtimes)
+            self.stacks = stacks
+            self.dir_mtimes = dir_mtimes
+
+    def update(self, force=False):
+        """
+        Make sure the index is loaded and, if the cache timeout has
+        expired or force is True, that it is still fresh.
+
+        @param force: check freshness regardless of the cache timeout
+        @type  force: bool
+        @return: True if the index was rebuilt
+        @rtype: bool
+        """
+        if self._ready and not force and \
+                (self.watched or time.time() - self._checked <= get_cache_timeout()):
+            return False
+        with self._lock:
+            now = time.time()
+            if not self._loaded:
+                self._loaded = True
+                self._checked = now
+                if self.load() and self.is_fresh():
+                    rebuilt = False
+                else:
+                    self.rebuild()
+                    rebuilt = True
+                self._ready = True
+                return rebuilt
+            self._ready = True
+            if force or (not self.watched and now - self._checked > get_cache_timeout()):
+                self._checked = now
+                if not self.is_fresh():
+                    self.rebuild()
+                    return True
+            return False
+
+    def is_missing(self, package):
+        """
+        @return: True if package could not be located recently and the
+            index has not changed since
+        @rtype: bool
+        """
+        with self._lock:
+            if self._missing_generation != self.generation:
+                self._missing.clear()
+                self._missing_generation = self.generation
+                return False
+            expires = self._missing.get(package)
+            if expires is None:
+                return False
+            if expires < time.time():
+                del self._missing[package]
+                return False
+            return True
+
+    def add_missing(self, package):
+        """
+        Remember that package could not be located until the cache
+        timeout expires or the index changes.
+        """
+        with self._lock:
+            if self._missing_generation != self.generation:
+                self._missing.clear()
+                self._missing_generation = self.generation
+            self._missing.pop(package, None)
+            self._missing[package] = time.time() + get_cache_timeout()
+            while len(self._missing) > MISSING_CACHE_SIZE:
+                self._missing.popitem(last=False)
+
+    def get_path(self, package):
+        """
+        @param package: package name
+        @type  package: str
+        @return: directory of package or None if it cannot be located
+        @rtype: str
+        """
+        self.update()
+        d = self.packages.get(package)
+        if d is not None and os.path.isdir(d):
+            return d
+        if self.is_missing(package):
+            return None
+        # miss or relocated package: recrawl if the tree changed,
+        # possibly in another thread
+        generation = self.generation
+        self.update(force=True)
+        if self.generation != generation:
+            d = self.packages.get(package)
+        else:
+            d = None
+        if d is None:
+            self.add_missing(package)
+        return d
+
+    def get_paths(self, packages):
+        """
+        Look up many packages at once. Misses trigger at most one
+        freshness check for the whole batch.
+
+        @param packages: package names
+        @type  packages: [str]
+        @return: directories of the packages that could be located
+        @rtype: {str: str}
+        """
+        self.update()
+        found = {}
+        missing = []
+        for package in set(packages):
+            d = self.packages.get(package)
+            if d is not None and os.path.isdir(d):
+                found[package] = d
+            elif not self.is_missing(package):
+                missing.append(package)
+        if missing:
+            generation = self.generation
+            self.update(force=True)
+            rebuilt = self.generation != generation
+            for package in missing:
+                d = self.packages.get(package) if rebuilt else None
+                if d is not None:
+                    found[package] = d
+                else:
+                    self.add_missing(package)
+        return found
+
+    def get_trie(self):
+        """
+        @return: directory trie of the indexed packages
+        @rtype: L{PackageTrie}
+        """
+        self.update()
+        generation = self.generation
+        trie = self._trie
+        if trie is None or trie[1] != generation:
+            trie = (PackageTrie(self.packages), generation)
+            self._trie = trie
+        return trie[0]
+
+    def get_package_stack(self, package):
+        """
+        @param package: package name
+        @type  package: str
+        @return: name of the innermost stack that contains package,
+            None if package is not in a stack or not indexed
+        @rtype: str
+        """
+        self.update()
+        return self.package_stacks.get(package)
+
+    def get_stack_metadata(self, d):
+        """
+        @param d: stack directory
+        @type  d: str
+        @return: 'name' and 'version' of the stack in d, None if the
+            index does not know d. 'version' is missing if the stack
+            manifest is invalid.
+        @rtype: dict
+        """
+        self.update()
+        return self.stacks.get(d)
+
+    def list(self):
+        """
+        @return: names of all packages in the index
+        @rtype: [str]
+        """
+        self.update()
+        return list(self.packages.keys())
+
+
+class EnvCache(object):
+    """
+    Per-environment objects, e.g. package indexes of several overlays,
+    bounded to the most recently used environments.
+    """
+
+    def __init__(self, limit=None, keep=None):
+        """
+        @param limit: maximum number of entries, defaults to
+            L{MAX_ENVIRONMENTS}
+        @type  limit: int
+        @param keep: (optional) entries for which keep returns True are
+            never evicted
+        @type  keep: fn(object) -> bool
+        """
+        self.limit = MAX_ENVIRONMENTS if limit is None else limit
+        self.keep = keep
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        """
+        @param key: environment key
+        @type  key: tuple
+        @param factory: creates the entry if there is none
+        @type  factory: fn() -> object
+        @return: entry for key
+        """
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is None:
+                value = factory()
+            self._entries[key] = value
+            if len(self._entries) > self.limit:
+                for k in list(self._entries.keys()):
+                    if len(self._entries) <= self.limit:
+                        break
+                    if k != key and not (self.keep and self.keep(self._entries[k])):
+                        del self._entries[k]
+            return value
+
+    def values(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+def get_stack_metadata(d):
+    """
+    @param d: stack directory
+    @type  d: str
+    @return: metadata of the stack in d from any of the package indexes
+        in memory, None if none of them knows d
+    @rtype: dict
+    """
+    for index in _indexes.values():
+        metadata = index.get_stack_metadata(d)
+        if metadata is not None:
+            return metadata
+    return None
+
+
+# {(ros_root, ros_package_path): PackageIndex}, watched indexes are
+# kept as their watcher patches them
+_indexes = EnvCache(keep=lambda index: index.watched)
+
+
+def get_index(ros_root, ros_package_path):
+    """
+    @param ros_root: ROS_ROOT value
+    @type  ros_root: str
+    @param ros_package_path: ROS_PACKAGE_PATH value
+    @type  ros_package_path: str
+    @return: index for the specified environment
+    @rtype: L{PackageIndex}
+    """
+    return _indexes.get((ros_root, ros_package_path), lambda: PackageIndex(ros_root, ros_package_path))
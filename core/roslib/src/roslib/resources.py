@@ -82,9 +82,13 @@ def list_package_resources_by_dir(package_dir, include_depends, subdir, rfilter=
         resources = []
     if include_depends:
         depends = _get_manifest_by_dir(package_dir).depends
-        dirs = [roslib.packages.get_pkg_subdir(d.package, subdir, False) for d in depends]
-        for (dep, dir_) in zip(depends, dirs):  # py3k
-            if not dir_ or not os.path.isdir(dir_):
+        # resolve all dependencies with one package index lookup
+        pkg_dirs, _ = roslib.packages.get_pkg_dirs([d.package for d in depends])
+        for dep in depends:
+            if dep.package not in pkg_dirs:
+                continue
+            dir_ = os.path.join(pkg_dirs[dep.package], subdir)
+            if not os.path.isdir(dir_):
                 continue
             resources.extend(
                 [roslib.names.resource_name(dep.package, f, my_pkg=package)
@@ -43,6 +43,7 @@ import subprocess
 import sys
 import warnings
 
+import roslib.depgraph
 import roslib.exceptions
 
 import rospkg  # noqa: F401
@@ -73,6 +74,21 @@ def rospackexec(args):
     return val
 
 
+def _query(fn, name):
+    """
+    Run a dependency graph query. Like the rospack and rosstack commands
+    that these functions used to run, whose error messages went to
+    stderr, an unknown name or a broken manifest yields an empty list.
+
+    @return: fn(name) or [] on errors
+    @rtype: list
+    """
+    try:
+        return fn(name)
+    except roslib.exceptions.ROSLibException:
+        return []
+
+
 def rospack_depends_on_1(pkg):
     """
     @param pkg: package name
@@ -80,7 +96,7 @@ def rospack_depends_on_1(pkg):
     @return: A list of the names of the packages which depend directly on pkg
     @rtype: list
     """
-    return rospackexec(['depends-on1', pkg]).split()
+    return _query(roslib.depgraph.get_package_graph().get_depends_on1, pkg)
 
 
 def rospack_depends_on(pkg):
@@ -90,7 +106,7 @@ def rospack_depends_on(pkg):
     @return: A list of the names of the packages which depend on pkg
     @rtype: list
     """
-    return rospackexec(['depends-on', pkg]).split()
+    return _query(roslib.depgraph.get_package_graph().get_depends_on, pkg)
 
 
 def rospack_depends_1(pkg):
@@ -100,7 +116,7 @@ def rospack_depends_1(pkg):
     @return: A list of the names of the packages which pkg directly depends on
     @rtype: list
     """
-    return rospackexec(['deps1', pkg]).split()
+    return _query(roslib.depgraph.get_package_graph().get_depends1, pkg)
 
 
 def rospack_depends(pkg):
@@ -110,7 +126,7 @@ def rospack_depends(pkg):
     @return: A list of the names of the packages which pkg depends on
     @rtype: list
     """
-    return rospackexec(['deps', pkg]).split()
+    return _query(roslib.depgraph.get_package_graph().get_depends, pkg)
 
 
 def rospack_plugins(pkg):
@@ -120,11 +136,12 @@ def rospack_plugins(pkg):
     @return: A list of the names of the packages which provide a plugin for pkg
     @rtype: list
     """
-    val = rospackexec(['plugins', '--attrib=plugin', pkg])
-    if val:
-        return [tuple(x.split(' ')) for x in val.split('\n')]
-    else:
+    try:
+        plugins = roslib.depgraph.get_package_graph().get_plugins(pkg, 'plugin')
+    except roslib.exceptions.ROSLibException:
         return []
+    # same shape as splitting the lines that rospack prints
+    return [tuple(('%s %s' % (p, v)).split(' ')) for p, v in plugins]
 
 
 def rosstackexec(args):
@@ -151,7 +168,7 @@ def rosstack_depends_on(s):
     @return: A list of the names of the stacks which depend on s
     @rtype: list
     """
-    return rosstackexec(['depends-on', s]).split()
+    return _query(roslib.depgraph.get_stack_graph().get_depends_on, s)
 
 
 def rosstack_depends_on_1(s):
@@ -161,7 +178,7 @@ def rosstack_depends_on_1(s):
     @return: A list of the names of the stacks which depend directly on s
     @rtype: list
     """
-    return rosstackexec(['depends-on1', s]).split()
+    return _query(roslib.depgraph.get_stack_graph().get_depends_on1, s)
 
 
 def rosstack_depends(s):
@@ -171,7 +188,7 @@ def rosstack_depends(s):
     @return: A list of the names of the stacks which s depends on
     @rtype: list
     """
-    return rosstackexec(['depends', s]).split()
+    return _query(roslib.depgraph.get_stack_graph().get_depends, s)
 
 
 def rosstack_depends_1(s):
@@ -181,4 +198,4 @@ def rosstack_depends_1(s):
     @return: A list of the names of the stacks which s depends on directly
     @rtype: list
     """
-    return rosstackexec(['depends1', s]).split()
+    return _query(roslib.depgraph.get_stack_graph().get_depends1, s)
@@ -0,0 +1,265 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2008, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Persistent cache of parsed .msg and .srv files.
+
+L{roslib.msgs.load_from_file} and L{roslib.srvs.load_from_file} store
+the parse result of each file here, keyed by the path, mtime and size
+of the file, so that later processes rebuild the specs without
+tokenizing any text. The cache is a log of length-prefixed records in
+C{marshal} format under ROS_HOME. New entries are appended with a
+single write, which lets concurrent processes share the file, and the
+log is compacted when it is mostly made of stale records. Records that
+another process appends while the log is compacted may be lost, which
+only costs a parse.
+
+Set ROS_SPEC_CACHE=0 to disable the cache.
+"""
+
+import marshal
+import os
+import struct
+import sys
+import tempfile
+import threading
+
+import roslib.pkgindex
+
+import rospkg
+
+# version of the record format, bump when the cached data changes
+CACHE_VERSION = 1
+# set to 0 to disable the spec cache
+ROS_SPEC_CACHE = 'ROS_SPEC_CACHE'
+
+# record header: length of the marshalled record
+_HEADER = struct.Struct('<I')
+# log is compacted when it holds more stale than live records
+_MIN_COMPACT_RECORDS = 256
+
+_lock = threading.Lock()
+# (filename, {key: (mtime, size, data)}, number of records in the file)
+_cache = (None, {}, 0)
+# (filename, file descriptor) that records are appended to
+_append_fd = (None, None)
+
+
+def is_enabled(env=None):
+    """
+    @param env: override os.environ dictionary
+    @type  env: dict
+    @return: True if parsed specs are persisted in ROS_HOME
+    @rtype: bool
+    """
+    if env is None:
+        env = os.environ
+    return env.get(ROS_SPEC_CACHE, '1') != '0'
+
+
+def get_cache_file(env=None):
+    """
+    @param env: override os.environ dictionary
+    @type  env: dict
+    @return: path of the spec cache. marshal data is specific to the
+        Python version, so each version has its own file.
+    @rtype: str
+    """
+    name = 'specs-%d-py%d%d.bin' % ((CACHE_VERSION,) + tuple(sys.version_info[:2]))
+    return os.path.join(rospkg.get_ros_home(env), roslib.pkgindex.INDEX_DIR, name)
+
+
+def _read(filename):
+    """
+    @return: entries of the log and number of records read. A
+        truncated or corrupt tail is ignored.
+    @rtype: ({str: (float, int, object)}, int)
+    """
+    try:
+        with open(filename, 'rb') as f:
+            buff = f.read()
+    except (IOError, OSError):
+        return {}, 0
+    entries = {}
+    count = 0
+    offset = 0
+    while offset + _HEADER.size <= len(buff):
+        length = _HEADER.unpack_from(buff, offset)[0]
+        offset += _HEADER.size
+        if offset + length > len(buff):
+            break
+        try:
+            key, mtime, size, data = marshal.loads(buff[offset:offset + length])
+        except (EOFError, ValueError, TypeError):
+            break
+        offset += length
+        entries[key] = (mtime, size, data)
+        count += 1
+    return entries, count
+
+
+def _encode(key, entry):
+    record = marshal.dumps((key,) + entry)
+    return _HEADER.pack(len(record)) + record
+
+
+def _append(filename, key, entry):
+    """
+    Append a record to the log. Errors are ignored as the cache is
+    only an optimization (e.g. ROS_HOME may be read-only).
+    """
+    global _append_fd
+    try:
+        with _lock:
+            if _append_fd[0] != filename:
+                d = os.path.dirname(filename)
+                if not os.path.isdir(d):
+                    os.makedirs(d)
+                if _append_fd[1] is not None:
+                    os.close(_append_fd[1])
+                _append_fd = (None, None)
+                _append_fd = (filename, os.open(filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644))
+            os.write(_append_fd[1], _encode(key, entry))
+    except (IOError, OSError):
+        pass
+
+
+def _compact(filename, entries):
+    """
+    Atomically replace the log with one record per live entry.
+    """
+    try:
+        fd, tmp = tempfile.mkstemp(prefix='.tmp', dir=os.path.dirname(filename))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for key, entry in entries.items():
+                    f.write(_encode(key, entry))
+            roslib.pkgindex._replace(tmp, filename)
+        except Exception:
+            os.remove(tmp)
+            raise
+    except (IOError, OSError):
+        pass
+
+
+def _get_entries():
+    """
+    @return: cache file and its entries, read on first use
+    @rtype: (str, {str: (float, int, object)})
+    """
+    global _cache
+    filename = get_cache_file()
+    if _cache[0] == filename:
+        return _cache[:2]
+    with _lock:
+        if _cache[0] != filename:
+            entries, count = _read(filename)
+            if count > _MIN_COMPACT_RECORDS and count > 2 * len(entries):
+                _compact(filename, entries)
+                count = len(entries)
+            _cache = (filename, entries, count)
+    return _cache[:2]
+
+
+def _get_key(kind, path, package_context):
+    return '%s\n%s\n%s' % (kind, os.path.abspath(path), package_context)
+
+
+def stat(path):
+    """
+    @param path: .msg or .srv file
+    @type  path: str
+    @return: identity of the file contents to pass to L{put}. Files
+        must be stat'ed before they are read so that a concurrent
+        change is detected.
+    @rtype: (float, int)
+    @raise OSError: if the file does not exist
+    """
+    s = os.stat(path)
+    return s.st_mtime, s.st_size
+
+
+def get(kind, path, package_context, identity):
+    """
+    @param kind: 'msg' or 'srv'
+    @type  kind: str
+    @param path: .msg or .srv file
+    @type  path: str
+    @param package_context: package context the file was parsed in
+    @type  package_context: str
+    @param identity: current L{stat} of the file
+    @type  identity: (float, int)
+    @return: data that was L{put} for the file, None if there is none
+        or the file has changed since
+    """
+    if not is_enabled():
+        return None
+    entry = _get_entries()[1].get(_get_key(kind, path, package_context))
+    if entry is None or entry[:2] != tuple(identity):
+        return None
+    return entry[2]
+
+
+def put(kind, path, package_context, identity, data):
+    """
+    Store the parse result of a file.
+
+    @param identity: L{stat} of the file taken before it was read
+    @type  identity: (float, int)
+    @param data: parse result, made of the types that marshal supports
+    """
+    global _cache
+    if not is_enabled():
+        return
+    filename, entries = _get_entries()
+    key = _get_key(kind, path, package_context)
+    entry = tuple(identity) + (data,)
+    with _lock:
+        if _cache[0] != filename:
+            return
+        # single dict assignments are atomic for the readers in get()
+        entries[key] = entry
+        _cache = (filename, entries, _cache[2] + 1)
+    _append(filename, key, entry)
+
+
+def clear():
+    """
+    Forget the entries read by this process, e.g. after ROS_HOME has
+    been modified by another process.
+    """
+    global _cache, _append_fd
+    with _lock:
+        _cache = (None, {}, 0)
+        if _append_fd[1] is not None:
+            os.close(_append_fd[1])
+        _append_fd = (None, None)
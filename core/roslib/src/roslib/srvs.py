@@ -40,11 +40,6 @@ Implements U{http://ros.org/wiki/srv}
 import os
 import sys
 
-try:
-    from cStringIO import StringIO  # Python 2.x
-except ImportError:
-    from io import StringIO  # Python 3.x
-
 # don't directly use code from this, though we do depend on the
 # manifest.Depend data type
 import roslib.manifest
@@ -52,6 +47,7 @@ import roslib.msgs
 import roslib.names
 import roslib.packages
 import roslib.resources
+import roslib.speccache
 
 # file extension
 EXT = '.srv'  # alias
@@ -179,19 +175,19 @@ def load_from_string(text, package_context='', full_name='', short_name=''):
     @rtype: roslib.MsgSpec
     @raise roslib.MsgSpecException: if syntax errors or other problems are detected in file
     """
-    text_in = StringIO()
-    text_out = StringIO()
+    text_in = []
+    text_out = []
     accum = text_in
-    for l in text.split('\n'):
-        l = l.split(COMMENTCHAR)[0].strip()  # strip comments
-        if l.startswith(IODELIM):  # lenient, by request
+    for line in text.split('\n'):
+        line = line.split(COMMENTCHAR, 1)[0].strip()  # strip comments
+        if line.startswith(IODELIM):  # lenient, by request
             accum = text_out
         else:
-            accum.write(l+'\n')
+            accum.append(line + '\n')
     # create separate roslib.msgs objects for each half of file
 
-    msg_in = roslib.msgs.load_from_string(text_in.getvalue(), package_context, '%sRequest' % (full_name), '%sRequest' % (short_name))
-    msg_out = roslib.msgs.load_from_string(text_out.getvalue(), package_context, '%sResponse' % (full_name), '%sResponse' % (short_name))
+    msg_in = roslib.msgs.load_from_string(''.join(text_in), package_context, '%sRequest' % (full_name), '%sRequest' % (short_name))
+    msg_out = roslib.msgs.load_from_string(''.join(text_out), package_context, '%sResponse' % (full_name), '%sResponse' % (short_name))
     return SrvSpec(msg_in, msg_out, text, full_name, short_name, package_context)
 
 
@@ -223,9 +219,25 @@ def load_from_file(file_name, package_context=''):
     if not roslib.names.is_legal_resource_name(type_):
         raise SrvSpecException('%s: %s is not a legal service type name' % (file_name, type_))
 
+    try:
+        identity = roslib.speccache.stat(file_name)
+    except OSError:
+        identity = None  # open() raises below
+    data = roslib.speccache.get('srv', file_name, package_context, identity) if identity else None
+    if data is not None:
+        request, response, text = data
+        return (type_, SrvSpec(
+            roslib.msgs._spec_from_data(request, package_context, '%sRequest' % type_, '%sRequest' % base_type_),
+            roslib.msgs._spec_from_data(response, package_context, '%sResponse' % type_, '%sResponse' % base_type_),
+            text, type_, base_type_, package_context))
+
     f = open(file_name, 'r')
     try:
         text = f.read()
-        return (type_, load_from_string(text, package_context, type_, base_type_))
+        spec = load_from_string(text, package_context, type_, base_type_)
     finally:
         f.close()
+    if identity:
+        roslib.speccache.put('srv', file_name, package_context, identity, (
+            roslib.msgs._spec_to_data(spec.request), roslib.msgs._spec_to_data(spec.response), spec.text))
+    return (type_, spec)
@@ -41,8 +41,12 @@ routines will likely be *deleted* in future releases.
 
 import os
 import re
+import time
 
+import roslib.crawler
+import roslib.locks
 import roslib.packages
+import roslib.pkgindex
 import roslib.stack_manifest
 
 import rospkg
@@ -72,7 +76,12 @@ def stack_of(pkg, env=None):
     """
     if env is None:
         env = os.environ
-    pkg_dir = roslib.packages.get_pkg_dir(pkg, ros_root=env[ROS_ROOT], ros_package_path=env.get(ROS_PACKAGE_PATH, None))
+    ros_root, ros_package_path = env[ROS_ROOT], env.get(ROS_PACKAGE_PATH, None)
+    pkg_dir = roslib.packages.get_pkg_dir(pkg, ros_root=ros_root, ros_package_path=ros_package_path)
+    index = roslib.pkgindex.get_index(*roslib.packages._resolve_ros_env(env=env))
+    if index.packages.get(pkg) == pkg_dir:
+        # the index maps packages to stacks in the same crawl
+        return index.get_package_stack(pkg)
     d = pkg_dir
     while d and os.path.dirname(d) != d:
         stack_file = os.path.join(d, STACK_FILE)
@@ -98,26 +107,102 @@ def get_stack_dir(stack, env=None):
     @rtype: str
     @raise InvalidROSStackException: if stack cannot be located.
     """
-    _init_rosstack(env=env)
+    rosstack = _init_rosstack(env=env)
     try:
-        return _rosstack.get_path(stack)
+        return rosstack.get_path(stack)
     except rospkg.ResourceNotFound:
         # preserve old signature
         raise InvalidROSStackException(stack)
 
 
+# RosStack of the environment last passed to _init_rosstack()
 _rosstack = None
-_ros_paths = None
+
+# {(ros_root, ros_package_path): [manager, index, generation, created, checked]}
+_rosstacks = roslib.pkgindex.EnvCache()
+_rospacks = roslib.pkgindex.EnvCache()
+# guards the entries of _rosstacks and _rospacks by environment
+_manager_locks = roslib.locks.StripedLock()
+
+
+def _is_manager_fresh(manager, created):
+    """
+    @param created: time at which manager was created
+    @type  created: float
+    @return: False if a manifest that manager has parsed was modified
+        after it was created
+    @rtype: bool
+    """
+    locations = manager._location_cache or {}
+    files = []
+    for name in list(manager._manifests.keys()):
+        d = locations.get(name)
+        if d is not None:
+            files.append(os.path.join(d, manager._manifest_name))
+            files.append(os.path.join(d, roslib.packages.PACKAGE_FILE))
+    for mtime in roslib.pkgindex.get_mtimes(files).values():
+        if mtime is not None and mtime >= created:
+            return False
+    return True
+
+
+def _get_manager(cache, env):
+    """
+    Get the RosPack or RosStack instance for an environment. Instances
+    are kept for several environments and replaced when the package
+    index of their environment changes, which also covers stacks as
+    the index records the mtime of every directory above a package.
+    Edits to the manifests that an instance has parsed are detected
+    by their mtimes, at most once per cache timeout.
+
+    @param cache: L{_rospacks} or L{_rosstacks}
+    @type  cache: L{roslib.pkgindex.EnvCache}
+    @param env: environment dictionary
+    @type  env: dict
+    @rtype: rospkg.ManifestManager
+    """
+    key = roslib.packages._resolve_ros_env(env=env)
+    index = roslib.pkgindex.get_index(*key)
+    index.update()
+    entry = cache.get(key, lambda: [None, None, None, None, None])
+    manager, entry_index, generation, created, checked = entry
+    now = time.time()
+    expired = manager is not None and now - checked > roslib.pkgindex.get_cache_timeout()
+    if manager is not None and entry_index is index and generation == index.generation and not expired:
+        return manager
+    with _manager_locks.get(key):
+        if expired and entry[0] is manager:
+            if _is_manager_fresh(manager, created):
+                entry[4] = now
+            else:
+                entry[0] = None
+        if entry[0] is None or entry[1] is not index or entry[2] != index.generation:
+            generation = index.generation
+            ros_paths = rospkg.get_ros_paths(env)
+            if cache is _rospacks:
+                manager = rospkg.RosPack(ros_paths)
+                # no need to crawl again, the index follows the same rules
+                manager._location_cache = dict(index.packages)
+            else:
+                manager = rospkg.RosStack(ros_paths)
+                # rospkg fills its location cache in place, so crawl
+                # before other threads can see the instance
+                manager.list()
+            entry[:] = [manager, index, generation, now, now]
+        return entry[0]
 
 
 def _init_rosstack(env=None):
-    global _rosstack, _ros_paths
+    """
+    @return: RosStack for env
+    @rtype: rospkg.RosStack
+    """
+    global _rosstack
     if env is None:
         env = os.environ
-    ros_paths = rospkg.get_ros_paths(env)
-    if ros_paths != _ros_paths:
-        _ros_paths = ros_paths
-        _rosstack = rospkg.RosStack(ros_paths)
+    rosstack = _get_manager(_rosstacks, env)
+    _rosstack = rosstack
+    return rosstack
 
 
 def list_stacks(env=None):
@@ -131,8 +216,7 @@ def list_stacks(env=None):
     @return: complete list of stacks names in ROS environment
     @rtype: [str]
     """
-    _init_rosstack(env=env)
-    return _rosstack.list()
+    return _init_rosstack(env=env).list()
 
 
 def list_stacks_by_path(path, stacks=None, cache=None):
@@ -143,6 +227,8 @@ def list_stacks_by_path(path, stacks=None, cache=None):
     updated with the stack->path mappings. list_stacks_by_path() does
     NOT returned cached results -- it only updates the cache.
 
+    Symlinks are followed; symlink loops are detected and skipped.
+
     @param path: path to list stacks in
     @type  path: str
     @param stacks: list of stacks to append to. If stack is
@@ -155,32 +241,31 @@ def list_stacks_by_path(path, stacks=None, cache=None):
     """
     if stacks is None:
         stacks = []
+    for stack, d in _crawl_stacks([path]):
+        if stack not in stacks:
+            stacks.append(stack)
+            if cache is not None:
+                cache[stack] = d
+    return stacks
+
+
+def _crawl_stacks(paths, dir_mtimes=None):
+    """
+    Crawl paths for stacks. Subroutine of list_stacks_by_path().
+
+    @return: (stack, directory) pairs in order of precedence. A stack
+        may be listed more than once.
+    @rtype: [(str, str)]
+    """
     MANIFEST_FILE = rospkg.MANIFEST_FILE
-    basename = os.path.basename
-    for d, dirs, files in os.walk(path, topdown=True):
+
+    def visit(d, files):
         if STACK_FILE in files:
-            stack = basename(d)
-            if stack not in stacks:
-                stacks.append(stack)
-                if cache is not None:
-                    cache[stack] = d
-            del dirs[:]
-            continue  # leaf
-        elif MANIFEST_FILE in files:
-            del dirs[:]
-            continue  # leaf
-        elif 'rospack_nosubdirs' in files:
-            del dirs[:]
-            continue  # leaf
-        # remove hidden dirs (esp. .svn/.git)
-        [dirs.remove(di) for di in dirs if di[0] == '.']
-        for sub_d in dirs:
-            # followlinks=True only available in Python 2.6, so we
-            # have to implement manually
-            sub_p = os.path.join(d, sub_d)
-            if os.path.islink(sub_p):
-                stacks.extend(list_stacks_by_path(sub_p, cache=cache))
-    return stacks
+            return os.path.basename(d), False
+        elif MANIFEST_FILE in files or 'rospack_nosubdirs' in files:
+            return None, False
+        return None, True
+    return roslib.crawler.crawl(paths, visit, skip_dir=roslib.packages._is_hidden_dir, dir_mtimes=dir_mtimes)
 
 
 # #2022
@@ -197,9 +282,8 @@ def expand_to_packages(names, env=None):
     """
     if env is None:
         env = os.environ
-    ros_paths = rospkg.get_ros_paths(env)
-    rospack = rospkg.RosPack(ros_paths)
-    rosstack = rospkg.RosStack(ros_paths)
+    rospack = _get_manager(_rospacks, env)
+    rosstack = _get_manager(_rosstacks, env)
     return rospkg.expand_to_packages(names, rospack, rosstack)
 
 
@@ -211,8 +295,7 @@ def get_stack_version(stack, env=None):
     @return: version number of stack, or None if stack is unversioned.
     @rtype: str
     """
-    _init_rosstack(env=env)
-    return _rosstack.get_stack_version(stack)
+    return _init_rosstack(env=env).get_stack_version(stack)
 
 
 def get_stack_version_by_dir(stack_dir):
@@ -222,15 +305,39 @@ def get_stack_version_by_dir(stack_dir):
     @param env: override environment variables
     @type  env: {str: str}
 
+    @return: version number of stack, or None if stack is unversioned.
+    @rtype: str
+    """
+    metadata = roslib.pkgindex.get_stack_metadata(os.path.abspath(stack_dir))
+    if metadata is not None and 'version' in metadata:
+        return metadata['version']
+    # not indexed, validate our own cache against the files
+    key = roslib.pkgindex.get_mtimes([os.path.join(stack_dir, STACK_FILE), os.path.join(stack_dir, 'CMakeLists.txt')])
+    cached = _stack_versions.get(stack_dir)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    version = _read_stack_version(stack_dir)
+    _stack_versions[stack_dir] = (key, version)
+    return version
+
+
+# {stack dir: (mtimes, version)} of stacks outside the package indexes
+_stack_versions = {}
+
+
+def _read_stack_version(stack_dir, m=None):
+    """
+    @param m: (optional) parsed stack manifest
+    @type  m: L{roslib.stack_manifest.StackManifest}
     @return: version number of stack, or None if stack is unversioned.
     @rtype: str
     """
     # REP 109: check for <version> tag first, then CMakeLists.txt
     manifest_filename = os.path.join(stack_dir, STACK_FILE)
-    if os.path.isfile(manifest_filename):
+    if m is None and os.path.isfile(manifest_filename):
         m = roslib.stack_manifest.parse_file(manifest_filename)
-        if m.version:
-            return m.version
+    if m is not None and m.version:
+        return m.version
 
     cmake_filename = os.path.join(stack_dir, 'CMakeLists.txt')
     if os.path.isfile(cmake_filename):
@@ -240,6 +347,23 @@ def get_stack_version_by_dir(stack_dir):
         return None
 
 
+def _read_stack_metadata(stack_dir):
+    """
+    @return: 'name' and 'version' of the stack in stack_dir. 'version'
+        is missing if stack.xml or CMakeLists.txt cannot be read.
+    @rtype: dict
+    """
+    metadata = {'name': os.path.basename(stack_dir)}
+    manifest_filename = os.path.join(stack_dir, STACK_FILE)
+    try:
+        m = roslib.stack_manifest.parse_file(manifest_filename) if os.path.isfile(manifest_filename) else None
+        metadata['version'] = _read_stack_version(stack_dir, m)
+    except Exception:
+        # left to the uncached code path to report
+        pass
+    return metadata
+
+
 def _get_cmake_version(text):
     for l in text.split('\n'):
         if l.strip().startswith('rosbuild_make_distribution'):
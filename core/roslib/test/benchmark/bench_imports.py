@@ -0,0 +1,145 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2008, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Import time of a node that bootstraps and imports many ROS packages.
+
+Every sample runs in a fresh interpreter, which calls load_manifest()
+and imports the module of each package of a synthetic workspace and
+then imports standard library modules, which have to be looked up past
+the package directories. The 'sys.path' mode measures the package
+directories being prepended to sys.path, the 'finder' mode measures
+the meta path finder of roslib.importer. Bootstrap plans are persisted
+by the first sample, as they would be by earlier runs of the node.
+Results are written as JSON, see harness.py.
+
+Usage::
+
+  bench_imports.py --packages 50 --output results.json
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from optparse import OptionParser
+
+import harness
+import workspace
+
+# not imported by roslib itself
+STDLIB_MODULES = ['calendar', 'colorsys', 'csv', 'decimal', 'difflib', 'fractions', 'ftplib',
+                  'gzip', 'mailbox', 'pprint', 'sched', 'shelve', 'smtplib', 'tarfile',
+                  'textwrap', 'uuid', 'wave', 'zipfile']
+
+CHILD = '''
+import json
+import sys
+import timeit
+start = timeit.default_timer()
+import roslib
+imported = timeit.default_timer()
+for p in sys.argv[1].split(','):
+    roslib.load_manifest(p)
+    __import__(p)
+packages = timeit.default_timer()
+stdlib = [m for m in sys.argv[2].split(',') if m not in sys.modules]
+for m in stdlib:
+    __import__(m)
+end = timeit.default_timer()
+print(json.dumps({'roslib': imported - start, 'packages': packages - imported,
+                  'stdlib': end - packages, 'stdlib_modules': len(stdlib),
+                  'sys_path': len(sys.path)}))
+'''
+
+
+def _run_child(packages, finder):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([p for p in sys.path if p])
+    env['ROS_IMPORT_FINDER'] = '1' if finder else '0'
+    out = subprocess.check_output([sys.executable, '-c', CHILD, ','.join(packages), ','.join(STDLIB_MODULES)],
+                                  env=env)
+    return json.loads(out.decode())
+
+
+def run(results, packages, repeat):
+    # persist the bootstrap plans
+    _run_child(packages, False)
+    for mode, finder in [('sys.path', False), ('finder', True)]:
+        samples = [_run_child(packages, finder) for _ in range(repeat)]
+        for name in ['packages', 'stdlib']:
+            results.record('import %s' % name, mode, [s[name] for s in samples],
+                           imports=len(packages) if name == 'packages' else samples[0]['stdlib_modules'],
+                           sys_path=samples[0]['sys_path'])
+        results.record('total', mode, [s['packages'] + s['stdlib'] for s in samples])
+
+
+def main(argv=None):
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('--packages', type='int', default=50, help='number of packages imported [default: %default]')
+    parser.add_option('--repeat', type='int', default=10, help='samples per measurement [default: %default]')
+    parser.add_option('--output', '-o', default='-', help='JSON output file [default: stdout]')
+    options, args = parser.parse_args(argv)
+    if args:
+        parser.error('unexpected arguments')
+
+    params = dict((k, getattr(options, k)) for k in ['packages', 'repeat'])
+    tmp_dir = tempfile.mkdtemp(prefix='roslib_bench_')
+    try:
+        ws = os.path.join(tmp_dir, 'ws')
+        ros_root = os.path.join(tmp_dir, 'ros_root')
+        os.makedirs(ros_root)
+        info = workspace.generate(ws, num_packages=options.packages, num_stacks=0,
+                                  num_farms=0, num_nosubdirs=0, num_data_dirs=0)
+        os.environ['ROS_ROOT'] = ros_root
+        os.environ['ROS_PACKAGE_PATH'] = ws
+        os.environ['ROS_HOME'] = os.path.join(tmp_dir, 'ros_home')
+
+        results = harness.Results('imports', params)
+        run(results, sorted(info['packages'].keys()), options.repeat)
+        if options.output == '-':
+            results.write(sys.stdout)
+        else:
+            with open(options.output, 'w') as f:
+                results.write(f)
+    finally:
+        shutil.rmtree(tmp_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
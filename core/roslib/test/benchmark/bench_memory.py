@@ -0,0 +1,157 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2008, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Memory held by the roslib.msgs registry of a synthetic workspace.
+
+Every package of the workspace gets a set of .msg files from the
+corpus of bench_parser.py. All packages are loaded into the registry,
+then every type is loaded and registered again under its fully
+qualified name, as message generators do. Memory is measured with
+tracemalloc, so Python 3.4 or newer is required. Results are written as
+JSON, see harness.py.
+
+Usage::
+
+  bench_memory.py --packages 100 --messages 20 --output results.json
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+from optparse import OptionParser
+
+import harness
+import workspace
+
+from bench_packages import reset_caches
+from bench_parser import generate
+
+HEADER = 'uint32 seq\ntime stamp\nstring frame_id\n'
+
+
+def _write_msgs(info, num_messages):
+    """
+    Replace the messages of every package with num_messages messages
+    of the parser corpus and add std_msgs/Header.
+    """
+    texts = generate(num_messages)
+    for name, d in info['packages'].items():
+        msg_dir = os.path.join(d, 'msg')
+        for f in os.listdir(msg_dir):
+            os.remove(os.path.join(msg_dir, f))
+        for i, text in enumerate(texts):
+            with open(os.path.join(msg_dir, 'Msg%d.msg' % i), 'w') as f:
+                f.write(text)
+    d = os.path.join(os.path.dirname(list(info['packages'].values())[0]), 'std_msgs')
+    os.makedirs(os.path.join(d, 'msg'))
+    with open(os.path.join(d, 'manifest.xml'), 'w') as f:
+        f.write('<package/>')
+    with open(os.path.join(d, 'msg', 'Header.msg'), 'w') as f:
+        f.write(HEADER)
+
+
+def run(results, ros_home, packages, repeat):
+    import tracemalloc
+
+    import roslib.msgs
+
+    samples = {'registry': [], 'reregistered': []}
+    specs = {'registry': 0, 'reregistered': 0}
+    for _ in range(repeat):
+        reset_caches(ros_home)
+        roslib.msgs.reinit()
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        for p in packages:
+            roslib.msgs.load_package(p)
+        samples['registry'].append(tracemalloc.get_traced_memory()[0] - base)
+        specs['registry'] = len(set([id(s) for s in roslib.msgs.REGISTERED_TYPES.values()]))
+
+        for name in [n for n in roslib.msgs.REGISTERED_TYPES if n.count('/') == 1 and n.startswith('pkg_')]:
+            roslib.msgs.register(name, roslib.msgs.load_by_type(name)[1])
+        samples['reregistered'].append(tracemalloc.get_traced_memory()[0] - base)
+        specs['reregistered'] = len(set([id(s) for s in roslib.msgs.REGISTERED_TYPES.values()]))
+        tracemalloc.stop()
+    for name in ['registry', 'reregistered']:
+        results.record(name, 'memory', samples[name], unit='bytes', specs=specs[name],
+                       types=len(roslib.msgs.REGISTERED_TYPES))
+
+
+def main(argv=None):
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('--packages', type='int', default=100, help='number of packages [default: %default]')
+    parser.add_option('--messages', type='int', default=20, help='messages per package [default: %default]')
+    parser.add_option('--repeat', type='int', default=3, help='samples per measurement [default: %default]')
+    parser.add_option('--output', '-o', default='-', help='JSON output file [default: stdout]')
+    options, args = parser.parse_args(argv)
+    if args:
+        parser.error('unexpected arguments')
+    try:
+        import tracemalloc  # noqa: F401
+    except ImportError:
+        parser.error('tracemalloc is not available')
+
+    params = dict((k, getattr(options, k)) for k in ['packages', 'messages', 'repeat'])
+    tmp_dir = tempfile.mkdtemp(prefix='roslib_bench_')
+    try:
+        ws = os.path.join(tmp_dir, 'ws')
+        ros_root = os.path.join(tmp_dir, 'ros_root')
+        ros_home = os.path.join(tmp_dir, 'ros_home')
+        os.makedirs(ros_root)
+        info = workspace.generate(ws, num_packages=options.packages, num_stacks=0,
+                                  num_farms=0, num_nosubdirs=0, num_data_dirs=0)
+        _write_msgs(info, options.messages)
+        os.environ['ROS_ROOT'] = ros_root
+        os.environ['ROS_PACKAGE_PATH'] = ws
+        os.environ['ROS_HOME'] = ros_home
+        # parse every file instead of reading the spec cache
+        os.environ['ROS_SPEC_CACHE'] = '0'
+
+        results = harness.Results('memory', params)
+        run(results, ros_home, sorted(info['packages'].keys()), options.repeat)
+        if options.output == '-':
+            results.write(sys.stdout)
+        else:
+            with open(options.output, 'w') as f:
+                results.write(f)
+    finally:
+        shutil.rmtree(tmp_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Benchmark package and stack discovery on a synthetic workspace.
+
+Every operation is timed cold, with all roslib caches (including the
+on-disk package index) dropped before each sample, from disk, with
+only the in-memory caches dropped, and warm. Results are written as
+JSON, see harness.py.
+
+Usage::
+
+  bench_packages.py --packages 500 --output results.json
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+from optparse import OptionParser
+
+import harness
+import workspace
+
+
+def reset_caches(ros_home, disk=True):
+    """
+    Drop roslib's in-process caches and, if disk is True, the on-disk
+    package index.
+    """
+    import roslib.depgraph
+    import roslib.packages
+    import roslib.pkgindex
+    import roslib.stacks
+    roslib.pkgindex._indexes.clear()
+    roslib.packages._resource_indexes.clear()
+    roslib.depgraph._graphs.clear()
+    roslib.stacks._rosstack = None
+    roslib.stacks._rosstacks.clear()
+    roslib.stacks._rospacks.clear()
+    roslib.stacks._stack_versions.clear()
+    if disk:
+        shutil.rmtree(os.path.join(ros_home, roslib.pkgindex.INDEX_DIR), ignore_errors=True)
+
+
+def run(results, ws, ros_home, info, sample, repeat):
+    import roslib.packages
+    import roslib.resources
+    import roslib.stacks
+    import rospkg
+
+    state = {}
+
+    def cold():
+        reset_caches(ros_home)
+        state['rospack'] = rospkg.RosPack()
+
+    def disk():
+        reset_caches(ros_home, disk=False)
+        state['rospack'] = rospkg.RosPack()
+
+    def get_pkg_dir():
+        for p in sample:
+            roslib.packages.get_pkg_dir(p)
+
+    def list_pkgs_by_path():
+        roslib.packages.list_pkgs_by_path(ws)
+
+    def list_stacks_by_path():
+        roslib.stacks.list_stacks_by_path(ws)
+
+    def find_resource():
+        for p in sample:
+            roslib.packages.find_resource(p, '%s_node' % p, filter_fn=roslib.packages._executable_filter, rospack=state['rospack'])
+
+    def stack_of():
+        for p in sample:
+            roslib.stacks.stack_of(p)
+
+    stack_dirs = sorted(info['stacks'].values())
+
+    def get_stack_version_by_dir():
+        for d in stack_dirs:
+            roslib.stacks.get_stack_version_by_dir(d)
+
+    def list_package_resources():
+        for p in sample:
+            roslib.resources.list_package_resources(p, True, 'msg')
+
+    benchmarks = [
+        ('get_pkg_dir', get_pkg_dir, len(sample)),
+        ('list_pkgs_by_path', list_pkgs_by_path, 1),
+        ('list_stacks_by_path', list_stacks_by_path, 1),
+        ('find_resource', find_resource, len(sample)),
+        ('stack_of', stack_of, len(sample)),
+        ('get_stack_version_by_dir', get_stack_version_by_dir, len(stack_dirs)),
+        ('list_package_resources', list_package_resources, len(sample)),
+    ]
+    for name, fn, ops in benchmarks:
+        for mode, setup in [('cold', cold), ('disk', disk), ('warm', None)]:
+            if setup is None:
+                # populate the caches
+                fn()
+            r = results.time(name, fn, mode=mode, repeat=repeat, setup=setup)
+            r['ops'] = ops
+
+
+def check(ws, info):
+    """
+    Verify that roslib sees the generated workspace as intended.
+
+    @return: error messages
+    @rtype: [str]
+    """
+    import roslib.packages
+    import roslib.stacks
+    errors = []
+    found = set(roslib.packages.list_pkgs_by_path(ws))
+    if found != set(info['packages'].keys()):
+        errors.append('list_pkgs_by_path: missing %s, unexpected %s' % (
+            sorted(set(info['packages'].keys()) - found), sorted(found - set(info['packages'].keys()))))
+    found = set(roslib.stacks.list_stacks_by_path(ws))
+    if found != set(info['stacks'].keys()):
+        errors.append('list_stacks_by_path: found %s' % sorted(found))
+    return errors
+
+
+def main(argv=None):
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('--packages', type='int', default=200, help='number of packages [default: %default]')
+    parser.add_option('--depth', type='int', default=3, help='directory levels above each package [default: %default]')
+    parser.add_option('--stacks', type='int', default=10, help='number of stacks [default: %default]')
+    parser.add_option('--farms', type='int', default=1, help='number of symlink farms [default: %default]')
+    parser.add_option('--nosubdirs', type='int', default=2, help='number of rospack_nosubdirs dirs [default: %default]')
+    parser.add_option('--data-dirs', type='int', default=2, help='number of non-package data trees [default: %default]')
+    parser.add_option('--data-size', type='int', default=2000, help='files per data tree [default: %default]')
+    parser.add_option('--rosignore', action='store_true', default=False,
+                      help='list the data trees in a .rosignore at the workspace root')
+    parser.add_option('--sample', type='int', default=20, help='packages queried per sample [default: %default]')
+    parser.add_option('--repeat', type='int', default=5, help='samples per measurement [default: %default]')
+    parser.add_option('--output', '-o', default='-', help='JSON output file [default: stdout]')
+    parser.add_option('--keep', action='store_true', default=False, help='keep the generated workspace')
+    options, args = parser.parse_args(argv)
+    if args:
+        parser.error('unexpected arguments')
+
+    params = dict((k, getattr(options, k)) for k in
+                  ['packages', 'depth', 'stacks', 'farms', 'nosubdirs', 'data_dirs', 'data_size', 'rosignore',
+                   'sample', 'repeat'])
+    tmp_dir = tempfile.mkdtemp(prefix='roslib_bench_')
+    try:
+        ws = os.path.join(tmp_dir, 'ws')
+        ros_root = os.path.join(tmp_dir, 'ros_root')
+        ros_home = os.path.join(tmp_dir, 'ros_home')
+        os.makedirs(ros_root)
+        info = workspace.generate(ws, num_packages=options.packages, depth=options.depth,
+                                  num_stacks=options.stacks, num_farms=options.farms,
+                                  num_nosubdirs=options.nosubdirs, num_data_dirs=options.data_dirs,
+                                  data_dir_size=options.data_size)
+        if options.rosignore:
+            with open(os.path.join(ws, '.rosignore'), 'w') as f:
+                f.write('data_*\n')
+        # roslib reads the environment at import time in places
+        os.environ['ROS_ROOT'] = ros_root
+        os.environ['ROS_PACKAGE_PATH'] = ws
+        os.environ['ROS_HOME'] = ros_home
+
+        errors = check(ws, info)
+        for e in errors:
+            print('ERROR: %s' % e, file=sys.stderr)
+        if errors:
+            return 1
+
+        names = sorted(info['packages'].keys())
+        step = max(1, len(names) // options.sample)
+        sample = names[::step][:options.sample]
+
+        import roslib.crawler
+        results = harness.Results('packages', params)
+        roslib.crawler.reset_stats()
+        run(results, ws, ros_home, info, sample, options.repeat)
+        results.meta['crawler'] = roslib.crawler.get_stats()
+        if options.output == '-':
+            results.write(sys.stdout)
+        else:
+            with open(options.output, 'w') as f:
+                results.write(f)
+    finally:
+        if options.keep:
+            print('workspace kept in %s' % tmp_dir, file=sys.stderr)
+        else:
+            shutil.rmtree(tmp_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2008, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+"""
+Parse throughput of roslib.msgs.load_from_string() and
+roslib.srvs.load_from_string() on a synthetic corpus.
+
+The corpus mixes the declarations found in real message files: fields
+of builtin and message types, arrays, comments, blank lines and
+constants of every primitive type. Results are written as JSON, see
+harness.py; throughput is recorded in lines per second.
+
+Usage::
+
+  bench_parser.py --messages 2000 --output results.json
+"""
+
+from __future__ import print_function
+
+import random
+import sys
+import timeit
+from optparse import OptionParser
+
+import harness
+
+BUILTINS = ['int8', 'uint8', 'int16', 'uint16', 'int32', 'uint32', 'int64', 'uint64',
+            'float32', 'float64', 'string', 'bool', 'time', 'duration']
+CONSTANTS = [('uint8', '%d'), ('int32', '-%d'), ('float64', '%d.5'), ('string', 'value %d'), ('bool', 'True')]
+
+
+def generate(num_messages, seed=0):
+    """
+    @return: .msg texts of the corpus
+    @rtype: [str]
+    """
+    rand = random.Random(seed)
+    texts = []
+    for i in range(num_messages):
+        lines = ['# Message %d of the synthetic corpus' % i, 'Header header', '']
+        for j in range(rand.randint(0, 4)):
+            type_, fmt = rand.choice(CONSTANTS)
+            lines.append('%s CONSTANT_%d=%s' % (type_, j, fmt % j if '%' in fmt else fmt))
+        for j in range(rand.randint(2, 20)):
+            r = rand.random()
+            if r < 0.6:
+                type_ = rand.choice(BUILTINS)
+            elif r < 0.8:
+                type_ = 'Msg%d' % rand.randrange(num_messages)
+            else:
+                type_ = 'pkg_%d/Msg%d' % (rand.randrange(50), rand.randrange(num_messages))
+            r = rand.random()
+            if r < 0.15:
+                type_ += '[]'
+            elif r < 0.2:
+                type_ += '[%d]' % rand.randint(1, 16)
+            line = '%s field_%d' % (type_, j)
+            if rand.random() < 0.3:
+                line += '  # comment on field %d' % j
+            lines.append(line)
+        texts.append('\n'.join(lines) + '\n')
+    return texts
+
+
+def run(results, texts, repeat):
+    import roslib.msgs
+    import roslib.srvs
+
+    srv_texts = ['%s---\n%s' % (texts[i], texts[i + 1]) for i in range(0, len(texts) - 1, 2)]
+    for name, load, corpus in [('msgs.load_from_string', roslib.msgs.load_from_string, texts),
+                               ('srvs.load_from_string', roslib.srvs.load_from_string, srv_texts)]:
+        lines = sum([t.count('\n') + 1 for t in corpus])
+        samples = []
+        for _ in range(repeat):
+            start = timeit.default_timer()
+            for t in corpus:
+                load(t, 'bench_msgs')
+            samples.append(lines / (timeit.default_timer() - start))
+        results.record(name, 'parse', samples, unit='lines/s', lines=lines)
+
+
+def main(argv=None):
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('--messages', type='int', default=2000, help='number of messages [default: %default]')
+    parser.add_option('--repeat', type='int', default=5, help='samples per measurement [default: %default]')
+    parser.add_option('--output', '-o', default='-', help='JSON output file [default: stdout]')
+    options, args = parser.parse_args(argv)
+    if args:
+        parser.error('unexpected arguments')
+
+    params = dict((k, getattr(options, k)) for k in ['messages', 'repeat'])
+    results = harness.Results('parser', params)
+    run(results, generate(options.messages), options.repeat)
+    if options.output == '-':
+        results.write(sys.stdout)
+    else:
+        with open(options.output, 'w') as f:
+            results.write(f)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2008, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Stress roslib's caches from several threads on a synthetic workspace.
+
+Every thread repeatedly looks up packages, stacks and the package that
+contains a file, and registers and reads message specs. With --churn,
+another thread keeps invalidating the package index and re-registering
+specs, which exercises the writers while readers run. Every answer is
+compared to the single-threaded one. Results are written as JSON, see
+harness.py; the mode of each measurement is the number of threads.
+
+Usage::
+
+  bench_threads.py --threads 1,2,4,8 --churn --output results.json
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from optparse import OptionParser
+
+import harness
+import workspace
+
+from bench_packages import reset_caches
+
+MSG = 'int32 a\nstring b\n'
+
+
+def run(results, ros_home, sample, stacks, thread_counts, iterations, repeat, churn):
+    """
+    @return: number of wrong answers and exceptions
+    @rtype: int
+    """
+    import roslib.msgs
+    import roslib.packages
+    import roslib.pkgindex
+    import roslib.stacks
+
+    spec = roslib.msgs.load_from_string(MSG, 'bench_msgs')
+
+    def lookup():
+        answers = []
+        for p in sample:
+            d = roslib.packages.get_pkg_dir(p)
+            answers.append(d)
+            answers.append(roslib.packages.get_dir_pkg(os.path.join(d, 'manifest.xml'))[1])
+        for s in stacks:
+            answers.append(roslib.stacks.get_stack_dir(s))
+        for p in sample:
+            answers.append(roslib.msgs.get_registered('bench_msgs/%s' % p) is spec)
+        return answers
+
+    def register():
+        for p in sample:
+            roslib.msgs.register('bench_msgs/%s' % p, spec)
+
+    reset_caches(ros_home)
+    register()
+    expected = lookup()
+    errors = []
+
+    def reader():
+        try:
+            for _ in range(iterations):
+                if lookup() != expected:
+                    errors.append('wrong answer')
+        except Exception as e:
+            errors.append(e)
+
+    def writer(stop):
+        try:
+            env = roslib.packages._resolve_ros_env()
+            while not stop.is_set():
+                roslib.pkgindex.get_index(*env).invalidate()
+                register()
+                stop.wait(0.001)
+        except Exception as e:
+            errors.append(e)
+
+    for n in thread_counts:
+        def fn():
+            stop = threading.Event()
+            threads = [threading.Thread(target=reader) for _ in range(n)]
+            if churn:
+                threads.append(threading.Thread(target=writer, args=(stop,)))
+            for t in threads:
+                t.start()
+            for t in threads[:n]:
+                t.join()
+            stop.set()
+            for t in threads[n:]:
+                t.join()
+        r = results.time('lookups', fn, mode='%d' % n, repeat=repeat)
+        r['ops'] = n * iterations * len(expected)
+        r['threads'] = n
+    for e in errors[:10]:
+        print('ERROR: %s' % e, file=sys.stderr)
+    return len(errors)
+
+
+def main(argv=None):
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('--packages', type='int', default=200, help='number of packages [default: %default]')
+    parser.add_option('--stacks', type='int', default=10, help='number of stacks [default: %default]')
+    parser.add_option('--sample', type='int', default=20, help='packages queried per iteration [default: %default]')
+    parser.add_option('--threads', default='1,2,4,8', help='comma-separated thread counts [default: %default]')
+    parser.add_option('--iterations', type='int', default=200, help='iterations per thread [default: %default]')
+    parser.add_option('--churn', action='store_true', default=False, help='invalidate caches while reading')
+    parser.add_option('--repeat', type='int', default=5, help='samples per measurement [default: %default]')
+    parser.add_option('--output', '-o', default='-', help='JSON output file [default: stdout]')
+    options, args = parser.parse_args(argv)
+    if args:
+        parser.error('unexpected arguments')
+    thread_counts = [int(n) for n in options.threads.split(',')]
+
+    params = dict((k, getattr(options, k)) for k in
+                  ['packages', 'stacks', 'sample', 'threads', 'iterations', 'churn', 'repeat'])
+    tmp_dir = tempfile.mkdtemp(prefix='roslib_bench_')
+    try:
+        ws = os.path.join(tmp_dir, 'ws')
+        ros_root = os.path.join(tmp_dir, 'ros_root')
+        ros_home = os.path.join(tmp_dir, 'ros_home')
+        os.makedirs(ros_root)
+        info = workspace.generate(ws, num_packages=options.packages, num_stacks=options.stacks,
+                                  num_farms=0, num_nosubdirs=0, num_data_dirs=0)
+        os.environ['ROS_ROOT'] = ros_root
+        os.environ['ROS_PACKAGE_PATH'] = ws
+        os.environ['ROS_HOME'] = ros_home
+
+        names = sorted(info['packages'].keys())
+        step = max(1, len(names) // options.sample)
+        sample = names[::step][:options.sample]
+
+        results = harness.Results('threads', params)
+        errors = run(results, ros_home, sample, sorted(info['stacks'].keys()), thread_counts,
+                     options.iterations, options.repeat, options.churn)
+        if options.output == '-':
+            results.write(sys.stdout)
+        else:
+            with open(options.output, 'w') as f:
+                results.write(f)
+    finally:
+        shutil.rmtree(tmp_dir)
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Compare two benchmark reports written by harness.Results.
+
+Usage::
+
+  compare.py old.json new.json
+
+Prints the ratio of the median of every measurement in new.json to the
+same measurement in old.json. Ratios above 1 are slowdowns.
+"""
+
+from __future__ import print_function
+
+import json
+import sys
+
+
+def load(filename):
+    with open(filename) as f:
+        report = json.load(f)
+    return report['meta'], dict(((r['name'], r['mode']), r) for r in report['results'])
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if len(argv) != 2:
+        print('usage: compare.py old.json new.json', file=sys.stderr)
+        return 2
+    old_meta, old = load(argv[0])
+    new_meta, new = load(argv[1])
+    if old_meta.get('params') != new_meta.get('params'):
+        print('WARNING: reports were run with different parameters', file=sys.stderr)
+    print('%-40s %-6s %12s %12s %8s' % ('name', 'mode', 'old', 'new', 'ratio'))
+    for key in sorted(set(old) & set(new)):
+        o, n = old[key]['median'], new[key]['median']
+        ratio = n / o if o else float('inf')
+        print('%-40s %-6s %12.6g %12.6g %8.2f' % (key[0], key[1], o, n, ratio))
+    for key in sorted(set(old) ^ set(new)):
+        print('%-40s %-6s only in %s' % (key[0], key[1], argv[0] if key in old else argv[1]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Timing and reporting helpers shared by the roslib benchmarks.
+
+Results are written as JSON so that runs from different commits can be
+compared mechanically::
+
+  {"meta": {...}, "results": [{"name": ..., "mode": ..., ...}]}
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+
+def _git_revision():
+    try:
+        p = subprocess.Popen(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out = p.communicate()[0]
+    except OSError:
+        return None
+    if p.returncode:
+        return None
+    return out.decode().strip()
+
+
+class Results(object):
+    """
+    Collects timings of a benchmark run.
+    """
+
+    def __init__(self, suite, params=None):
+        """
+        @param suite: name of the benchmark suite
+        @type  suite: str
+        @param params: parameters of the run, e.g. workspace size
+        @type  params: dict
+        """
+        self.meta = {
+            'suite': suite,
+            'params': params or {},
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        }
+        self.results = []
+
+    def time(self, name, fn, mode='warm', repeat=5, number=1, setup=None):
+        """
+        Time fn and record the result.
+
+        @param name: name of the measured operation
+        @type  name: str
+        @param fn: operation to time
+        @type  fn: fn()
+        @param mode: 'cold' or 'warm', or any other label
+        @type  mode: str
+        @param repeat: number of samples
+        @type  repeat: int
+        @param number: calls of fn per sample
+        @type  number: int
+        @param setup: (optional) called before every sample, not timed
+        @type  setup: fn()
+        @return: recorded result
+        @rtype: dict
+        """
+        samples = []
+        for _ in range(repeat):
+            if setup is not None:
+                setup()
+            start = timeit.default_timer()
+            for _ in range(number):
+                fn()
+            samples.append((timeit.default_timer() - start) / number)
+        return self.record(name, mode, samples, number=number)
+
+    def record(self, name, mode, samples, unit='s', **extra):
+        """
+        Record samples measured by the caller.
+
+        @param samples: one value per sample
+        @type  samples: [float]
+        @param unit: unit of the samples
+        @type  unit: str
+        @return: recorded result
+        @rtype: dict
+        """
+        ordered = sorted(samples)
+        result = {
+            'name': name,
+            'mode': mode,
+            'unit': unit,
+            'samples': samples,
+            'min': ordered[0],
+            'median': ordered[len(ordered) // 2],
+            'max': ordered[-1],
+        }
+        result.update(extra)
+        self.results.append(result)
+        sys.stderr.write('%-40s %-6s median %.6g %s\n' % (name, mode, result['median'], unit))
+        return result
+
+    def write(self, f):
+        """
+        @param f: file to write the JSON report to
+        @type  f: file
+        """
+        json.dump({'meta': self.meta, 'results': self.results}, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,155 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Synthetic ROS workspaces for the roslib benchmarks.
+
+The generated tree exercises every rule of the package and stack
+crawlers: packages nested several directories deep, stacks, symlink
+farms (including a symlink loop), directories hidden by
+rospack_nosubdirs and large directory trees without any package.
+"""
+
+import os
+import random
+
+MANIFEST = '<package>\n  <description brief="%(name)s">%(name)s</description>\n  <license>BSD</license>\n%(depends)s</package>\n'
+STACK = '<stack>\n  <description brief="%(name)s">%(name)s</description>\n  <license>BSD</license>\n</stack>\n'
+
+
+def _write(path, text=''):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def _make_package(d, name, depends):
+    os.makedirs(os.path.join(d, 'msg'))
+    os.makedirs(os.path.join(d, 'scripts'))
+    os.makedirs(os.path.join(d, 'src', name))
+    _write(os.path.join(d, 'manifest.xml'), MANIFEST % {
+        'name': name,
+        'depends': ''.join(['  <depend package="%s"/>\n' % p for p in depends]),
+    })
+    _write(os.path.join(d, 'msg', '%sMsg.msg' % name.title().replace('_', '')), 'int32 x\nstring y\n')
+    node = os.path.join(d, 'scripts', '%s_node' % name)
+    _write(node, '#!/bin/sh\n')
+    os.chmod(node, 0o755)
+    _write(os.path.join(d, 'src', name, '__init__.py'))
+
+
+def generate(root, num_packages=100, depth=3, num_stacks=10, num_farms=1,
+             num_nosubdirs=2, num_data_dirs=2, data_dir_size=1000, seed=0):
+    """
+    Create a synthetic workspace.
+
+    @param root: directory to create the workspace in
+    @type  root: str
+    @param num_packages: number of packages on the ROS path
+    @type  num_packages: int
+    @param depth: number of directories between a stack (or the
+        workspace root) and its packages
+    @type  depth: int
+    @param num_stacks: number of stacks the packages are spread over,
+        0 for none
+    @type  num_stacks: int
+    @param num_farms: number of directories of symlinks to packages
+    @type  num_farms: int
+    @param num_nosubdirs: number of directories with a rospack_nosubdirs
+        marker, each hiding a package
+    @type  num_nosubdirs: int
+    @param num_data_dirs: number of directory trees without packages
+    @type  num_data_dirs: int
+    @param data_dir_size: number of files in each of those trees
+    @type  data_dir_size: int
+    @param seed: random seed for the dependency graph
+    @type  seed: int
+    @return: description of the workspace: 'packages' and 'stacks' map
+        names to directories, 'hidden' lists packages that must not be
+        found, 'depends' maps packages to their direct dependencies
+    @rtype: dict
+    """
+    rand = random.Random(seed)
+    packages = {}
+    stacks = {}
+    depends = {}
+    for i in range(num_packages):
+        name = 'pkg_%d' % i
+        if num_stacks:
+            stack = 'stack_%d' % (i % num_stacks)
+            stack_dir = os.path.join(root, 'stacks', stack)
+            if stack not in stacks:
+                os.makedirs(stack_dir)
+                _write(os.path.join(stack_dir, 'stack.xml'), STACK % {'name': stack})
+                stacks[stack] = stack_dir
+            parent = stack_dir
+        else:
+            parent = os.path.join(root, 'packages')
+        for level in range(depth):
+            parent = os.path.join(parent, 'group_%d_%d' % (level, i % (level + 2)))
+        d = os.path.join(parent, name)
+        depends[name] = sorted(set(['pkg_%d' % rand.randrange(i) for _ in range(min(i, 3))]))
+        _make_package(d, name, depends[name])
+        packages[name] = d
+
+    names = sorted(packages.keys())
+    for i in range(num_farms):
+        farm = os.path.join(root, 'farm_%d' % i)
+        os.makedirs(farm)
+        for name in names[:max(1, len(names) // 10)]:
+            os.symlink(packages[name], os.path.join(farm, name))
+        # symlinks share the names of the packages they point to, plus a loop
+        os.symlink(farm, os.path.join(farm, 'loop'))
+
+    hidden = []
+    for i in range(num_nosubdirs):
+        d = os.path.join(root, 'nosubdirs_%d' % i)
+        os.makedirs(d)
+        _write(os.path.join(d, 'rospack_nosubdirs'))
+        name = 'hidden_pkg_%d' % i
+        _make_package(os.path.join(d, name), name, [])
+        hidden.append(name)
+
+    for i in range(num_data_dirs):
+        d = os.path.join(root, 'data_%d' % i)
+        per_dir = 50
+        for j in range(data_dir_size):
+            sub = os.path.join(d, 'chunk_%d' % (j // per_dir), 'part_%d' % (j % 5))
+            if not os.path.isdir(sub):
+                os.makedirs(sub)
+            _write(os.path.join(sub, 'sample_%d.dat' % j))
+
+    return {
+        'packages': packages,
+        'stacks': stacks,
+        'hidden': hidden,
+        'depends': depends,
+    }
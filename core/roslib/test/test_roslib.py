@@ -31,6 +31,38 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# maximum cumulative time of 'import roslib' in microseconds, as
+# reported by python -X importtime. It is generous so that loaded
+# machines do not fail it; eager imports of the submodules are caught
+# by checking sys.modules instead.
+IMPORT_BUDGET = 300000
+
+_tmp_dir = None
+_ros_home = None
+
+
+def setup_module():
+    # keep the bootstrap and package indexes out of the real ROS_HOME
+    global _tmp_dir, _ros_home
+    _tmp_dir = tempfile.mkdtemp()
+    _ros_home = os.environ.get('ROS_HOME')
+    os.environ['ROS_HOME'] = os.path.join(_tmp_dir, 'ros_home')
+
+
+def teardown_module():
+    if _ros_home is None:
+        del os.environ['ROS_HOME']
+    else:
+        os.environ['ROS_HOME'] = _ros_home
+    shutil.rmtree(_tmp_dir)
+
+
 def test_load_manifest():
     # this is a bit of a noop as it's a prerequisite of running with rosunit
     import roslib
@@ -45,3 +77,42 @@ def test_interactive():
     for v in [True, False]:
         roslib.set_interactive(v)
         assert v == roslib.is_interactive()
+
+
+def test_lazy_submodules():
+    import roslib
+    import roslib.names
+    assert roslib.names is sys.modules['roslib.names']
+    assert roslib.stacks is sys.modules['roslib.stacks']
+    from roslib import load_manifest
+    assert load_manifest is sys.modules['roslib.launcher'].load_manifest
+    try:
+        roslib.fake_submodule
+        assert False, 'should have raised AttributeError'
+    except AttributeError:
+        pass
+
+
+def test_import_roslib():
+    if sys.version_info < (3, 7):
+        # neither lazy submodules nor -X importtime are supported
+        return
+    import roslib
+    # a fresh interpreter, as the test runner has imported roslib already
+    code = 'import sys, roslib; print(",".join(sorted(sys.modules)))'
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([os.path.dirname(os.path.dirname(roslib.__file__))] + sys.path)
+    p = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', code], env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = p.communicate()
+    assert p.returncode == 0, err
+
+    modules = out.decode().strip().split(',')
+    assert 'roslib' in modules
+    for m in ['roslib.%s' % name for name in sorted(roslib._submodules)] + ['rospkg', 'catkin', 'asyncio']:
+        assert m not in modules, '%s is imported by import roslib' % m
+    # import time: self [us] | cumulative | imported package
+    times = [line.split('|') for line in err.decode().splitlines() if line.startswith('import time:')]
+    cumulative = [int(t[1]) for t in times if t[2].strip() == 'roslib']
+    assert cumulative and cumulative[0] < IMPORT_BUDGET, \
+        'import roslib took %sus, budget is %dus' % (cumulative, IMPORT_BUDGET)
@@ -0,0 +1,135 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+def _visit_stacks(d, files):
+    if 'stack.xml' in files:
+        return os.path.basename(d), False
+    return None, True
+
+
+class RoslibCrawlerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_crawl_order(self):
+        from roslib.crawler import crawl
+        test_dir = os.path.join(get_test_path(), 'stack_tests')
+        paths = [os.path.join(test_dir, p) for p in ['s2', 's1']]
+        for max_workers in [1, 4]:
+            found = crawl(paths, _visit_stacks, max_workers=max_workers)
+            # path precedence is preserved
+            self.assertEquals(('foo', os.path.join(test_dir, 's2', 'foo')), found[0])
+            self.assertEquals({('foo', os.path.join(test_dir, 's1', 'foo')),
+                               ('bar', os.path.join(test_dir, 's1', 'bar'))}, set(found[1:]))
+
+    def test_crawl_symlink_loop(self):
+        if not hasattr(os, 'symlink'):
+            return
+        from roslib.crawler import crawl
+        d = os.path.join(self.tmp_dir, 'a', 'b')
+        os.makedirs(d)
+        open(os.path.join(self.tmp_dir, 'a', 'stack.xml'), 'w').close()
+        os.symlink(self.tmp_dir, os.path.join(d, 'loop'))
+        os.makedirs(os.path.join(self.tmp_dir, 'c'))
+        os.symlink(os.path.join(self.tmp_dir, 'c'), os.path.join(self.tmp_dir, 'c', 'loop'))
+        dir_mtimes = {}
+        for max_workers in [1, 4]:
+            found = crawl([self.tmp_dir], _visit_stacks, max_workers=max_workers, dir_mtimes=dir_mtimes)
+            self.assertEquals([('a', os.path.join(self.tmp_dir, 'a'))], found)
+        # ignore files are recorded as well
+        self.assertEquals({self.tmp_dir, os.path.join(self.tmp_dir, 'a'), os.path.join(self.tmp_dir, 'c')},
+                          set(d for d in dir_mtimes.keys() if os.path.basename(d) != '.rosignore'))
+
+    def test_crawl_pool(self):
+        import roslib.crawler
+        from roslib.crawler import crawl
+        for name in ['a', 'b', 'c']:
+            os.makedirs(os.path.join(self.tmp_dir, name, 'sub'))
+        errors = []
+
+        def visit(d, files):
+            if d != self.tmp_dir:
+                errors.append(d)
+                raise ValueError(d)
+            # crawls started from a visit function run sequentially
+            self.assertEquals([(d, d)], crawl([d], lambda d, files: (d, False), max_workers=4))
+            return None, True
+        try:
+            crawl([self.tmp_dir], visit, max_workers=4)
+            self.fail('should have raised')
+        except ValueError as e:
+            # the first error is raised
+            self.assertEquals(errors[0], str(e))
+        # all crawls share one pool
+        executor = roslib.crawler._get_executor(4)
+        crawl([self.tmp_dir], _visit_stacks, max_workers=4)
+        self.assert_(executor is roslib.crawler._get_executor(4))
+
+    def test_crawl_ignore(self):
+        from roslib.crawler import crawl, is_ignored
+        for d in ['a', 'build/x', 'sub/build', 'data/raw', 'data/cooked', 'sub/data/raw', 'skipped']:
+            os.makedirs(os.path.join(self.tmp_dir, d))
+            open(os.path.join(self.tmp_dir, d, 'stack.xml'), 'w').close()
+        open(os.path.join(self.tmp_dir, 'skipped', 'CATKIN_IGNORE'), 'w').close()
+        ignore_file = os.path.join(self.tmp_dir, '.rosignore')
+        with open(ignore_file, 'w') as f:
+            f.write('# comment\nbuild/\n\n/data/raw\n')
+        for max_workers in [1, 4]:
+            stats = {}
+            dir_mtimes = {}
+            found = crawl([self.tmp_dir], _visit_stacks, max_workers=max_workers, dir_mtimes=dir_mtimes, stats=stats)
+            self.assertEquals(['a', 'cooked', 'raw'], sorted(name for name, _ in found))
+            self.assert_(('raw', os.path.join(self.tmp_dir, 'sub', 'data', 'raw')) in found)
+            self.assertEquals(4, stats['ignored'])
+            self.assert_(ignore_file in dir_mtimes)
+            self.failIf(os.path.join(self.tmp_dir, 'build') in dir_mtimes)
+        self.assertEquals(7, len(crawl([self.tmp_dir], _visit_stacks, ignore=False)))
+
+        # rules of the ancestors apply when crawling a subtree
+        self.assertEquals(['raw'], [name for name, _ in crawl([os.path.join(self.tmp_dir, 'sub')], _visit_stacks)])
+        self.assert_(is_ignored(os.path.join(self.tmp_dir, 'sub', 'build')))
+        self.assert_(is_ignored(os.path.join(self.tmp_dir, 'data', 'raw')))
+        self.failIf(is_ignored(os.path.join(self.tmp_dir, 'sub', 'data', 'raw')))
+
+
+def get_test_path():
+    return os.path.abspath(os.path.dirname(__file__))
@@ -0,0 +1,155 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class RoslibDepGraphTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ros_home = os.environ.get('ROS_HOME')
+        os.environ['ROS_HOME'] = os.path.join(self.tmp_dir, 'ros_home')
+        self.ws = os.path.join(self.tmp_dir, 'ws')
+
+    def tearDown(self):
+        if self.ros_home is None:
+            del os.environ['ROS_HOME']
+        else:
+            os.environ['ROS_HOME'] = self.ros_home
+        shutil.rmtree(self.tmp_dir)
+
+    def _package(self, name, depends, exports=''):
+        d = os.path.join(self.ws, name)
+        os.makedirs(d)
+        with open(os.path.join(d, 'manifest.xml'), 'w') as f:
+            f.write('<package>%s<export>%s</export></package>' % (''.join(['<depend package="%s"/>' % p for p in depends]), exports))
+
+    def test_package_graph(self):
+        from roslib.depgraph import DependencyGraph, PackageGraph
+        from roslib.exceptions import ROSLibException
+        # subclasses must provide locations and manifest parsing
+        self.assertRaises(TypeError, DependencyGraph, None, None)
+        self._package('a', [])
+        self._package('b', ['a'], exports='<b plugin="b_plugin.xml"/>')
+        self._package('c', ['b', 'a'], exports='<b plugin="${prefix}/c_plugin.xml"/>')
+        self._package('d', ['c', 'b'], exports='<b plugin="d_plugin.xml"/><c plugin="ignored.xml"/>')
+        # catkin package with a system dependency
+        os.makedirs(os.path.join(self.ws, 'e'))
+        with open(os.path.join(self.ws, 'e', 'package.xml'), 'w') as f:
+            f.write('<package><name>e</name><build_depend>boost</build_depend><run_depend>d</run_depend></package>')
+
+        graph = PackageGraph(None, self.ws)
+        self.assertEquals(['b', 'a'], graph.get_depends1('c'))
+        self.assertEquals(['a', 'b'], graph.get_depends('c'))
+        self.assertEquals(['a', 'b', 'c'], graph.get_depends('d'))
+        self.assertEquals(['a', 'b', 'c', 'd'], graph.get_depends('e'))
+        self.assertEquals([], graph.get_depends('a'))
+        self.assertEquals(['b', 'c'], graph.get_depends_on1('a'))
+        self.assertEquals(['b', 'c', 'd', 'e'], graph.get_depends_on('a'))
+        self.assertEquals([], graph.get_depends_on('e'))
+        self.assertEquals([('c', os.path.join(self.ws, 'c', 'c_plugin.xml')), ('d', 'd_plugin.xml'), ('b', 'b_plugin.xml')],
+                          graph.get_plugins('b', 'plugin'))
+        self.assertRaises(ROSLibException, graph.get_depends, 'fake_package')
+
+        # edits to a manifest are picked up once the cache times out
+        self._package('f', ['d'])
+        shutil.rmtree(os.path.join(self.ws, 'a'))
+        self._package('a', ['f'])
+        graph.update(force=True)
+        try:
+            graph.get_depends('c')
+            self.fail('should have raised')
+        except ROSLibException as e:
+            self.assert_('circular' in str(e))
+
+    def test_rospack(self):
+        import roslib.rospack
+        self._package('a', [])
+        self._package('b', ['a'], exports='<b plugin="b_plugin.xml"/>')
+        self._package('c', ['b', 'missing'])
+        rpp = os.environ.get('ROS_PACKAGE_PATH')
+        os.environ['ROS_PACKAGE_PATH'] = self.ws
+        try:
+            self.assertEquals(['a'], roslib.rospack.rospack_depends('b'))
+            self.assertEquals(['b'], roslib.rospack.rospack_depends_on_1('a'))
+            self.assertEquals([('b', 'b_plugin.xml')], roslib.rospack.rospack_plugins('b'))
+            # errors of the rospack command were not reported
+            self.assertEquals([], roslib.rospack.rospack_depends('fake_package'))
+            self.assertEquals([], roslib.rospack.rospack_depends_1('c'))
+            self.assertEquals([], roslib.rospack.rospack_plugins('fake_package'))
+            self.assertEquals([], roslib.rospack.rosstack_depends('fake_stack'))
+        finally:
+            if rpp is None:
+                del os.environ['ROS_PACKAGE_PATH']
+            else:
+                os.environ['ROS_PACKAGE_PATH'] = rpp
+
+    def test_dependency_matrix(self):
+        from roslib.depgraph import DependencyMatrix
+        m = DependencyMatrix({'a': [], 'b': ['a'], 'c': ['b'], 'd': ['a'], 'x': ['y'], 'y': ['x']})
+        self.assertEquals(['a', 'b'], m.get_depends('c'))
+        self.assertEquals(['b', 'c', 'd'], m.get_depends_on('a'))
+        self.assert_(m.is_depend('c', 'a'))
+        self.failIf(m.is_depend('a', 'c'))
+        self.failIf(m.is_depend('fake_package', 'a'))
+        self.assertEquals([], m.get_depends('fake_package'))
+        self.assertEquals(['a', 'b'], m.get_depends_any(['c', 'd']))
+        self.assertEquals(['b', 'c', 'd'], m.get_depends_on_any(['a', 'b']))
+        self.assertEquals(['a'], m.get_common_depends(['c', 'd']))
+        self.assertEquals([], m.get_common_depends([]))
+        # cycles close over every member
+        self.assertEquals(['x', 'y'], m.get_depends('x'))
+        self.assertEquals(m.mask(['a', 'c']), m.mask(m.to_names(m.mask(['c', 'a', 'fake_package']))))
+
+        self._package('a', [])
+        self._package('b', ['a'])
+        from roslib.depgraph import PackageGraph
+        graph = PackageGraph(None, self.ws)
+        m = graph.get_matrix()
+        self.assertEquals(['b'], m.get_depends_on('a'))
+        self.assert_(m is graph.get_matrix())
+
+    def test_stack_graph(self):
+        from roslib.depgraph import StackGraph
+        for name, depends in [('s1', []), ('s2', ['s1']), ('s3', ['s2'])]:
+            os.makedirs(os.path.join(self.ws, name))
+            with open(os.path.join(self.ws, name, 'stack.xml'), 'w') as f:
+                f.write('<stack>%s</stack>' % ''.join(['<depend stack="%s"/>' % s for s in depends]))
+        graph = StackGraph(None, self.ws)
+        self.assertEquals(['s1', 's2'], graph.get_depends('s3'))
+        self.assertEquals(['s2'], graph.get_depends1('s3'))
+        self.assertEquals(['s2', 's3'], graph.get_depends_on('s1'))
+        self.assertEquals(['s2'], graph.get_depends_on1('s1'))
@@ -0,0 +1,236 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+HEADER = 'uint32 seq\ntime stamp\nstring frame_id\n'
+# each type embeds the next one twice
+DEPTH = 10
+
+
+class RoslibGentoolsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.env = dict((k, os.environ.get(k)) for k in ['ROS_HOME', 'ROS_PACKAGE_PATH', 'ROS_ROOT'])
+        os.environ['ROS_HOME'] = os.path.join(self.tmp_dir, 'ros_home')
+        ws = os.path.join(self.tmp_dir, 'ws')
+        os.environ['ROS_PACKAGE_PATH'] = ws
+        os.environ['ROS_ROOT'] = os.path.join(self.tmp_dir, 'ros_root')
+        self._package(ws, 'std_msgs', [], {'Header': HEADER})
+        msgs = dict(('T%d' % i, 'T%d a\nT%d b\n' % (i + 1, i + 1)) for i in range(DEPTH))
+        msgs['T%d' % DEPTH] = 'Header header\nint32 x\n'
+        self.pkg_dir = self._package(ws, 'deep', ['std_msgs'], msgs)
+        import roslib.msgs
+        roslib.msgs.reinit()
+
+    def tearDown(self):
+        import roslib.msgs
+        roslib.msgs.reinit()
+        for k, v in self.env.items():
+            if v is None:
+                del os.environ[k]
+            else:
+                os.environ[k] = v
+        shutil.rmtree(self.tmp_dir)
+
+    def _package(self, ws, name, depends, msgs):
+        d = os.path.join(ws, name)
+        os.makedirs(os.path.join(d, 'msg'))
+        with open(os.path.join(d, 'manifest.xml'), 'w') as f:
+            f.write('<package>%s</package>' % ''.join(['<depend package="%s"/>' % p for p in depends]))
+        for t, text in msgs.items():
+            with open(os.path.join(d, 'msg', '%s.msg' % t), 'w') as f:
+                f.write(text)
+        return d
+
+    def test_md5_memo(self):
+        import roslib.gentools
+        import roslib.msgs
+
+        def md5(text):
+            return hashlib.md5(text.encode()).hexdigest()
+        expected = md5('%s header\nint32 x' % md5(HEADER.strip()))
+        for _ in range(DEPTH):
+            expected = md5('%s a\n%s b' % (expected, expected))
+
+        calls = []
+        get_dependencies = roslib.gentools.get_dependencies
+
+        def counting_get_dependencies(spec, package, *args, **kwds):
+            calls.append(spec.full_name)
+            return get_dependencies(spec, package, *args, **kwds)
+        roslib.gentools.get_dependencies = counting_get_dependencies
+        try:
+            deps = roslib.gentools.get_file_dependencies(os.path.join(self.pkg_dir, 'msg', 'T0.msg'))
+            del calls[:]
+            self.assertEquals(expected, roslib.gentools.compute_md5(deps))
+            # each embedded type is hashed once: T1..T10 and the header
+            self.assertEquals(DEPTH + 1, len(calls))
+            self.assertEquals(len(calls), len(set(calls)))
+
+            # memoized across calls
+            del calls[:]
+            self.assertEquals(expected, roslib.gentools.compute_md5(deps))
+            self.assertEquals([], calls)
+
+            # re-registering a type invalidates the memo
+            spec = roslib.msgs.load_from_string('Header header\nint64 x\n', 'deep', 'deep/T%d' % DEPTH, 'T%d' % DEPTH)
+            roslib.msgs.register('deep/T%d' % DEPTH, spec)
+            changed = roslib.gentools.compute_md5(deps)
+            self.assertNotEquals(expected, changed)
+            self.assertEquals(DEPTH + 1, len(calls))
+
+            # so does writing to the registry directly
+            del calls[:]
+            spec = roslib.msgs.load_from_string('Header header\nint8 x\n', 'deep', 'deep/T%d' % DEPTH, 'T%d' % DEPTH)
+            roslib.msgs.REGISTERED_TYPES['deep/T%d' % DEPTH] = spec
+            changed = roslib.gentools.compute_md5(deps)
+            self.assertNotEquals(expected, changed)
+            self.assertEquals(DEPTH + 1, len(calls))
+
+            # and the type graph replacing a type while it is loading
+            del calls[:]
+            graph = roslib.gentools.get_type_graph()
+            graph._register('deep/T%d' % DEPTH, roslib.msgs.load_from_string('Header header\nint16 x\n', 'deep', 'deep/T%d' % DEPTH, 'T%d' % DEPTH))
+            self.failIf(graph is roslib.gentools.get_type_graph())
+            self.assertNotEquals(changed, roslib.gentools.compute_md5(deps))
+            self.assertEquals(DEPTH + 1, len(calls))
+
+        finally:
+            roslib.gentools.get_dependencies = get_dependencies
+
+    def test_type_graph(self):
+        import roslib.depgraph
+        import roslib.gentools
+        import roslib.msgs
+        self._package(os.environ['ROS_PACKAGE_PATH'], 'unrelated', [], {})
+        deps = roslib.gentools.get_file_dependencies(os.path.join(self.pkg_dir, 'msg', 'T0.msg'))
+        types = ['deep/T%d' % i for i in range(1, DEPTH + 1)]
+        self.assertEquals(types + ['std_msgs/Header'], deps['uniquedeps'])
+        self.assertEquals(2 ** (DEPTH + 1) - 2 + 2 ** DEPTH, len(deps['deps']))
+
+        graph = roslib.gentools.get_type_graph()
+        self.assert_(graph is roslib.gentools.get_type_graph())
+        spec = deps['spec']
+        # only the manifests of the dependencies of deep are parsed
+        self.assertEquals(['deep', 'std_msgs'], sorted(roslib.depgraph.get_package_graph()._depends1.keys()))
+        # query results are copies of the cached lists
+        deps['uniquedeps'].append('foo')
+        self.assertEquals(types + ['std_msgs/Header'], graph.expand([spec], 'deep').uniquedeps)
+
+        # registering a type creates a new graph
+        roslib.msgs.register('deep/Other', roslib.msgs.load_from_string('int32 x\n', 'deep', 'deep/Other', 'Other'))
+        self.failIf(graph is roslib.gentools.get_type_graph())
+
+    def test_type_graph_cycle(self):
+        import roslib.gentools
+        import roslib.msgs
+        from roslib.msgs import MsgSpecException
+        ws = os.environ['ROS_PACKAGE_PATH']
+        d = self._package(ws, 'cycle', [], {'A': 'B b\n', 'B': 'A[] a\n'})
+        try:
+            roslib.gentools.get_file_dependencies(os.path.join(d, 'msg', 'A.msg'))
+            self.fail('should have raised')
+        except MsgSpecException:
+            pass
+
+    def test_type_graph_threads(self):
+        import roslib.gentools
+        import roslib.msgs
+        ws = os.environ['ROS_PACKAGE_PATH']
+        # every type of a layer embeds every type of the next one
+        layers, width = 4, 6
+        msgs = {}
+        for i in range(layers):
+            for j in range(width):
+                if i + 1 < layers:
+                    msgs['L%d_%d' % (i, j)] = ''.join(['L%d_%d f%d\n' % (i + 1, k, k) for k in range(width)])
+                else:
+                    msgs['L%d_%d' % (i, j)] = 'int32 x\n'
+        d = self._package(ws, 'wide', [], msgs)
+        errors = []
+
+        def run(start, j):
+            start.wait()
+            try:
+                roslib.gentools.get_file_dependencies(os.path.join(d, 'msg', 'L0_%d.msg' % j))
+            except Exception as e:
+                errors.append(e)
+        # threads build a new graph together in every round, switching
+        # often
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for _ in range(20):
+                roslib.msgs.reinit()
+                roslib.gentools._type_graph = None
+                start = threading.Event()
+                threads = [threading.Thread(target=run, args=(start, j % width)) for j in range(8)]
+                for t in threads:
+                    t.start()
+                start.set()
+                for t in threads:
+                    t.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEquals([], errors)
+
+    def test_type_graph_valid_packages(self):
+        import roslib.gentools
+        ws = os.environ['ROS_PACKAGE_PATH']
+        d = self._package(ws, 'user', ['deep'], {'U': 'deep/T9 a\ndeep/T8 b\n'})
+
+        class Rospack(object):
+            calls = []
+
+            def get_depends(self, name, implicit=True):
+                self.calls.append(name)
+                return {'user': ['deep', 'std_msgs']}.get(name, [])
+        rospack = Rospack()
+        deps = roslib.gentools.get_file_dependencies(os.path.join(d, 'msg', 'U.msg'), rospack=rospack)
+        self.assertEquals(['deep/T9', 'deep/T10', 'std_msgs/Header', 'deep/T8'], deps['uniquedeps'])
+        self.assertEquals(['user'], rospack.calls)
+
+        # packages that are not dependencies may not be loaded
+        d = self._package(ws, 'other', [], {'O': 'deep/T0 a\n'})
+        try:
+            roslib.gentools.get_file_dependencies(os.path.join(d, 'msg', 'O.msg'), rospack=rospack)
+            self.fail('should have raised')
+        except roslib.msgs.MsgSpecException:
+            pass
@@ -0,0 +1,119 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+
+class RoslibImporterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import roslib.importer
+        roslib.importer.uninstall()
+        shutil.rmtree(self.tmp_dir)
+
+    def _module(self, d, name, text=''):
+        if not os.path.isdir(d):
+            os.makedirs(d)
+        with open(os.path.join(d, name), 'w') as f:
+            f.write(text)
+
+    def test_finder(self):
+        import roslib.importer
+        if not roslib.importer.is_supported():
+            return
+        a, b = os.path.join(self.tmp_dir, 'a'), os.path.join(self.tmp_dir, 'b')
+        self._module(os.path.join(a, 'roslib_test_pkg'), '__init__.py', 'where = "a"')
+        self._module(os.path.join(b, 'roslib_test_pkg'), '__init__.py', 'where = "b"')
+        self._module(os.path.join(b, 'roslib_test_pkg'), 'sub.py')
+        self._module(b, 'roslib_test_mod.py')
+        os.makedirs(os.path.join(b, 'not_a_package'))
+
+        finder = roslib.importer.PackageFinder()
+        finder.add_paths([b])
+        self.assertEquals(os.path.join(b, 'roslib_test_mod.py'), finder.find_spec('roslib_test_mod').origin)
+        self.assertEquals(None, finder.find_spec('not_a_package'))
+        self.assertEquals(None, finder.find_spec('os'))
+        self.assertEquals(None, finder.find_spec('roslib_test_pkg.sub', [os.path.join(b, 'roslib_test_pkg')]))
+
+        # directories added later take precedence
+        finder.add_paths([a])
+        self.assertEquals([a, b], finder.get_paths())
+        self.assertEquals(os.path.join(a, 'roslib_test_pkg', '__init__.py'), finder.find_spec('roslib_test_pkg').origin)
+
+        self._module(a, 'roslib_test_new.py')
+        self.assertEquals(None, finder.find_spec('roslib_test_new'))
+        finder.invalidate_caches()
+        self.assertEquals(os.path.join(a, 'roslib_test_new.py'), finder.find_spec('roslib_test_new').origin)
+
+    def test_install(self):
+        import roslib.importer
+        if not roslib.importer.is_supported():
+            self.assertEquals(None, roslib.importer.install())
+            return
+        d = os.path.join(self.tmp_dir, 'src')
+        self._module(os.path.join(d, 'roslib_test_installed'), '__init__.py')
+        self._module(os.path.join(d, 'roslib_test_installed'), 'sub.py', 'value = 1')
+
+        finder = roslib.importer.install()
+        self.assert_(finder is roslib.importer.install())
+        self.assert_(finder is roslib.importer.get_finder())
+        # builtin and frozen modules are never shadowed
+        import importlib.machinery
+        i = sys.meta_path.index(finder)
+        self.assert_(sys.meta_path[i + 1] is importlib.machinery.PathFinder)
+        self.failIf(importlib.machinery.BuiltinImporter in sys.meta_path[i:])
+        finder.add_paths([d])
+        try:
+            import roslib_test_installed.sub
+            self.assertEquals(1, roslib_test_installed.sub.value)
+            self.failIf(d in sys.path)
+        finally:
+            sys.modules.pop('roslib_test_installed.sub', None)
+            sys.modules.pop('roslib_test_installed', None)
+
+        roslib.importer.uninstall()
+        self.assertEquals(None, roslib.importer.get_finder())
+        self.failIf(finder in sys.meta_path)
+        self.assertEquals(d, sys.path[0])
+        sys.path.remove(d)
+
+    def test_is_enabled(self):
+        import roslib.importer
+        self.failIf(roslib.importer.is_enabled({}))
+        self.assert_(roslib.importer.is_enabled({roslib.importer.ROS_IMPORT_FINDER: '1'}))
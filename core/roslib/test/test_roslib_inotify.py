@@ -0,0 +1,155 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+
+def _wait_for(predicate, timeout=5.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class RoslibInotifyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _make_pkg(self, d):
+        os.makedirs(d)
+        with open(os.path.join(d, 'manifest.xml'), 'w') as f:
+            f.write('<package/>')
+
+    def test_package_watcher(self):
+        import roslib.inotify
+        from roslib.pkgindex import PackageIndex
+        if not roslib.inotify.is_available():
+            return
+        root = os.path.join(self.tmp_dir, 'ws')
+        self._make_pkg(os.path.join(root, 'a'))
+        index = PackageIndex(None, root, filename=os.path.join(self.tmp_dir, 'index.json'))
+        saves = []
+        save = index.save
+
+        def counting_save():
+            saves.append(1)
+            save()
+        index.save = counting_save
+        watcher = roslib.inotify.PackageWatcher(index)
+        watcher.start()
+        try:
+            self.assert_(index.watched)
+            self.assertEquals(['a'], index.list())
+            del saves[:]
+
+            # editing files of a package does not rewrite the index
+            with open(os.path.join(root, 'a', 'a.py'), 'w') as f:
+                f.write('pass\n')
+            time.sleep(0.1)
+            self.assertEquals([], saves)
+
+            # new package in a new subdirectory
+            self._make_pkg(os.path.join(root, 'stack', 'b'))
+            self.assert_(_wait_for(lambda: 'b' in index.packages))
+            self.assertEquals(os.path.join(root, 'stack', 'b'), index.packages['b'])
+            self.assert_(_wait_for(lambda: saves))
+
+            # relocated package
+            os.rename(os.path.join(root, 'stack'), os.path.join(root, 'stack2'))
+            self.assert_(_wait_for(lambda: index.packages.get('b') == os.path.join(root, 'stack2', 'b')))
+
+            # removed package
+            shutil.rmtree(os.path.join(root, 'a'))
+            self.assert_(_wait_for(lambda: 'a' not in index.packages))
+            self.assertEquals(None, index.get_path('a'))
+            self.assertEquals(os.path.join(root, 'stack2', 'b'), index.get_path('b'))
+        finally:
+            watcher.stop()
+        self.failIf(index.watched)
+
+    def test_watch_after_stop(self):
+        import errno
+        import roslib.inotify
+        if not roslib.inotify.is_available():
+            return
+        ros_home = os.environ.get('ROS_HOME')
+        os.environ['ROS_HOME'] = os.path.join(self.tmp_dir, 'ros_home')
+        root = os.path.join(self.tmp_dir, 'ws')
+        self._make_pkg(os.path.join(root, 'a'))
+        try:
+            # concurrent calls share one watcher
+            watchers = []
+            threads = [threading.Thread(target=lambda: watchers.append(roslib.inotify.watch(None, root))) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            watcher = watchers[0]
+            self.assertEquals([watcher] * 8, watchers)
+            self.assert_(watcher is roslib.inotify.watch(None, root))
+            watcher.stop()
+            # a stopped watcher is never handed out again
+            watcher2 = roslib.inotify.watch(None, root)
+            self.assert_(watcher2 is not watcher)
+            self.assert_(watcher2.index.watched)
+
+            # a watcher whose descriptor fails gives up instead of spinning
+            def read():
+                raise OSError(errno.EBADF, 'Bad file descriptor')
+            watcher2._inotify.read = read
+            self._make_pkg(os.path.join(root, 'b'))
+            self.assert_(_wait_for(lambda: not watcher2._thread.is_alive()))
+            self.failIf(watcher2.index.watched)
+            self.assert_(roslib.inotify.watch(None, root) is not watcher2)
+            watcher2.stop()
+        finally:
+            for w in list(roslib.inotify._watchers.values()):
+                w.stop()
+            if ros_home is None:
+                del os.environ['ROS_HOME']
+            else:
+                os.environ['ROS_HOME'] = ros_home
+
+
+def get_test_path():
+    return os.path.abspath(os.path.dirname(__file__))
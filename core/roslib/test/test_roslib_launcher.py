@@ -0,0 +1,117 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import rospkg
+
+
+class RoslibLauncherTest(unittest.TestCase):
+
+    def setUp(self):
+        import roslib.launcher
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ros_home = os.environ.get('ROS_HOME')
+        os.environ['ROS_HOME'] = os.path.join(self.tmp_dir, 'ros_home')
+        roslib.launcher._plans.clear()
+
+    def tearDown(self):
+        import roslib.launcher
+        roslib.launcher._plans.clear()
+        if self.ros_home is None:
+            del os.environ['ROS_HOME']
+        else:
+            os.environ['ROS_HOME'] = self.ros_home
+        shutil.rmtree(self.tmp_dir)
+
+    def _package(self, root, name, depends=[], export=None, dirs=[]):
+        d = os.path.join(root, name)
+        os.makedirs(d)
+        for sub in dirs:
+            os.makedirs(os.path.join(d, sub))
+        with open(os.path.join(d, 'manifest.xml'), 'w') as f:
+            f.write('<package>%s%s</package>' % (
+                ''.join(['<depend package="%s"/>' % p for p in depends]),
+                '<export><python path="%s"/></export>' % export if export else ''))
+        return d
+
+    def test_get_plan(self):
+        import roslib.launcher
+        root = os.path.join(self.tmp_dir, 'ws')
+        b = self._package(root, 'b', dirs=['lib'])
+        a = self._package(root, 'a', depends=['b'], export='${prefix}/src:${prefix}/src')
+        rospack = rospkg.RosPack(ros_paths=[root])
+
+        plan = roslib.launcher._get_plan('a', rospack)
+        self.assertEquals([os.path.join(b, 'lib'), os.path.join(a, 'src')], plan['paths'])
+        self.assertEquals(['b', 'a'], plan['packages'])
+        self.assert_(os.path.isfile(roslib.launcher.get_plan_file(rospack)))
+
+        # a new process must be answered from disk without parsing manifests
+        roslib.launcher._plans.clear()
+
+        class NoManifests(rospkg.RosPack):
+            def get_manifest(self, name):
+                raise AssertionError(name)
+        self.assertEquals(plan, roslib.launcher._get_plan('a', NoManifests(ros_paths=[root])))
+
+        # new directories and manifest edits invalidate the plan
+        os.makedirs(os.path.join(a, 'lib'))
+        os.makedirs(os.path.join(b, 'src'))
+        rospack = rospkg.RosPack(ros_paths=[root])
+        plan = roslib.launcher._get_plan('a', rospack)
+        self.assertEquals([os.path.join(b, 'src'), os.path.join(b, 'lib'), os.path.join(a, 'src')], plan['paths'])
+
+        time.sleep(0.01)
+        with open(os.path.join(a, 'manifest.xml'), 'w') as f:
+            f.write('<package><depend package="b"/></package>')
+        rospack = rospkg.RosPack(ros_paths=[root])
+        plan = roslib.launcher._get_plan('a', rospack)
+        self.assertEquals([os.path.join(b, 'src'), os.path.join(b, 'lib'), os.path.join(a, 'lib')], plan['paths'])
+
+    def test_plan_cache_disabled(self):
+        import roslib.launcher
+        root = os.path.join(self.tmp_dir, 'ws')
+        self._package(root, 'a', dirs=['src'])
+        rospack = rospkg.RosPack(ros_paths=[root])
+        os.environ[roslib.launcher.ROS_BOOTSTRAP_CACHE] = '0'
+        try:
+            self.failIf(roslib.launcher.is_plan_cache_enabled())
+            self.assertEquals(['a'], roslib.launcher._get_plan('a', rospack)['packages'])
+            self.failIf(os.path.exists(roslib.launcher.get_plan_file(rospack)))
+        finally:
+            del os.environ[roslib.launcher.ROS_BOOTSTRAP_CACHE]
+        self.assert_(roslib.launcher.is_plan_cache_enabled({}))
@@ -0,0 +1,124 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import threading
+import unittest
+
+
+class RoslibLocksTest(unittest.TestCase):
+
+    def test_striped_lock(self):
+        from roslib.locks import StripedLock
+        locks = StripedLock(4)
+        self.assert_(locks.get('std_msgs/String') is locks.get('std_msgs/String'))
+        self.assertEquals(4, len(set(id(locks.get(i)) for i in range(8))))
+        # reentrant
+        with locks.get('a'):
+            with locks.get('a'):
+                pass
+
+    def test_synchronized(self):
+        from roslib.locks import synchronized
+
+        class Counter(object):
+            def __init__(self):
+                self._lock = threading.Lock()
+                self.value = 0
+
+            @synchronized
+            def add(self, n):
+                """docstring"""
+                value = self.value
+                for _ in range(n):
+                    value += 1
+                self.value = value
+        c = Counter()
+        self.assertEquals('docstring', c.add.__doc__)
+        threads = [threading.Thread(target=lambda: [c.add(10) for _ in range(100)]) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEquals(8000, c.value)
+
+    def test_single_flight(self):
+        try:
+            import asyncio
+        except ImportError:
+            return
+        from roslib.locks import SingleFlight
+        flights = SingleFlight(copy=list)
+        calls = []
+        release = threading.Event()
+
+        def lookup(key):
+            calls.append(key)
+            release.wait(5)
+            if key == 'bad':
+                raise KeyError(key)
+            return [key]
+
+        # requests must come from the running loop
+        self.assertRaises(RuntimeError, flights.run, 'a', lookup, 'a')
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            futures = run_in_loop(loop, lambda: [flights.run(k, lookup, k) for k in ['a', 'a', 'b', 'a', 'bad', 'bad']])
+            # cancelling one request leaves the shared lookup alone
+            futures[0].cancel()
+            loop.call_soon(release.set)
+            results = loop.run_until_complete(asyncio.gather(*futures[1:], return_exceptions=True))
+            self.assertEquals(['a', 'b', 'bad'], sorted(calls))
+            self.assertEquals(['a'], results[0])
+            self.assertEquals(['b'], results[1])
+            self.assertEquals(['a'], results[2])
+            self.failIf(results[0] is results[2])
+            self.assert_(isinstance(results[3], KeyError))
+            self.assert_(isinstance(results[4], KeyError))
+            self.assertEquals({}, flights._calls)
+
+            # finished lookups are not reused
+            self.assertEquals(['a'], loop.run_until_complete(run_in_loop(loop, lambda: flights.run('a', lookup, 'a'))))
+            self.assertEquals(4, len(calls))
+            self.assertEquals(1, loop.run_until_complete(run_in_loop(loop, lambda: flights.done(1))))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+def run_in_loop(loop, fn):
+    """
+    @return: fn() called while loop is running
+    """
+    f = loop.create_future()
+    loop.call_soon(lambda: f.set_result(fn()))
+    return loop.run_until_complete(f)
@@ -0,0 +1,129 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import unittest
+
+
+class RoslibMsgsTest(unittest.TestCase):
+
+    def test_load_from_string(self):
+        from roslib.msgs import load_from_string
+        spec = load_from_string('Header header\n  int32 x # comment\nBar[] bars\nfoo/Baz[3] baz\ntime t\n'
+                                'string S = a # b\nint8 C=-1\nbool B = True\nuint64 U =1\nfloat64 F= 1.5\n', 'pkg')
+        self.assertEquals(['Header', 'int32', 'pkg/Bar[]', 'foo/Baz[3]', 'time'], spec.types)
+        self.assertEquals(['header', 'x', 'bars', 'baz', 't'], spec.names)
+        self.assertEquals([('string', 'S', 'a # b', 'a # b'), ('int8', 'C', -1, '-1'), ('bool', 'B', True, 'True'),
+                           ('uint64', 'U', 1, '1'), ('float64', 'F', 1.5, '1.5')],
+                          [(c.type, c.name, c.val, c.val_text) for c in spec.constants])
+        self.assert_(spec.has_header())
+        self.assertEquals(['Bar[]'], load_from_string('Bar[] bars').types)
+
+        # lines the fast path does not accept
+        spec = load_from_string('int32\t x\nstring  S=\tx y\nint32 A B = 2\n', 'pkg')
+        self.assertEquals((['int32'], ['x']), (spec.types, spec.names))
+        self.assertEquals([('string', 'S', 'x y', 'x y'), ('int32', 'A B', 2, '2')],
+                          [(c.type, c.name, c.val, c.val_text) for c in spec.constants])
+
+    def test_load_from_string_errors(self):
+        from roslib.msgs import load_from_string, MsgSpecException
+        for text, error in [
+            ('int32\tx', 'int32\tx is not a legal message type'),
+            ('foo//Bar x', 'foo//Bar is not a legal message type'),
+            ('int32[x] y', 'int32[x] is not a legal message type'),
+            ('int32 x y', 'Invalid declaration: int32 x y'),
+            ('int32 3x', '3x is not a legal message field name'),
+            ('int32 x\nint32 x', "Duplicate field names in message: ['x', 'x']"),
+            ('int32[] X=1', 'int32[] is not a legal constant type'),
+            ('Bar X=1', 'Bar is not a legal constant type'),
+            ('int32 X=1=2', 'Invalid declaration: int32 X=1=2'),
+            ('uint8 X=256', 'Invalid declaration: cannot coerce [256] to uint8 (out of bounds)'),
+            ('int8 X=-129', 'Invalid declaration: cannot coerce [-129] to int8 (out of bounds)'),
+            ('int32 X=a', "Invalid declaration: invalid literal for int() with base 10: 'a'"),
+            ('bool X=true', "Invalid declaration: name 'true' is not defined"),
+        ]:
+            try:
+                load_from_string(text)
+                self.fail('should have raised: %r' % text)
+            except MsgSpecException as e:
+                self.assertEquals(error, str(e))
+
+    def test_bool_constants(self):
+        from roslib.msgs import load_from_string, MsgSpecException
+        for val, expected in [('True', True), ('False', False), ('1', True), ('0', False), ('2', True),
+                              ('None', False), ('""', False), ('"a"', True), ('[]', False), ('-1', True)]:
+            c = load_from_string('bool B=%s' % val).constants[0]
+            self.assertEquals((expected, val), (c.val, c.val_text))
+        self.assertRaises(MsgSpecException, load_from_string, 'bool B=(')
+        # expressions are evaluated as before, but deprecated
+        import warnings
+        for val, expected in [('1+1', True), ('1-1', False), ('len("a")', True), ('not True', False)]:
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter('always')
+                c = load_from_string('bool B=%s' % val).constants[0]
+            self.assertEquals((expected, val), (c.val, c.val_text))
+            self.assertEquals([DeprecationWarning], [x.category for x in w])
+
+    def test_field_types_limit(self):
+        import roslib.msgs
+        roslib.msgs._field_types.clear()
+        for i in range(roslib.msgs._FIELD_TYPES_LIMIT + 10):
+            roslib.msgs.Field('x', 'int32[%d]' % i)
+        self.assert_(len(roslib.msgs._field_types) <= roslib.msgs._FIELD_TYPES_LIMIT)
+        self.assertEquals(('int32', True, 5), roslib.msgs._parse_field_type('int32[5]')[:3])
+
+    def test_compact_specs(self):
+        import roslib.msgs
+        text = 'Header header\nfloat64 x\nint32 C=1\n'
+        a = roslib.msgs.load_from_string(text, 'pkg', 'pkg/A', 'A')
+        b = roslib.msgs.load_from_string(text, 'pkg', 'pkg/A', 'A')
+        self.failIf(a is b)
+        self.assert_(a.types[1] is b.types[1])
+        self.assert_(a.names[0] is b.names[0])
+        self.assert_(a.constants[0].name is b.constants[0].name)
+        self.assert_(a.parsed_fields()[0].base_type is b.parsed_fields()[0].base_type)
+        for obj in [a, a.parsed_fields()[0], a.constants[0]]:
+            self.failIf(hasattr(obj, '__dict__'))
+        f = a.parsed_fields()[1]
+        self.assertEquals(('x', 'float64', 'float64', False, None, True, False),
+                          (f.name, f.type, f.base_type, f.is_array, f.array_len, f.is_builtin, f.is_header))
+
+        # structurally identical specs share one registry entry
+        try:
+            roslib.msgs.register('pkg/A', a)
+            roslib.msgs.register('A', b)
+            self.assert_(roslib.msgs.get_registered('A') is a)
+            c = roslib.msgs.load_from_string(text, 'pkg', 'pkg/C', 'C')
+            roslib.msgs.register('pkg/C', c)
+            self.assert_(roslib.msgs.get_registered('pkg/C') is c)
+        finally:
+            for name in ['A', 'pkg/A', 'pkg/C']:
+                roslib.msgs.REGISTERED_TYPES.pop(name, None)
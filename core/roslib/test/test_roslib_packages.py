@@ -31,11 +31,32 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 import os
+import shutil
+import stat
+import tempfile
 import unittest
 
 
 class RoslibPackagesTest(unittest.TestCase):
 
+    def setUp(self):
+        # keep the package indexes out of the real ROS_HOME, indexes in
+        # memory would still write to the previous one
+        import roslib.pkgindex
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ros_home = os.environ.get('ROS_HOME')
+        os.environ['ROS_HOME'] = os.path.join(self.tmp_dir, 'ros_home')
+        roslib.pkgindex._indexes.clear()
+
+    def tearDown(self):
+        import roslib.pkgindex
+        roslib.pkgindex._indexes.clear()
+        if self.ros_home is None:
+            del os.environ['ROS_HOME']
+        else:
+            os.environ['ROS_HOME'] = self.ros_home
+        shutil.rmtree(self.tmp_dir)
+
     def test_find_node(self):
         import roslib.packages
         d = roslib.packages.get_pkg_dir('roslib')
@@ -44,6 +65,113 @@ class RoslibPackagesTest(unittest.TestCase):
 
         self.assertEquals([], roslib.packages.find_node('roslib', 'not_a_node'))
 
+    def test_find_resource_index(self):
+        import roslib.packages
+        d = tempfile.mkdtemp()
+        interval = roslib.packages._MISS_CHECK_INTERVAL
+        roslib.packages._MISS_CHECK_INTERVAL = -1.0
+        try:
+            os.makedirs(os.path.join(d, 'scripts'))
+            node = os.path.join(d, 'scripts', 'node')
+            with open(node, 'w') as f:
+                f.write('#!/bin/sh\n')
+            self.assertEquals([node], roslib.packages._find_resource(d, 'node'))
+            self.assertEquals([], roslib.packages._find_resource(d, 'node', filter_fn=roslib.packages._executable_filter))
+
+            # file mode changes are noticed on a miss
+            os.chmod(node, os.stat(node).st_mode | stat.S_IXUSR)
+            self.assertEquals([node], roslib.packages._find_resource(d, 'node', filter_fn=roslib.packages._executable_filter))
+
+            # new files are noticed through directory mtimes
+            os.makedirs(os.path.join(d, 'nodes'))
+            node2 = os.path.join(d, 'nodes', 'node2')
+            open(node2, 'w').close()
+            self.assertEquals([node2], roslib.packages._find_resource(d, 'node2'))
+
+            # ignored trees are not searched
+            os.makedirs(os.path.join(d, 'data'))
+            open(os.path.join(d, 'data', 'node3'), 'w').close()
+            open(os.path.join(d, 'data', 'CATKIN_IGNORE'), 'w').close()
+            self.assertEquals([], roslib.packages._find_resource(d, 'node3'))
+
+            # repeated misses check freshness at most once per interval
+            roslib.packages._MISS_CHECK_INTERVAL = 3600.0
+            index = roslib.packages._get_resource_index(d)
+            checks = []
+            update = index.update
+
+            def counting_update(force=False):
+                checks.append(force)
+                return update(force)
+            index.update = counting_update
+            index._miss_checked = 0.0
+            for _ in range(3):
+                self.assertEquals([], index.find('missing'))
+            self.assertEquals([True], [f for f in checks if f])
+
+            # deleted and renamed files are not served from the index
+            index.update = update
+            os.rename(node2, os.path.join(d, 'nodes', 'node4'))
+            self.assertEquals([], roslib.packages._find_resource(d, 'node2'))
+            self.assertEquals([os.path.join(d, 'nodes', 'node4')], roslib.packages._find_resource(d, 'node4'))
+            os.remove(node)
+            self.assertEquals([], roslib.packages._find_resource(d, 'node'))
+        finally:
+            roslib.packages._MISS_CHECK_INTERVAL = interval
+            shutil.rmtree(d)
+
+    def test_iter_resource(self):
+        import roslib.packages
+        import rospkg
+        d = tempfile.mkdtemp()
+        try:
+            pkg = os.path.join(d, 'iter_resource_pkg')
+            for sub in ['a', 'b', 'c']:
+                os.makedirs(os.path.join(pkg, sub))
+                open(os.path.join(pkg, sub, 'res'), 'w').close()
+            with open(os.path.join(pkg, 'manifest.xml'), 'w') as f:
+                f.write('<package/>')
+            rospack = rospkg.RosPack(ros_paths=[d])
+            # directory listing order is up to the filesystem
+            expected = roslib.packages.find_resource('iter_resource_pkg', 'res', rospack=rospack)
+            self.assertEquals(sorted(expected), [os.path.join(pkg, sub, 'res') for sub in ['a', 'b', 'c']])
+            self.assertEquals(expected[:2], roslib.packages.find_resource('iter_resource_pkg', 'res', rospack=rospack, max_matches=2))
+
+            # the filter is not applied beyond the first match
+            tested = []
+
+            def filter_fn(path):
+                tested.append(path)
+                return True
+            matches = roslib.packages.iter_resource('iter_resource_pkg', 'res', filter_fn=filter_fn, rospack=rospack)
+            self.assertEquals(expected[0], next(matches))
+            self.assertEquals(expected[:1], tested)
+        finally:
+            shutil.rmtree(d)
+
+    def test_prefetch_resource_indexes(self):
+        import roslib.crawler
+        import roslib.packages
+        d = tempfile.mkdtemp()
+        try:
+            for sub in ['a', 'b']:
+                os.makedirs(os.path.join(d, sub, 'bin'))
+                open(os.path.join(d, sub, 'bin', 'res'), 'w').close()
+            indexes = [roslib.packages._ResourceIndex(os.path.join(d, sub)) for sub in ['a', 'b']]
+            pending = roslib.packages._prefetch_resource_indexes(indexes)
+            if roslib.crawler.ThreadPoolExecutor is None:
+                return
+            self.assertEquals(set(indexes), set(pending.keys()))
+            for index in indexes:
+                pending[index].result()
+                self.assertEquals([os.path.join(index.d, 'bin', 'res')], index.find('res'))
+            # indexed trees are not crawled again, the pool is shared
+            self.assertEquals({}, roslib.packages._prefetch_resource_indexes(indexes))
+            executor = roslib.packages._get_prefetch_executor()
+            self.assert_(executor is roslib.packages._get_prefetch_executor())
+        finally:
+            shutil.rmtree(d)
+
     def test_get_pkg_dir(self):
         import roslib.packages
         import roslib.rospack
@@ -55,6 +183,46 @@ class RoslibPackagesTest(unittest.TestCase):
         except roslib.packages.InvalidROSPkgException:
             pass
 
+    def test_aget_pkg_dir(self):
+        try:
+            import asyncio
+        except ImportError:
+            return
+        import roslib.packages
+        d = roslib.packages.get_pkg_dir('roslib')
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            futures = run_in_loop(loop, lambda: [roslib.packages.aget_pkg_dir('roslib') for _ in range(20)])
+            self.assertEquals([d] * 20, loop.run_until_complete(asyncio.gather(*futures)))
+            f = run_in_loop(loop, lambda: roslib.packages.aget_pkg_dir('fake_package', required=False))
+            self.assertEquals(None, loop.run_until_complete(f))
+            try:
+                loop.run_until_complete(run_in_loop(loop, lambda: roslib.packages.aget_pkg_dir('fake_package')))
+                self.fail('should have raised')
+            except roslib.packages.InvalidROSPkgException:
+                pass
+            p = os.path.join(d, 'test', 'fake_node.py')
+            f = run_in_loop(loop, lambda: roslib.packages.afind_resource('roslib', 'fake_node.py'))
+            self.assertEquals([p], loop.run_until_complete(f))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def test_get_pkg_dirs(self):
+        import roslib.packages
+        path = roslib.packages.get_pkg_dir('roslib')
+        dirs, errors = roslib.packages.get_pkg_dirs(['roslib', 'fake_roslib', 'roslib'])
+        self.assertEquals({'roslib': path}, dirs)
+        self.assertEquals(['fake_roslib'], list(errors.keys()))
+        self.assert_(isinstance(errors['fake_roslib'], roslib.packages.InvalidROSPkgException))
+
+        r1 = ('roslib', 'msg', 'Foo.msg')
+        r2 = ('fake_roslib', 'msg', 'Foo.msg')
+        paths, errors = roslib.packages.resource_files([r1, r2])
+        self.assertEquals({r1: os.path.join(path, 'msg', 'Foo.msg')}, paths)
+        self.assertEquals([r2], list(errors.keys()))
+
     def test_get_dir_pkg(self):
         import roslib.packages
         path = get_roslib_path()
@@ -69,6 +237,64 @@ class RoslibPackagesTest(unittest.TestCase):
         # must fail on parent of roslib
         self.assertEquals((None, None), roslib.packages.get_dir_pkg(os.path.dirname(path)))
 
+    def test_get_path_pkgs(self):
+        from roslib.packages import get_path_pkg, get_path_pkgs
+        d = os.path.join(get_roslib_path(), 'test', 'package_tests')
+        p1 = os.path.join(d, 'p1')
+        foo = os.path.join(p1, 'foo', 'msg', 'Foo.msg')
+        bar = os.path.join(p1, 'bar')
+        outside = os.path.join(d, 'p2', 'foo', 'manifest.xml')
+        paths = get_path_pkgs([foo, bar, outside], ros_package_path=p1)
+        self.assertEquals((os.path.join(p1, 'foo'), 'foo'), paths[foo])
+        self.assertEquals((bar, 'bar'), paths[bar])
+        # not on the ROS path: found by walking up the filesystem
+        self.assertEquals((os.path.join(d, 'p2', 'foo'), 'foo'), paths[outside])
+        self.assertEquals((None, None), get_path_pkg(tempfile.gettempdir(), ros_package_path=p1))
+
+    def test_list_pkgs_by_path_vcs(self):
+        import roslib.packages
+        d = os.path.join(self.tmp_dir, 'ws')
+        for p in ['a', os.path.join('.svn', 'b'), os.path.join('.git', 'c')]:
+            os.makedirs(os.path.join(d, p))
+            with open(os.path.join(d, p, 'manifest.xml'), 'w') as f:
+                f.write('<package/>')
+        # .svn and .git are skipped, even next to each other
+        self.assertEquals(['a'], roslib.packages.list_pkgs_by_path(d, env={'ROS_ROOT': ''}))
+
+    def test_nested_pkg(self):
+        import roslib.packages
+        import roslib.pkgindex
+        d = tempfile.mkdtemp()
+        rpp = os.environ.get('ROS_PACKAGE_PATH')
+        try:
+            ws = os.path.join(d, 'ws')
+            os.environ['ROS_PACKAGE_PATH'] = ws
+            outer = os.path.join(ws, 'outer')
+            inner = os.path.join(outer, 'sub', 'inner')
+            os.makedirs(os.path.join(inner, 'src'))
+            for p in [outer, inner]:
+                with open(os.path.join(p, 'manifest.xml'), 'w') as f:
+                    f.write('<package/>')
+            path = os.path.join(inner, 'src')
+            index = roslib.pkgindex.get_index(*roslib.packages._resolve_ros_env())
+            self.failIf(index.is_loaded())
+            # a cold index is not crawled
+            self.assertEquals((inner, 'inner'), roslib.packages.get_dir_pkg(path))
+            self.failIf(index.is_loaded())
+
+            # the index does not know nested packages
+            self.assertEquals({'outer': outer}, dict((p, index.get_path(p)) for p in index.list()))
+            self.assert_(index.is_loaded())
+            self.assertEquals((inner, 'inner'), roslib.packages.get_dir_pkg(path))
+            self.assertEquals((outer, 'outer'), roslib.packages.get_dir_pkg(os.path.join(outer, 'sub')))
+            self.assertEquals((inner, 'inner'), roslib.packages.get_path_pkg(path))
+        finally:
+            if rpp is None:
+                del os.environ['ROS_PACKAGE_PATH']
+            else:
+                os.environ['ROS_PACKAGE_PATH'] = rpp
+            shutil.rmtree(d)
+
 
 def get_roslib_path():
     return os.path.realpath(os.path.abspath(os.path.join(get_test_path(), '..')))
@@ -76,3 +302,12 @@ def get_roslib_path():
 
 def get_test_path():
     return os.path.abspath(os.path.dirname(__file__))
+
+
+def run_in_loop(loop, fn):
+    """
+    @return: fn() called while loop is running
+    """
+    f = loop.create_future()
+    loop.call_soon(lambda: f.set_result(fn()))
+    return loop.run_until_complete(f)
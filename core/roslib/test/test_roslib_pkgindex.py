@@ -0,0 +1,242 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class RoslibPkgIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _index(self, ros_package_path):
+        from roslib.pkgindex import PackageIndex
+        return PackageIndex(None, ros_package_path, filename=os.path.join(self.tmp_dir, 'index.json'))
+
+    def test_precedence(self):
+        d = os.path.join(get_test_path(), 'package_tests')
+        p1, p2 = os.path.join(d, 'p1'), os.path.join(d, 'p2')
+
+        index = self._index(os.pathsep.join([p1, p2]))
+        self.assertEquals(os.path.join(p1, 'foo'), index.get_path('foo'))
+        self.assertEquals(os.path.join(p1, 'bar'), index.get_path('bar'))
+        self.assertEquals(None, index.get_path('fake_package'))
+
+        index = self._index(os.pathsep.join([p2, p1]))
+        self.assertEquals(os.path.join(p2, 'foo'), index.get_path('foo'))
+        self.assertEquals(os.path.join(p1, 'bar'), index.get_path('bar'))
+
+    def test_persistence(self):
+        d = os.path.join(get_test_path(), 'package_tests', 'p1')
+        index = self._index(d)
+        self.assertEquals({'foo', 'bar'}, set(index.list()))
+        self.assert_(os.path.isfile(index.filename))
+
+        # a new instance must be answered from disk
+        index = self._index(d)
+        self.assert_(index.load())
+        self.assert_(index.is_fresh())
+        self.assertEquals(os.path.join(d, 'foo'), index.packages['foo'])
+
+        # index for a different environment must be rejected
+        index = self._index(os.path.join(get_test_path(), 'package_tests', 'p2'))
+        self.failIf(index.load())
+
+    def test_freshness(self):
+        root = os.path.join(self.tmp_dir, 'ws')
+        os.makedirs(os.path.join(root, 'stack', 'a'))
+        with open(os.path.join(root, 'stack', 'a', 'manifest.xml'), 'w') as f:
+            f.write('<package/>')
+        index = self._index(root)
+        self.assertEquals(os.path.join(root, 'stack', 'a'), index.get_path('a'))
+        self.assertEquals(None, index.get_path('b'))
+        self.assert_(index.is_fresh())
+
+        os.makedirs(os.path.join(root, 'stack', 'b'))
+        with open(os.path.join(root, 'stack', 'b', 'package.xml'), 'w') as f:
+            f.write('<package><name>b_pkg</name></package>')
+        self.failIf(index.is_fresh())
+        self.assertEquals(os.path.join(root, 'stack', 'b'), index.get_path('b_pkg'))
+        self.assert_(index.is_fresh())
+
+    def test_missing(self):
+        root = os.path.join(self.tmp_dir, 'ws')
+        os.makedirs(root)
+        index = self._index(root)
+        self.assertEquals(None, index.get_path('a'))
+        self.assert_(index.is_missing('a'))
+
+        # repeated probes do not check the filesystem
+        checks = []
+        index.is_fresh = lambda: checks.append(True) or True
+        self.assertEquals(None, index.get_path('a'))
+        self.assertEquals({}, index.get_paths(['a']))
+        self.assertEquals([], checks)
+        del index.is_fresh
+
+        # a rebuild forgets the misses
+        os.makedirs(os.path.join(root, 'a'))
+        with open(os.path.join(root, 'a', 'manifest.xml'), 'w') as f:
+            f.write('<package/>')
+        index.rebuild()
+        self.failIf(index.is_missing('a'))
+        self.assertEquals(os.path.join(root, 'a'), index.get_path('a'))
+
+    def test_ignore(self):
+        root = os.path.join(self.tmp_dir, 'ws')
+        for d in ['a', 'build/b']:
+            os.makedirs(os.path.join(root, d))
+            with open(os.path.join(root, d, 'manifest.xml'), 'w') as f:
+                f.write('<package/>')
+        ignore_file = os.path.join(root, '.rosignore')
+        with open(ignore_file, 'w') as f:
+            f.write('build\n')
+        index = self._index(root)
+        self.assertEquals(['a'], index.list())
+        self.assert_(index.is_fresh())
+
+        # editing the rules invalidates the index
+        with open(ignore_file, 'w') as f:
+            f.write('# nothing\n')
+        os.utime(ignore_file, (0, 0))
+        self.failIf(index.is_fresh())
+        index.rebuild()
+        self.assertEquals(['a', 'b'], sorted(index.list()))
+
+        # subtrees patched in are checked against the rules as well
+        with open(ignore_file, 'w') as f:
+            f.write('build\n')
+        index.rebuild()
+        index.remove_tree(os.path.join(root, 'build'))
+        self.assertEquals(([], []), index.add_tree(os.path.join(root, 'build')))
+
+    def test_trie(self):
+        from roslib.pkgindex import PackageTrie
+        trie = PackageTrie({'foo': os.path.join(self.tmp_dir, 'foo'),
+                            'bar': os.path.join(self.tmp_dir, 'foo', 'nested', 'bar')})
+        self.assertEquals((os.path.join(self.tmp_dir, 'foo'), 'foo'), trie.find(os.path.join(self.tmp_dir, 'foo')))
+        self.assertEquals((os.path.join(self.tmp_dir, 'foo'), 'foo'), trie.find(os.path.join(self.tmp_dir, 'foo', 'msg', 'Foo.msg')))
+        self.assertEquals('bar', trie.find(os.path.join(self.tmp_dir, 'foo', 'nested', 'bar', 'x'))[1])
+        self.assertEquals((None, None), trie.find(os.path.join(self.tmp_dir, 'foobar')))
+        self.assertEquals((None, None), trie.find(self.tmp_dir))
+
+        # the trie follows the index
+        d = os.path.join(get_test_path(), 'package_tests', 'p1')
+        index = self._index(d)
+        self.assertEquals((os.path.join(d, 'bar'), 'bar'), index.get_trie().find(os.path.join(d, 'bar', 'manifest.xml')))
+        self.assert_(index.get_trie() is index.get_trie())
+
+    def test_threads(self):
+        import threading
+        root = os.path.join(self.tmp_dir, 'ws')
+        for name in ['a', 'b', 'c']:
+            os.makedirs(os.path.join(root, name))
+            with open(os.path.join(root, name, 'manifest.xml'), 'w') as f:
+                f.write('<package/>')
+        extra = os.path.join(root, 'extra')
+        os.makedirs(os.path.join(extra, 'd'))
+        with open(os.path.join(extra, 'd', 'manifest.xml'), 'w') as f:
+            f.write('<package/>')
+        index = self._index(root)
+        errors = []
+
+        def lookup():
+            try:
+                for _ in range(200):
+                    for name in ['a', 'b', 'c']:
+                        if index.get_path(name) != os.path.join(root, name):
+                            errors.append(name)
+                    index.get_trie()
+                    index.list()
+            except Exception as e:
+                errors.append(e)
+
+        def patch():
+            try:
+                for _ in range(50):
+                    index.add_tree(extra)
+                    index.remove_tree(extra)
+                    index.invalidate()
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=lookup) for _ in range(4)] + [threading.Thread(target=patch)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEquals([], errors)
+
+    def test_source_packages(self):
+        from roslib.pkgindex import load_source_packages, save_source_packages
+        filename = os.path.join(self.tmp_dir, 'source_packages.json')
+        ws = os.path.join(self.tmp_dir, 'devel')
+        src = os.path.join(self.tmp_dir, 'src')
+        os.makedirs(ws)
+        os.makedirs(src)
+        marker = os.path.join(ws, '.catkin')
+        with open(marker, 'w') as f:
+            f.write(src)
+        cmake_prefix_path = os.environ.get('CMAKE_PREFIX_PATH')
+        os.environ['CMAKE_PREFIX_PATH'] = ws
+        try:
+            self.assertEquals({}, load_source_packages(filename))
+
+            class Package(object):
+                name = 'foo'
+            save_source_packages({src: {'foo_dir': Package()}}, filename)
+            loaded = load_source_packages(filename)
+            self.assertEquals([src], list(loaded.keys()))
+            self.assertEquals('foo', loaded[src]['foo_dir'].name)
+
+            # reconfiguring the workspace invalidates the mapping
+            os.utime(marker, (0, 0))
+            self.assertEquals({}, load_source_packages(filename))
+            save_source_packages({src: {}}, filename)
+            self.assertEquals({src: {}}, load_source_packages(filename))
+            # so does a change to the source space
+            os.utime(src, (0, 0))
+            self.assertEquals({}, load_source_packages(filename))
+        finally:
+            if cmake_prefix_path is None:
+                del os.environ['CMAKE_PREFIX_PATH']
+            else:
+                os.environ['CMAKE_PREFIX_PATH'] = cmake_prefix_path
+
+
+def get_test_path():
+    return os.path.abspath(os.path.dirname(__file__))
@@ -0,0 +1,158 @@
+# Software License Agreement (BSD License)
+#
+# Copyright (c) 2009, Willow Garage, Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#  * Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+#  * Redistributions in binary form must reproduce the above
+#    copyright notice, this list of conditions and the following
+#    disclaimer in the documentation and/or other materials provided
+#    with the distribution.
+#  * Neither the name of Willow Garage, Inc. nor the names of its
+#    contributors may be used to endorse or promote products derived
+#    from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+
+class RoslibSpecCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        import roslib.speccache
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ros_home = os.environ.get('ROS_HOME')
+        os.environ['ROS_HOME'] = os.path.join(self.tmp_dir, 'ros_home')
+        roslib.speccache.clear()
+
+    def tearDown(self):
+        import roslib.speccache
+        roslib.speccache.clear()
+        if self.ros_home is None:
+            del os.environ['ROS_HOME']
+        else:
+            os.environ['ROS_HOME'] = self.ros_home
+        shutil.rmtree(self.tmp_dir)
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def _no_parsing(self, module):
+        def load_from_string(*args):
+            raise AssertionError('text was parsed')
+        orig = module.load_from_string
+        module.load_from_string = load_from_string
+        return lambda: setattr(module, 'load_from_string', orig)
+
+    def test_msg(self):
+        import roslib.msgs
+        import roslib.speccache
+        path = self._write('Foo.msg', 'Header header\nint32 x  # comment\nBar[] bars\nstring S=a # b\nbool B=True\n')
+        name, spec = roslib.msgs.load_from_file(path, 'pkg')
+        self.assertEquals('pkg/Foo', name)
+        self.assertEquals(['Header', 'int32', 'pkg/Bar[]'], spec.types)
+        self.assert_(os.path.isfile(roslib.speccache.get_cache_file()))
+
+        # a new process must rebuild the spec without parsing
+        roslib.speccache.clear()
+        restore = self._no_parsing(roslib.msgs)
+        try:
+            cached_name, cached = roslib.msgs.load_from_file(path, 'pkg')
+        finally:
+            restore()
+        self.assertEquals(name, cached_name)
+        self.assertEquals(spec, cached)
+        for attr in ['full_name', 'short_name', 'package', 'header_present']:
+            self.assertEquals(getattr(spec, attr), getattr(cached, attr))
+        self.assertEquals([(c.type, c.name, c.val, c.val_text) for c in spec.constants],
+                          [(c.type, c.name, c.val, c.val_text) for c in cached.constants])
+        self.assertEquals(repr(spec.parsed_fields()), repr(cached.parsed_fields()))
+
+        # the package context is part of the key
+        self.assertEquals(['Header', 'int32', 'Bar[]'], roslib.msgs.load_from_file(path)[1].types)
+
+        # changes to the file are picked up
+        time.sleep(0.01)
+        self._write('Foo.msg', 'int64 y\n')
+        self.assertEquals(['int64'], roslib.msgs.load_from_file(path, 'pkg')[1].types)
+        roslib.speccache.clear()
+        self.assertEquals(['int64'], roslib.msgs.load_from_file(path, 'pkg')[1].types)
+
+    def test_srv(self):
+        import roslib.msgs
+        import roslib.speccache
+        import roslib.srvs
+        path = self._write('Add.srv', 'int32 a\nint32 b\n---\nint32 sum\n')
+        name, spec = roslib.srvs.load_from_file(path, 'pkg')
+
+        roslib.speccache.clear()
+        restore = self._no_parsing(roslib.srvs)
+        restore_msgs = self._no_parsing(roslib.msgs)
+        try:
+            cached_name, cached = roslib.srvs.load_from_file(path, 'pkg')
+        finally:
+            restore()
+            restore_msgs()
+        self.assertEquals(name, cached_name)
+        self.assertEquals(spec, cached)
+        self.assertEquals('pkg/AddRequest', cached.request.full_name)
+        self.assertEquals('AddResponse', cached.response.short_name)
+
+    def test_log(self):
+        import roslib.speccache
+        path = self._write('Foo.msg', '')
+        identity = roslib.speccache.stat(path)
+        roslib.speccache.put('msg', path, '', identity, 1)
+        roslib.speccache.put('msg', path, '', identity, 2)
+        self.assertEquals(None, roslib.speccache.get('msg', path, '', (0, 0)))
+
+        # a truncated record is ignored
+        with open(roslib.speccache.get_cache_file(), 'ab') as f:
+            f.write(b'\xff\x00\x00\x00garbage')
+        roslib.speccache.clear()
+        self.assertEquals(2, roslib.speccache.get('msg', path, '', identity))
+
+        os.environ[roslib.speccache.ROS_SPEC_CACHE] = '0'
+        try:
+            self.failIf(roslib.speccache.is_enabled())
+            self.assertEquals(None, roslib.speccache.get('msg', path, '', identity))
+        finally:
+            del os.environ[roslib.speccache.ROS_SPEC_CACHE]
+
+    def test_compact(self):
+        import roslib.speccache
+        path = self._write('Foo.msg', '')
+        identity = roslib.speccache.stat(path)
+        for i in range(roslib.speccache._MIN_COMPACT_RECORDS + 1):
+            roslib.speccache.put('msg', path, '', identity, i)
+        filename = roslib.speccache.get_cache_file()
+        size = os.path.getsize(filename)
+        roslib.speccache.clear()
+        self.assertEquals(roslib.speccache._MIN_COMPACT_RECORDS, roslib.speccache.get('msg', path, '', identity))
+        self.assert_(os.path.getsize(filename) < size)
+        self.assertEquals(({roslib.speccache._get_key('msg', path, ''): identity + (roslib.speccache._MIN_COMPACT_RECORDS,)}, 1),
+                          roslib.speccache._read(filename))
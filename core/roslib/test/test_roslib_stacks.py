@@ -31,6 +31,9 @@
 # POSSIBILITY OF SUCH DAMAGE.
 
 import os
+import shutil
+import tempfile
+import time
 import unittest
 
 import roslib
@@ -40,6 +43,29 @@ import rospkg
 
 class RoslibStacksTest(unittest.TestCase):
 
+    def setUp(self):
+        # keep the package and stack indexes out of the real ROS_HOME,
+        # indexes in memory would still write to the previous one
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ros_home = os.environ.get('ROS_HOME')
+        os.environ['ROS_HOME'] = os.path.join(self.tmp_dir, 'ros_home')
+        self._clear_caches()
+
+    def tearDown(self):
+        self._clear_caches()
+        if self.ros_home is None:
+            del os.environ['ROS_HOME']
+        else:
+            os.environ['ROS_HOME'] = self.ros_home
+        shutil.rmtree(self.tmp_dir)
+
+    def _clear_caches(self):
+        import roslib.pkgindex
+        import roslib.stacks
+        roslib.pkgindex._indexes.clear()
+        roslib.stacks._rosstacks.clear()
+        roslib.stacks._rospacks.clear()
+
     def test_list_stacks(self):
         from roslib.stacks import list_stacks
         # roslib can't depend on ros and therefore can't expect it being in the environment
@@ -162,6 +188,78 @@ class RoslibStacksTest(unittest.TestCase):
         self.assertEquals((['foo'], []), expand_to_packages(['foo'], env=env))
         self.assertEquals((['foo', 'bar'], []), expand_to_packages(['foo', 'bar'], env=env))
 
+    def test_overlay_caches(self):
+        import roslib.stacks
+        d = os.path.join(get_test_path(), 'stack_tests')
+        env1 = os.environ.copy()
+        env1[rospkg.environment.ROS_PACKAGE_PATH] = os.path.join(d, 's1')
+        env2 = os.environ.copy()
+        env2[rospkg.environment.ROS_PACKAGE_PATH] = os.path.join(d, 's2')
+
+        rosstack1 = roslib.stacks._get_manager(roslib.stacks._rosstacks, env1)
+        rosstack2 = roslib.stacks._get_manager(roslib.stacks._rosstacks, env2)
+        self.assert_(rosstack1 is not rosstack2)
+        # switching back does not recrawl
+        self.assert_(rosstack1 is roslib.stacks._get_manager(roslib.stacks._rosstacks, env1))
+        self.assertEquals(os.path.join(d, 's1', 'foo'), roslib.stacks.get_stack_dir('foo', env=env1))
+        self.assertEquals(os.path.join(d, 's2', 'foo'), roslib.stacks.get_stack_dir('foo', env=env2))
+        self.assertEquals(os.path.join(d, 's1', 'foo'), roslib.stacks.get_stack_dir('foo', env=env1))
+
+        rospack = roslib.stacks._get_manager(roslib.stacks._rospacks, env1)
+        self.assertEquals((['foo_pkg', 'foo_pkg_2'], []), roslib.stacks.expand_to_packages(['foo'], env=env1))
+        self.assert_(rospack is roslib.stacks._get_manager(roslib.stacks._rospacks, env1))
+
+    def test_manager_env(self):
+        import roslib.stacks
+        d = os.path.join(get_test_path(), 'stack_tests')
+        env1 = os.environ.copy()
+        env1[rospkg.environment.ROS_PACKAGE_PATH] = os.path.join(d, 's1')
+        env2 = os.environ.copy()
+        env2[rospkg.environment.ROS_PACKAGE_PATH] = os.path.join(d, 's1') + os.pathsep
+        # the same environment spelled differently shares the index and the manager
+        self.assert_(roslib.stacks._get_manager(roslib.stacks._rospacks, env1) is
+                     roslib.stacks._get_manager(roslib.stacks._rospacks, env2))
+
+    def test_manager_manifest_edit(self):
+        import roslib.stacks
+        d = tempfile.mkdtemp()
+        env = os.environ.copy()
+        env[rospkg.environment.ROS_PACKAGE_PATH] = d
+        timeout = os.environ.get('ROS_CACHE_TIMEOUT')
+        os.environ['ROS_CACHE_TIMEOUT'] = '0'
+        try:
+            for p in ['a', 'b']:
+                os.makedirs(os.path.join(d, p))
+                with open(os.path.join(d, p, 'manifest.xml'), 'w') as f:
+                    f.write('<package/>')
+            rospack = roslib.stacks._get_manager(roslib.stacks._rospacks, env)
+            self.assertEquals([], rospack.get_depends('a'))
+            time.sleep(0.01)
+            # edited in place, which leaves the directory mtime alone
+            with open(os.path.join(d, 'a', 'manifest.xml'), 'w') as f:
+                f.write('<package><depend package="b"/></package>')
+            rospack = roslib.stacks._get_manager(roslib.stacks._rospacks, env)
+            self.assertEquals(['b'], rospack.get_depends('a'))
+            self.assert_(rospack is roslib.stacks._get_manager(roslib.stacks._rospacks, env))
+        finally:
+            if timeout is None:
+                del os.environ['ROS_CACHE_TIMEOUT']
+            else:
+                os.environ['ROS_CACHE_TIMEOUT'] = timeout
+            shutil.rmtree(d)
+
+    def test_env_cache(self):
+        from roslib.pkgindex import EnvCache
+        cache = EnvCache(limit=2, keep=lambda v: v == 'kept')
+        self.assertEquals('kept', cache.get(('a',), lambda: 'kept'))
+        cache.get(('b',), lambda: 'b')
+        cache.get(('c',), lambda: 'c')
+        # least recently used entry that is not kept goes first
+        self.failIf(('b',) in cache)
+        self.assert_(('a',) in cache)
+        self.assertEquals('c', cache.get(('c',), lambda: 'new'))
+        self.assertEquals(2, len(cache))
+
     def test_expand_to_packages(self):
         from roslib.stacks import expand_to_packages
         try:
@@ -201,6 +299,61 @@ class RoslibStacksTest(unittest.TestCase):
             env = os.environ.copy()
             env[rospkg.environment.ROS_PACKAGE_PATH] = test_dir
 
+    def test_stack_index(self):
+        import roslib.pkgindex
+        import roslib.stacks
+        test_dir = os.path.join(get_test_path(), 'stack_tests', 's1')
+        env = os.environ.copy()
+        env[rospkg.environment.ROS_PACKAGE_PATH] = test_dir
+        env.setdefault(rospkg.environment.ROS_ROOT, '')
+        self.assertEquals('foo', roslib.stacks.stack_of('foo_pkg', env=env))
+        self.assertEquals('foo', roslib.stacks.stack_of('foo_pkg_2', env=env))
+
+        # stack_of() and versions are answered from the index
+        index = roslib.pkgindex.get_index(*roslib.packages._resolve_ros_env(env[rospkg.environment.ROS_ROOT], test_dir))
+        self.assertEquals('foo', index.get_package_stack('foo_pkg'))
+        metadata = index.get_stack_metadata(os.path.join(test_dir, 'foo'))
+        self.assertEquals('1.6.0-manifest', metadata['version'])
+        self.assertEquals('1.6.0-manifest', roslib.stacks.get_stack_version_by_dir(os.path.join(test_dir, 'foo')))
+        self.assertEquals('1.5.0-cmake', roslib.stacks.get_stack_version_by_dir(os.path.join(test_dir, 'bar')))
+
+    def test_stack_index_update(self):
+        import roslib.pkgindex
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            stack_dir = os.path.join(tmp_dir, 'ws', 'st')
+            os.makedirs(os.path.join(stack_dir, 'sub', 'p'))
+            with open(os.path.join(stack_dir, 'stack.xml'), 'w') as f:
+                f.write('<stack><version>1.0</version><depend stack="ros"/></stack>')
+            with open(os.path.join(stack_dir, 'sub', 'p', 'manifest.xml'), 'w') as f:
+                f.write('<package/>')
+            index = roslib.pkgindex.PackageIndex(None, os.path.join(tmp_dir, 'ws'), filename=os.path.join(tmp_dir, 'index.json'))
+            self.assertEquals('st', index.get_package_stack('p'))
+            self.assertEquals({'name': 'st', 'version': '1.0'}, index.get_stack_metadata(stack_dir))
+
+            # the mapping is persisted
+            index = roslib.pkgindex.PackageIndex(None, os.path.join(tmp_dir, 'ws'), filename=index.filename)
+            self.assert_(index.load())
+            self.assertEquals('st', index.package_stacks['p'])
+
+            # edits of the manifest invalidate the metadata
+            with open(os.path.join(stack_dir, 'stack.xml'), 'w') as f:
+                f.write('<stack><version>1.1</version></stack>')
+            os.utime(os.path.join(stack_dir, 'stack.xml'), (0, 0))
+            self.failIf(index.is_fresh())
+            index.update_stack(stack_dir)
+            self.assertEquals('1.1', index.stacks[stack_dir]['version'])
+            self.assert_(index.is_fresh())
+
+            # and so does patching the tree
+            index.remove_tree(stack_dir)
+            self.assertEquals({}, index.stacks)
+            self.assertEquals({}, index.package_stacks)
+            index.add_tree(stack_dir)
+            self.assertEquals('st', index.package_stacks['p'])
+        finally:
+            shutil.rmtree(tmp_dir)
+
 
 def get_test_path():
     return os.path.abspath(os.path.dirname(__file__))
@@ -690,7 +690,7 @@ class RosMakeAll:
         else:      # no need to extend if all already selected
             if options.buildtest:
                 for p in options.buildtest:
-                    packages.extend(self.rospack.get_depends_on(p))
+                    packages.extend(self.dependency_tracker.get_depends_on(p))
                     self.printer.print_all('buildtest requested for package %s adding it and all dependent packages: ' % p)
 
             if options.buildtest1:
@@ -97,12 +97,12 @@ class PackageFlagTracker:
 
         if os.path.exists(os.path.join(path, 'ROS_BUILD_BLACKLIST')):
             self.register_blacklisted(package, package)
-            for p in rospack.get_depends_on(package, implicit=True):
+            for p in self.dependency_tracker.get_depends_on(package):
                 self.register_blacklisted(package, p)
 
         if os.path.exists(os.path.join(path, 'ROS_BUILD_BLACKLIST_OSX')):
             self.register_blacklisted_osx(package, package)
-            for p in rospack.get_depends_on(package, implicit=True):
+            for p in self.dependency_tracker.get_depends_on(package):
                 self.register_blacklisted_osx(package, p)
 
         # NO_BUILD if marker file or catkin attribute in manifest
@@ -79,7 +79,11 @@ class DependencyTracker:
     caching way to call rospkg. It also will allow you to specifiy a
     range of packages over which to track dependencies.  This is useful
     if you are only building a subset of the tree. For example with the
-    --specified-only option."""
+    --specified-only option.
+
+    Transitive dependencies are kept as integer bitsets, one bit per
+    package, so that whole-tree queries such as all dependents of a set
+    of packages are a handful of bitwise operations."""
     def __init__(self, valid_packages=None, rospack=None):
         """
         @param valid_packages: defaults to rospack list
@@ -93,6 +97,72 @@ class DependencyTracker:
         self.valid_packages = valid_packages
         self.deps_1 = {}
         self.deps = {}
+        # package <-> bit assignment
+        self._bits = {}
+        self._names = []
+        # {package: bitset of transitive dependencies}
+        self._closure = {}
+        # {package: bitset of transitive dependents}, built on first use
+        self._reverse = None
+        self._valid_mask = None
+
+    def _get_bit(self, package):
+        bit = self._bits.get(package)
+        if bit is None:
+            bit = self._bits[package] = len(self._names)
+            self._names.append(package)
+        return bit
+
+    def _get_mask(self, packages):
+        mask = 0
+        for p in packages:
+            mask |= 1 << self._get_bit(p)
+        return mask
+
+    def _get_names(self, mask):
+        names = []
+        while mask:
+            low = mask & -mask
+            names.append(self._names[low.bit_length() - 1])
+            mask ^= low
+        return names
+
+    def _get_closure(self, package):
+        return self._visit(package, {})[0]
+
+    def _visit(self, package, stack):
+        """
+        Depth-first traversal that memoizes a closure only once it is
+        complete, i.e. not while its package is part of a cycle that
+        is still being traversed.
+
+        @param stack: {package: depth} of the packages being traversed
+        @return: closure and the smallest depth that a back edge from
+            the closure reached
+        @rtype: (int, int)
+        """
+        mask = self._closure.get(package)
+        if mask is not None:
+            return mask, len(stack)
+        depth = stack.get(package)
+        if depth is not None:
+            # circular dependency, ignore the back edge like rospkg does
+            return 0, depth
+        depth = stack[package] = len(stack)
+        low = depth
+        mask = 0
+        try:
+            depends = self.rospack.get_depends(package, implicit=False)
+        except rospkg.ResourceNotFound:
+            depends = []
+        for p in depends:
+            closure, closure_low = self._visit(p, stack)
+            mask |= closure | (1 << self._get_bit(p))
+            low = min(low, closure_low)
+        del stack[package]
+        if low >= depth:
+            self._closure[package] = mask
+        return mask, low
 
     def get_deps_1(self, package):
         if package not in self.deps_1:
@@ -114,12 +184,61 @@ class DependencyTracker:
                 potential_dependencies = self.rospack.get_depends(package)
             except rospkg.ResourceNotFound:
                 potential_dependencies = []
-
+            # keep the order of rospack, builds depend on it
+            if self._valid_mask is None:
+                self._valid_mask = self._get_mask(self.valid_packages)
             for p in potential_dependencies:
-                if p in self.valid_packages:
+                if self._valid_mask >> self._get_bit(p) & 1:
                     self.deps[package].append(p)
         return self.deps[package]
 
+    def get_deps_many(self, packages):
+        """
+        @return: dependencies of each package, restricted to the valid packages
+        @rtype: {str: [str]}
+        """
+        return dict((p, self.get_deps(p)) for p in packages)
+
+    def _get_reverse(self):
+        if self._reverse is None:
+            reverse = {}
+            for p in self.rospack.list():
+                mask = self._get_closure(p)
+                bit = 1 << self._get_bit(p)
+                for d in self._get_names(mask):
+                    reverse[d] = reverse.get(d, 0) | bit
+            self._reverse = reverse
+        return self._reverse
+
+    def get_depends_on(self, package):
+        """
+        @return: all packages that depend on package, directly or indirectly
+        @rtype: [str]
+        """
+        return self.get_depends_on_any([package])
+
+    def get_depends_on_any(self, packages):
+        """
+        @return: all packages that depend on any of packages
+        @rtype: [str]
+        """
+        reverse = self._get_reverse()
+        mask = 0
+        for p in packages:
+            mask |= reverse.get(p, 0)
+        return self._get_names(mask)
+
+    def get_common_deps(self, packages):
+        """
+        @return: dependencies shared by all of packages
+        @rtype: [str]
+        """
+        mask = None
+        for p in packages:
+            closure = self._get_closure(p)
+            mask = closure if mask is None else mask & closure
+        return self._get_names(mask or 0)
+
     def load_fake_deps(self, deps, deps1):
         self.deps = deps
         self.deps_1 = deps1
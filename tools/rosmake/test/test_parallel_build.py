@@ -60,6 +60,65 @@ class TestDependencyTracker(unittest.TestCase):
         self.assertEquals([], self.dt.get_deps_1('This is not a valid package name'))
 
 
+class FakeRosPack(object):
+
+    def __init__(self, deps1):
+        self.deps1 = deps1
+
+    def list(self):
+        return list(self.deps1.keys())
+
+    def get_depends(self, package, implicit=True):
+        if not implicit:
+            return self.deps1[package]
+        depends = []
+        todo = list(self.deps1[package])
+        while todo:
+            p = todo.pop(0)
+            if p not in depends and p != package:
+                depends.append(p)
+                todo.extend(self.deps1[p])
+        return depends
+
+
+class TestDependencyTrackerBitsets(unittest.TestCase):
+
+    def setUp(self):
+        deps1 = {'a': ['b'], 'b': ['c'], 'c': [], 'd': ['c', 'e'], 'e': []}
+        self.dt = parallel_build.DependencyTracker(rospack=FakeRosPack(deps1))
+
+    def test_deps(self):
+        self.assertEquals(['b', 'c'], sorted(self.dt.get_deps('a')))
+        self.assertEquals({'b': ['c'], 'e': []}, self.dt.get_deps_many(['b', 'e']))
+
+    def test_valid_packages(self):
+        dt = parallel_build.DependencyTracker(['a', 'c'], rospack=self.dt.rospack)
+        self.assertEquals(['c'], dt.get_deps('a'))
+
+    def test_depends_on(self):
+        self.assertEquals(['a', 'b', 'd'], sorted(self.dt.get_depends_on('c')))
+        self.assertEquals(['a', 'd'], sorted(self.dt.get_depends_on_any(['b', 'e'])))
+        self.assertEquals([], self.dt.get_depends_on('a'))
+        self.assertEquals(['c'], self.dt.get_common_deps(['a', 'd']))
+
+    def test_deps_order(self):
+        rospack = FakeRosPack({'a': ['b'], 'b': ['c'], 'c': []})
+        rospack.get_depends = lambda package, implicit=True: \
+            rospack.deps1[package] if not implicit else {'a': ['c', 'b'], 'b': ['c'], 'c': []}[package]
+        dt = parallel_build.DependencyTracker(rospack=rospack)
+        # bits are assigned in traversal order, results keep rospack order
+        dt.get_depends_on('c')
+        self.assertEquals(['c', 'b'], dt.get_deps('a'))
+
+    def test_cycle(self):
+        dt = parallel_build.DependencyTracker(rospack=FakeRosPack({'a': ['b'], 'b': ['c'], 'c': ['b', 'd'], 'd': []}))
+        self.assertEquals(['b', 'c', 'd'], sorted(dt._get_names(dt._get_closure('a'))))
+        # closures within the cycle are not memoized while incomplete
+        self.assertEquals(['b', 'c', 'd'], sorted(dt._get_names(dt._get_closure('c'))))
+        self.assertEquals(['b', 'c', 'd'], sorted(dt._get_names(dt._get_closure('b'))))
+        self.assertEquals(['a', 'b', 'c'], sorted(dt.get_depends_on('d')))
+
+
 class TestBuildQueue(unittest.TestCase):
 
     def setUp(self):
@@ -42,7 +42,7 @@ from __future__ import print_function
 import os
 import sys
 
-import rospkg
+import roslib.packages
 
 import rosunit
 
@@ -68,9 +68,7 @@ def check_main():
         test_pkg, test_file = [a for a in sys.argv[1:] if a != '--rostest']
         # this logic derives the output filename that rostest uses
 
-        r = rospkg.RosPack()
-        pkg_name = rospkg.get_package_name(test_file)
-        pkg_dir = r.get_path(pkg_name)
+        pkg_dir, _ = roslib.packages.get_path_pkg(test_file)
 
         # compute test name for friendlier reporting
         outname = rosunit.rostest_name_from_path(pkg_dir, test_file)
@@ -46,7 +46,7 @@ try:
 except ImportError:
     from io import StringIO
 
-import rospkg
+import roslib.depgraph
 
 import rosunit.junitxml as junitxml
 
@@ -99,11 +99,11 @@ def main():
         parser.error('Only one package may be specified')
 
     package = args[0]
-    r = rospkg.RosPack()
     if options.no_deps:
         packages = [package]
     else:
-        packages = [package] + r.get_depends_on(package, implicit=True)
+        matrix = roslib.depgraph.get_package_graph().get_matrix()
+        packages = [package] + matrix.get_depends_on(package)
         packages = [p for p in packages if p]
 
     result = junitxml.read_all(packages)